@@ -1,15 +1,21 @@
-from flask import Flask, request, Response
+from flask import Flask, request, Response, stream_with_context, g, has_request_context
 import json
+import time
 import logging
 from typing import Dict, List, Any
 from .service import GeoParserService
 from .config import load_config
+from .utils import parse_fields, columnar_locations
+from .jobs import open_queue
+from . import arrow_ipc, metrics, serialization
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 config = load_config()
+metrics.setup(config.enable_metrics)
+serialization.setup(config.json_encoder)
 
 # Initialize GeoParserService at startup
 logger.info("Initializing GeoParserService...")
@@ -20,6 +26,15 @@ except Exception as e:
     logger.error(f"Failed to initialize GeoParserService: {e}")
     geo_service = None
 
+# The job queue is shared with the job workers, which do the parsing
+job_queue = None
+if config.enable_jobs:
+    try:
+        job_queue = open_queue(config)
+        logger.info(f"Job queue enabled at '{config.job_queue_path}'")
+    except Exception as e:
+        logger.error(f"Failed to open job queue at '{config.job_queue_path}': {e}")
+
 def get_geo_service():
     """Get GeoParserService instance"""
     global geo_service
@@ -27,29 +42,72 @@ def get_geo_service():
         raise RuntimeError("GeoParserService is not available. Please check the logs for initialization errors.")
     return geo_service
 
+def compress_response(response: Response) -> Response:
+    """ Compress the body of a response with gzip or deflate if the client accepts it """
+    if not config.enable_compression or not has_request_context() or response.is_streamed:
+        return response
+    body = response.get_data()
+    if len(body) >= config.compression_min_size:
+        # The body depends on Accept-Encoding, also when it is sent uncompressed
+        response.vary.add('Accept-Encoding')
+    encoding = serialization.choose_encoding(request.accept_encodings, len(body), config.compression_min_size)
+    if encoding is None:
+        return response
+    with metrics.stage('compression'):
+        response.set_data(serialization.compress(body, encoding, config.compression_level))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 def json_response(data, status_code=200):
-    """Custom JSON response with forced UTF-8 and non-ASCII encoding"""
+    """Custom JSON response with forced UTF-8 and non-ASCII encoding, compact unless ?pretty=1"""
+    pretty = has_request_context() and request.args.get('pretty', 'false').lower() in ('true', '1', 'yes', 'on')
+    with metrics.stage('serialization'):
+        body = serialization.dumps(data, pretty=pretty)
     response = Response(
-        response=json.dumps(data, ensure_ascii=False, indent=2),
+        response=body,
         status=status_code,
         mimetype='application/json; charset=utf-8'
     )
-    return response
+    return compress_response(response)
+
+def accepts_arrow() -> bool:
+    """ Whether the client prefers an Arrow IPC stream to JSON, through the Accept header """
+    best = request.accept_mimetypes.best_match(['application/json', arrow_ipc.ARROW_STREAM_MIMETYPE])
+    return best == arrow_ipc.ARROW_STREAM_MIMETYPE
 
 def validate_json_request(required_fields: List[str]) -> Dict:
     """ Validate JSON request data """
-    if not request.is_json:
-        return {'valid': False, 'error': 'Content-Type must be application/json'}
-    
-    data = request.get_json()
-    if not data:
-        return {'valid': False, 'error': 'Invalid JSON data'}
-    
-    missing_fields = [field for field in required_fields if field not in data]
-    if missing_fields:
-        return {'valid': False, 'error': f'Missing required fields: {missing_fields}'}
-    
-    return {'valid': True, 'data': data}
+    with metrics.stage('validation'):
+        if not request.is_json:
+            return {'valid': False, 'error': 'Content-Type must be application/json'}
+        
+        data = request.get_json()
+        if not data:
+            return {'valid': False, 'error': 'Invalid JSON data'}
+        
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            return {'valid': False, 'error': f'Missing required fields: {missing_fields}'}
+        
+        return {'valid': True, 'data': data}
+
+@app.before_request
+def track_request_start():
+    """ Count the request as in flight """
+    g.request_start = time.perf_counter()
+    metrics.request_started()
+
+@app.after_request
+def track_request_end(response):
+    """ Record the request by endpoint and status code once its body has been sent """
+    if 'request_start' in g:
+        # The URL rule rather than the path, so unknown paths do not create new label values
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status, start = response.status_code, g.request_start
+        # Streamed and compressed bodies are still being produced when the view returns, so the
+        # request stays in flight until the server closes the response
+        response.call_on_close(lambda: metrics.request_finished(endpoint, status, time.perf_counter() - start))
+    return response
 
 @app.route('/api/parse', methods=['POST'])
 def parse_text():
@@ -68,21 +126,39 @@ def parse_text():
         languages = data.get('languages', None)
         model_size = data.get('model_size', None)
         
+        if not isinstance(text, str):
+            return json_response({
+                'success': False,
+                'error': 'text must be a string'
+            }, 400)
+        
         # Validate that text is not empty
-        if not text or not text.strip():
+        if not text.strip():
             return json_response({
                 'success': False,
                 'error': 'Text cannot be empty'
             }, 400)
         
+        # Validate the field projection
+        try:
+            fields = parse_fields(data.get('fields', None))
+        except ValueError as e:
+            return json_response({
+                'success': False,
+                'error': str(e)
+            }, 400)
+        
         # Call the GeoParserService to parse the text
         service = get_geo_service()
         result = service.parse_text(
             text=text,
             languages=languages,
-            model_size=model_size
+            model_size=model_size,
+            fields=fields
         )
         
+        metrics.observe_text('parse', result)
+
         # Return 200 if parsing was successful, otherwise 400
         status_code = 200 if result['success'] else 400
         return json_response(result, status_code)
@@ -117,6 +193,7 @@ def parse_batch():
         data = validation['data']
         texts = data['texts']
         model_size = data.get('model_size', None)
+        layout = data.get('layout', 'rows')
         
         # Validate that texts is a list
         if not isinstance(texts, list):
@@ -139,17 +216,66 @@ def parse_batch():
                 'error': f'Batch size too large. Maximum allowed: {config.max_batch_size}'
             }, 400)
         
+        # Validate the field projection and the response layout
+        try:
+            fields = parse_fields(data.get('fields', None))
+        except ValueError as e:
+            return json_response({
+                'success': False,
+                'error': str(e)
+            }, 400)
+        
+        if layout not in ('rows', 'columnar'):
+            return json_response({
+                'success': False,
+                'error': "layout must be 'rows' or 'columnar'"
+            }, 400)
+        
+        arrow = accepts_arrow()
+        if arrow and not arrow_ipc.available():
+            return json_response({
+                'success': False,
+                'error': 'Arrow output requires pyarrow, which is not installed on the server'
+            }, 406)
+        
         # Call the GeoParserService to parse the batch of texts
         service = get_geo_service()
+        metrics.observe_batch_size('batch', len(texts))
         results = service.parse_batch(
             texts=texts,
-            model_size=model_size
+            model_size=model_size,
+            fields=fields
         )
+        for result in results:
+            metrics.observe_text('batch', result)
         
         # Statistics for successful and failed parses
         success_count = sum(1 for result in results if result.get('success', False))
         total_count = len(results)
         
+        if arrow:
+            # One row per location with typed columns; the counts are in the schema metadata
+            with metrics.stage('serialization'):
+                body = arrow_ipc.to_ipc_stream(arrow_ipc.location_batch(results, fields), metadata={
+                    'total_processed': str(total_count),
+                    'successful_parses': str(success_count),
+                    'failed_parses': str(total_count - success_count)
+                })
+            return compress_response(Response(body, status=200, mimetype=arrow_ipc.ARROW_STREAM_MIMETYPE))
+        
+        if layout == 'columnar':
+            # One array per location field instead of a list of dicts per text
+            results, locations = columnar_locations(results, fields)
+            return json_response({
+                'success': True,
+                'total_processed': total_count,
+                'successful_parses': success_count,
+                'failed_parses': total_count - success_count,
+                'layout': 'columnar',
+                'results': results,
+                'locations': locations
+            }, 200)
+        
         return json_response({
             'success': True,
             'total_processed': total_count,
@@ -171,12 +297,282 @@ def parse_batch():
             'error': 'Internal server error'
         }, 500)
 
+def _stream_window(service: GeoParserService, window: List[tuple], model_size: Any, fields: Any = None):
+    """ Parse one window of streamed items and yield the NDJSON result lines in input order """
+    valid = [item for _, item, error in window if error is None]
+    metrics.observe_batch_size('stream', len(window))
+    results = iter(service.parse_batch(texts=valid, model_size=model_size, fields=fields) if valid else [])
+
+    for line_number, item, error in window:
+        if error is None:
+            result = next(results)
+            metrics.observe_text('stream', result)
+        else:
+            result = {
+                'success': False,
+                'error': error,
+                'locations': []
+            }
+        result['line'] = line_number
+        with metrics.stage('serialization'):
+            line = serialization.dumps(result) + b'\n'
+        yield line
+
+@app.route('/api/parse/stream', methods=['POST'])
+def parse_stream():
+    """ Parse newline-delimited JSON texts and stream the results as NDJSON """
+    try:
+        service = get_geo_service()
+    except RuntimeError as e:
+        logger.error(f"Service not available: {str(e)}")
+        return json_response({
+            'success': False,
+            'error': 'GeoParser service is not available'
+        }, 503)
+
+    model_size = request.args.get('model_size', None)
+    try:
+        fields = parse_fields(request.args.get('fields', None))
+    except ValueError as e:
+        return json_response({
+            'success': False,
+            'error': str(e)
+        }, 400)
+    window_size = max(min(config.stream_window_size, config.max_batch_size), 1)
+
+    def read_items():
+        """ Read the request body line by line, yielding (line_number, item, error) """
+        for line_number, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Invalid JSON: {str(e)}'
+                continue
+            yield line_number, item, None
+
+    def generate():
+        # Only one window of items is held in memory at a time
+        window = []
+        try:
+            for entry in read_items():
+                window.append(entry)
+                if len(window) >= window_size:
+                    yield from _stream_window(service, window, model_size, fields)
+                    window = []
+            if window:
+                yield from _stream_window(service, window, model_size, fields)
+        except Exception as e:
+            logger.error(f"Error in parse_stream endpoint: {str(e)}")
+            yield serialization.dumps({
+                'success': False,
+                'error': 'Internal server error'
+            }) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson; charset=utf-8')
+
+def jobs_disabled_response():
+    """ Response of the job endpoints when jobs are disabled """
+    return json_response({
+        'success': False,
+        'error': 'Jobs are disabled. Set ENABLE_JOBS=true to submit asynchronous jobs.'
+    }, 404)
+
+def job_not_found_response(job_id: str):
+    """ Response for an unknown or expired job """
+    return json_response({
+        'success': False,
+        'error': f'Job not found: {job_id}'
+    }, 404)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """ Submit a large set of texts to be parsed asynchronously by the job workers """
+    if job_queue is None:
+        return jobs_disabled_response()
+    try:
+        validation = validate_json_request(['texts'])
+        if not validation['valid']:
+            return json_response({
+                'success': False,
+                'error': validation['error']
+            }, 400)
+        
+        data = validation['data']
+        texts = data['texts']
+        model_size = data.get('model_size', None)
+        
+        if not isinstance(texts, list):
+            return json_response({
+                'success': False,
+                'error': 'texts must be a list'
+            }, 400)
+        
+        if not texts:
+            return json_response({
+                'success': False,
+                'error': 'texts list cannot be empty'
+            }, 400)
+        
+        if len(texts) > config.job_max_texts:
+            return json_response({
+                'success': False,
+                'error': f'Job too large. Maximum allowed: {config.job_max_texts} texts'
+            }, 400)
+        
+        if model_size is not None and not isinstance(model_size, str):
+            return json_response({
+                'success': False,
+                'error': 'model_size must be a string'
+            }, 400)
+        
+        # Rejected here, as the job workers would only give up on a bad item after retrying its chunk
+        for index, item in enumerate(texts):
+            error = GeoParserService.item_error(item)
+            if error is not None:
+                return json_response({
+                    'success': False,
+                    'error': f'Invalid item texts[{index}]: {error}'
+                }, 400)
+        
+        try:
+            fields = parse_fields(data.get('fields', None))
+        except ValueError as e:
+            return json_response({
+                'success': False,
+                'error': str(e)
+            }, 400)
+        
+        job = job_queue.submit(texts, model_size=model_size, fields=fields)
+        job_id = job['job_id']
+        return json_response({
+            'success': True,
+            **job,
+            'status_url': f'/api/jobs/{job_id}',
+            'results_url': f'/api/jobs/{job_id}/results'
+        }, 202)
+        
+    except Exception as e:
+        logger.error(f"Error in submit_job endpoint: {str(e)}")
+        return json_response({
+            'success': False,
+            'error': 'Failed to submit job'
+        }, 500)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """ Status and progress of a job """
+    if job_queue is None:
+        return jobs_disabled_response()
+    try:
+        job = job_queue.status(job_id)
+        if job is None:
+            return job_not_found_response(job_id)
+        return json_response({'success': True, **job}, 200)
+    except Exception as e:
+        logger.error(f"Error in get_job endpoint: {str(e)}")
+        return json_response({
+            'success': False,
+            'error': 'Failed to retrieve job'
+        }, 500)
+
+@app.route('/api/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """ One page of the results of a job, by position of the texts """
+    if job_queue is None:
+        return jobs_disabled_response()
+    try:
+        try:
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args.get('limit', 100))
+        except ValueError:
+            return json_response({
+                'success': False,
+                'error': 'offset and limit must be integers'
+            }, 400)
+        
+        if offset < 0 or not 1 <= limit <= 1000:
+            return json_response({
+                'success': False,
+                'error': 'offset must not be negative and limit must be between 1 and 1000'
+            }, 400)
+        
+        arrow = accepts_arrow()
+        if arrow and not arrow_ipc.available():
+            return json_response({
+                'success': False,
+                'error': 'Arrow output requires pyarrow, which is not installed on the server'
+            }, 406)
+        
+        job = job_queue.status(job_id)
+        if job is None:
+            return job_not_found_response(job_id)
+        
+        results = job_queue.results(job_id, offset, limit)
+        end = min(offset + limit, job['total'])
+        next_offset = end if end < job['total'] else None
+        
+        if arrow:
+            # The index column is the position of the text in the job
+            with metrics.stage('serialization'):
+                body = arrow_ipc.to_ipc_stream(
+                    arrow_ipc.location_batch(results, job['fields'], [result['index'] for result in results]),
+                    metadata={
+                        'job_id': job_id,
+                        'status': job['status'],
+                        'offset': str(offset),
+                        'next_offset': '' if next_offset is None else str(next_offset)
+                    }
+                )
+            return compress_response(Response(body, status=200, mimetype=arrow_ipc.ARROW_STREAM_MIMETYPE))
+        
+        return json_response({
+            'success': True,
+            'job_id': job_id,
+            'status': job['status'],
+            'total': job['total'],
+            'offset': offset,
+            'limit': limit,
+            # Texts of the page that have not been parsed yet are not included
+            'pending': max(0, end - offset) - len(results) if job['status'] in ('queued', 'running') else 0,
+            'next_offset': next_offset,
+            'results': results
+        }, 200)
+        
+    except Exception as e:
+        logger.error(f"Error in get_job_results endpoint: {str(e)}")
+        return json_response({
+            'success': False,
+            'error': 'Failed to retrieve job results'
+        }, 500)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """ Cancel a queued or running job """
+    if job_queue is None:
+        return jobs_disabled_response()
+    try:
+        job = job_queue.cancel(job_id)
+        if job is None:
+            return job_not_found_response(job_id)
+        return json_response({'success': True, **job}, 200)
+    except Exception as e:
+        logger.error(f"Error in cancel_job endpoint: {str(e)}")
+        return json_response({
+            'success': False,
+            'error': 'Failed to cancel job'
+        }, 500)
+
 @app.route('/api/info', methods=['GET'])
 def get_info():
     """ Get model information """
     try:
         service = get_geo_service()
         model_info = service.get_model_info()
+        if job_queue is not None:
+            model_info['jobs'] = job_queue.stats()
         return json_response({
             'success': True,
             'info': model_info
@@ -215,12 +611,55 @@ def health_check():
             'error': 'Health check failed'
         }, 503)
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """ Liveness endpoint, answered without running inference """
+    if geo_service is None:
+        return json_response({
+            'status': 'alive',
+            'service_available': False
+        }, 200)
+    return json_response(dict(geo_service.liveness(), service_available=True), 200)
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """ Readiness endpoint, answered from the recorded warm-up result """
+    try:
+        service = get_geo_service()
+        readiness = service.readiness()
+        status_code = 200 if readiness['status'] == 'ready' else 503
+        return json_response(readiness, status_code)
+    except RuntimeError as e:
+        logger.error(f"Service not available during readiness check: {str(e)}")
+        return json_response({
+            'status': 'not_ready',
+            'error': 'GeoParser service is not available'
+        }, 503)
+    except Exception as e:
+        logger.error(f"Error in readiness_check endpoint: {str(e)}")
+        return json_response({
+            'status': 'not_ready',
+            'error': 'Readiness check failed'
+        }, 503)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """ Metrics of all workers in the Prometheus text format """
+    if not metrics.enabled():
+        return json_response({
+            'success': False,
+            'error': 'Metrics are disabled. Install prometheus_client and set ENABLE_METRICS=true.'
+        }, 404)
+    body, content_type = metrics.render()
+    return compress_response(Response(body, status=200, content_type=content_type))
+
 @app.route('/api/cache/clear', methods=['POST'])
 def clear_cache():
     """ Clear the cache of the GeoParserService """
     try:
         service = get_geo_service()
-        result = service.clear_cache()
+        include_persistent = request.args.get('persistent', 'true').lower() in ('true', '1', 'yes', 'on')
+        result = service.clear_cache(include_persistent=include_persistent)
         status_code = 200 if result['success'] else 400
         return json_response(result, status_code)
     except RuntimeError as e:
@@ -263,8 +702,13 @@ def root():
         'endpoints': {
             'parse': '/api/parse',
             'batch_parse': '/api/parse/batch',
+            'stream_parse': '/api/parse/stream',
+            'jobs': '/api/jobs',
             'info': '/api/info',
             'health': '/api/health',
+            'liveness': '/api/health/live',
+            'readiness': '/api/health/ready',
+            'metrics': '/metrics',
             'clear_cache': '/api/cache/clear',
             'languages': '/api/languages'
         },
@@ -280,8 +724,13 @@ def not_found(error):
         'available_endpoints': [
             '/api/parse',
             '/api/parse/batch',
+            '/api/parse/stream',
+            '/api/jobs',
             '/api/info',
             '/api/health',
+            '/api/health/live',
+            '/api/health/ready',
+            '/metrics',
             '/api/cache/clear',
             '/api/languages'
         ]
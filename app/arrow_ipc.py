@@ -0,0 +1,155 @@
+"""
+Apache Arrow IPC output of parse results, for loading into dataframe tools without JSON decoding.
+
+The results are flattened to one row per location with the position and id of the text, the
+language and model used, and the location attributes as typed columns. Texts that failed get
+one row with their error and no location; texts without locations have no rows. The schema is
+fixed for a given field projection, so record batches of a long bulk job can be appended to one
+IPC stream. Requires the optional pyarrow package.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+from .utils import LOCATION_FIELDS
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# End-of-stream marker of the IPC stream format: continuation token and zero length
+END_OF_STREAM = b'\xff\xff\xff\xff\x00\x00\x00\x00'
+
+_FLOAT_FIELDS = ('latitude', 'longitude')
+_INT_FIELDS = ('elevation', 'population', 'start_char', 'end_char')
+
+
+def available() -> bool:
+    """ Whether pyarrow is installed """
+    return pa is not None
+
+
+def _location_columns(fields: Optional[Sequence[str]]) -> List[str]:
+    return list(fields or LOCATION_FIELDS) + ['start_char', 'end_char']
+
+
+def location_schema(fields: Optional[Sequence[str]] = None) -> 'pa.Schema':
+    """
+    Schema of the location rows for a field projection.
+
+    Parameters:
+    - fields: The location attributes to include, None for all attributes.
+
+    Returns:
+    - The Arrow schema.
+    """
+    columns = [
+        pa.field('index', pa.int64(), nullable=False),
+        pa.field('id', pa.string()),
+        pa.field('language', pa.string()),
+        pa.field('model_used', pa.string()),
+        pa.field('error', pa.string())
+    ]
+    for field in _location_columns(fields):
+        if field in _FLOAT_FIELDS:
+            columns.append(pa.field(field, pa.float64()))
+        elif field in _INT_FIELDS:
+            columns.append(pa.field(field, pa.int64()))
+        else:
+            columns.append(pa.field(field, pa.string()))
+    return pa.schema(columns)
+
+
+def _string(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _converter(field: str):
+    """ Conversion of the values of a column, e.g. populations the gazetteer stores as floats """
+    if field in _FLOAT_FIELDS:
+        return lambda value: None if value is None else float(value)
+    if field in _INT_FIELDS:
+        return lambda value: None if value is None else int(value)
+    return _string
+
+
+def location_batch(
+        results: Iterable[Dict],
+        fields: Optional[Sequence[str]] = None,
+        indexes: Optional[Iterable[int]] = None
+) -> 'pa.RecordBatch':
+    """
+    Flatten parse results to a record batch with one row per location.
+
+    Parameters:
+    - results: Parse results, in the format of parse_text and parse_batch.
+    - fields: The location attributes of the results, None for all attributes.
+    - indexes: The index column of each result, e.g. the record numbers of a bulk job.
+      Defaults to the position of the result.
+
+    Returns:
+    - The record batch, with the schema of location_schema(fields).
+    """
+    schema = location_schema(fields)
+    location_fields = _location_columns(fields)
+    columns: Dict[str, List] = {name: [] for name in schema.names}
+
+    for position, result in enumerate(results) if indexes is None else zip(indexes, results):
+        if result.get('success', False):
+            rows = result.get('locations') or []
+            error = None
+        else:
+            # A row without location, so failed texts can be told apart from texts without locations
+            rows = [{}]
+            error = _string(result.get('error'))
+        # Numeric text ids become strings, like the geonameids
+        text_id = _string(result.get('id'))
+        language = result.get('language_detected')
+        model_used = result.get('model_used')
+        for location in rows:
+            columns['index'].append(position)
+            columns['id'].append(text_id)
+            columns['language'].append(language)
+            columns['model_used'].append(model_used)
+            columns['error'].append(error)
+            for field in location_fields:
+                columns[field].append(location.get(field))
+
+    for field in location_fields:
+        convert = _converter(field)
+        columns[field] = [convert(value) for value in columns[field]]
+
+    return pa.record_batch(
+        [pa.array(columns[name], type=schema.field(name).type) for name in schema.names],
+        schema=schema
+    )
+
+
+def to_ipc_stream(batch: 'pa.RecordBatch', metadata: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    Serialize a record batch as a complete Arrow IPC stream.
+
+    Parameters:
+    - batch: The record batch.
+    - metadata: Optional key-value metadata added to the schema.
+
+    Returns:
+    - The IPC stream.
+    """
+    if metadata:
+        batch = batch.replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def schema_message(schema: 'pa.Schema') -> bytes:
+    """ The schema message that starts an IPC stream """
+    return schema.serialize().to_pybytes()
+
+
+def batch_message(batch: 'pa.RecordBatch') -> bytes:
+    """ The message of one record batch of an IPC stream, to append after the schema message """
+    return batch.serialize().to_pybytes()
@@ -0,0 +1,174 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    """ A single text waiting to be parsed as part of a micro-batch """
+    __slots__ = ('text', 'event', 'result', 'error', 'parse_time', 'batch_size')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.parse_time = 0.0
+        self.batch_size = 0
+
+
+class _Batch:
+    """ Requests collected for one key until the batch is flushed """
+    __slots__ = ('requests', 'full')
+
+    def __init__(self):
+        self.requests: List[_Request] = []
+        self.full = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-text requests per key, e.g. (language, model size),
+    and runs them as one batch once max_batch_size requests are queued or the
+    first request has waited max_wait_ms.
+
+    The first request of a batch leads it: it waits for the batch to fill, runs
+    it and hands every other request its own result.
+    """
+    def __init__(
+            self,
+            runner: Callable[[Hashable, List[str]], List[Any]],
+            max_batch_size: int = 16,
+            max_wait_ms: float = 5
+    ):
+        """
+        Initialize the batcher.
+
+        Parameters:
+        - runner: Callable taking (key, texts) and returning one result per text, in order.
+        - max_batch_size: Number of queued requests that flushes a batch immediately.
+        - max_wait_ms: Maximum time in milliseconds the first request of a batch waits for others.
+        """
+        self._runner = runner
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+
+        self._batches: Dict[Hashable, _Batch] = {}
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, key: Hashable, text: str) -> Tuple[Any, float, int]:
+        """
+        Parse a text together with concurrent requests for the same key.
+
+        Returns:
+        - A tuple of (result, parse_time, batch_size), where parse_time is the text's
+          length-weighted share of the batch parse time.
+
+        Raises:
+        - The exception raised by the runner for this text.
+        """
+        request = _Request(text)
+
+        with self._lock:
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._batches[key] = batch
+            batch.requests.append(request)
+            if len(batch.requests) >= self.max_batch_size:
+                # Detach the full batch so new requests start the next one
+                self._batches.pop(key, None)
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    self._batches.pop(key)
+            self._run(key, batch.requests)
+        else:
+            request.event.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.result, request.parse_time, request.batch_size
+
+    def _run(self, key: Hashable, requests: List[_Request]):
+        """
+        Run a flushed batch and resolve all of its requests.
+
+        If the batch fails, its texts are run one at a time, so only the requests of a text
+        that fails get the error instead of every request of the batch.
+        """
+        # Identical texts in a batch are parsed only once
+        texts = list(dict.fromkeys(request.text for request in requests))
+        errors: Dict[str, BaseException] = {}
+
+        try:
+            start = time.time()
+            results = dict(zip(texts, self._runner(key, texts)))
+            parse_time = time.time() - start
+        except Exception as e:
+            if len(texts) == 1:
+                errors[texts[0]] = e
+                results, parse_time = {}, 0.0
+            else:
+                logger.error(f"Micro-batch for {key} failed ({len(texts)} texts): {str(e)}. Retrying texts individually.")
+                results, errors, parse_time = self._run_each(key, texts)
+        except BaseException as e:
+            for request in requests:
+                request.error = e
+                request.event.set()
+            return
+
+        total_length = sum(len(request.text) for request in requests) or 1
+        for request in requests:
+            if request.text in errors:
+                request.error = errors[request.text]
+            else:
+                request.result = results[request.text]
+                request.parse_time = parse_time * len(request.text) / total_length
+                request.batch_size = len(requests)
+            request.event.set()
+
+        with self._lock:
+            self.batches += 1
+            self.requests += len(requests)
+
+        logger.debug(f"Micro-batch for {key}: {len(requests)} requests, {len(texts)} unique texts in {parse_time:.3f}s")
+
+    def _run_each(self, key: Hashable, texts: List[str]) -> Tuple[Dict[str, Any], Dict[str, BaseException], float]:
+        """
+        Run the texts of a failed batch one at a time.
+
+        Returns:
+        - A tuple of (results by text, errors by text, total parse time).
+        """
+        results: Dict[str, Any] = {}
+        errors: Dict[str, BaseException] = {}
+        start = time.time()
+        for text in texts:
+            try:
+                results[text] = self._runner(key, [text])[0]
+            except Exception as e:
+                errors[text] = e
+        return results, errors, time.time() - start
+
+    def stats(self) -> Dict:
+        """
+        Get micro-batching statistics.
+        """
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'requests': self.requests,
+                'average_batch_size': self.requests / self.batches if self.batches else 0.0
+            }
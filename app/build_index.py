@@ -0,0 +1,114 @@
+"""
+Build the precomputed gazetteer indexes.
+
+embeddings: embeds the description of every location of the configured gazetteer with the
+configured transformer model and stores the result as a float16 matrix under GEONAMES_DATA_PATH,
+where the service memory-maps it when ENABLE_EMBEDDING_INDEX is set.
+
+records: copies the location attributes returned by the API into a columnar store under
+GEONAMES_DATA_PATH, which the service memory-maps when ENABLE_GAZETTEER_STORE is set.
+
+names: hashes the words and full names of the gazetteer names into the sets used by the
+toponym prefilter (PREFILTER_MODE).
+
+Rebuild the indexes after updating the gazetteer, and the embeddings after changing TRANSFORMER_MODEL.
+
+Usage:
+    python -m app.build_index
+    python -m app.build_index embeddings --batch-size 512 --min-population 1000
+    python -m app.build_index records names
+"""
+import sys
+import time
+import logging
+import argparse
+from typing import List, Optional
+
+from .config import load_config
+from .embedding_index import build_index, index_path
+from .gazetteer_store import build_store, store_path
+from .prefilter import build_prefilter, prefilter_path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.build_index',
+        description='Precompute the candidate embeddings and the location records of the gazetteer.'
+    )
+    parser.add_argument('targets', nargs='*', metavar='{embeddings,records,names}',
+                        help='Indexes to build (default: embeddings)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Base path of the index files when building a single index '
+                             '(default: EMBEDDING_INDEX_PATH / GAZETTEER_STORE_PATH / PREFILTER_PATH or under GEONAMES_DATA_PATH)')
+    parser.add_argument('-b', '--batch-size', type=int, default=256, help='Locations embedded at once (default: 256)')
+    parser.add_argument('--min-population', type=int, default=0,
+                        help='Only index locations with at least this population; others are looked up at request time')
+    parser.add_argument('--progress-interval', type=float, default=10.0, help='Seconds between progress reports')
+    args = parser.parse_args(argv)
+
+    if args.batch_size <= 0:
+        parser.error('--batch-size must be positive')
+    targets = set(args.targets) or {'embeddings'}
+    if targets - {'embeddings', 'records', 'names'}:
+        parser.error(f"unknown index(es): {', '.join(sorted(targets - {'embeddings', 'records', 'names'}))}")
+    if args.output and len(targets) > 1:
+        parser.error('--output can only be used when building a single index')
+
+    config = load_config()
+    logging.basicConfig(level=getattr(logging, config.log_level, logging.INFO), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from geoparser.constants import GAZETTEERS
+
+    if config.gazetteer not in GAZETTEERS:
+        print(f"Unknown gazetteer '{config.gazetteer}'", file=sys.stderr)
+        return 1
+    gazetteer = GAZETTEERS[config.gazetteer]()
+
+    def reporter(unit: str):
+        start_time = time.time()
+        last_report = 0.0
+
+        def report(done: int, total: int):
+            nonlocal last_report
+            now = time.time()
+            if now - last_report >= args.progress_interval or done == total:
+                rate = done / max(now - start_time, 1e-9)
+                eta = (total - done) / rate if rate > 0 else 0
+                print(f"{done:,}/{total:,} {unit} ({100 * done / max(total, 1):.1f}%) | {rate:,.0f} {unit}/s | ETA {eta / 60:.1f} min",
+                      file=sys.stderr, flush=True)
+                last_report = now
+        return report
+
+    if 'records' in targets:
+        path = args.output or store_path(config)
+        print(f"Building gazetteer store for '{config.gazetteer}' at '{path}'", file=sys.stderr)
+        metadata = build_store(gazetteer, path, min_population=args.min_population, progress=reporter('rows'))
+        print(f"Finished: {metadata['locations']:,} locations and {metadata['strings']:,} strings written to '{path}'", file=sys.stderr)
+
+    if 'names' in targets:
+        path = args.output or prefilter_path(config)
+        print(f"Building prefilter name sets for '{config.gazetteer}' at '{path}'", file=sys.stderr)
+        metadata = build_prefilter(gazetteer, path, progress=reporter('names'))
+        print(f"Finished: {metadata['words']:,} words and {metadata['names']:,} names written to '{path}'", file=sys.stderr)
+
+    if 'embeddings' in targets:
+        from sentence_transformers import SentenceTransformer
+
+        transformer = SentenceTransformer(config.transformer_model)
+        path = args.output or index_path(config)
+        print(f"Building embedding index for '{config.gazetteer}' with '{config.transformer_model}' at '{path}'", file=sys.stderr)
+        metadata = build_index(
+            gazetteer,
+            transformer,
+            config.transformer_model,
+            path,
+            batch_size=args.batch_size,
+            min_population=args.min_population,
+            progress=reporter('loc')
+        )
+        print(f"Finished: {metadata['locations']:,} locations x {metadata['dimension']} dimensions written to '{path}'", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+Offline bulk geoparsing of JSONL files.
+
+Reads JSONL (optionally gzip-compressed) records, shards them across worker processes that
+each hold one GeoParserService, and writes one JSON result per record to a JSONL file, or with
+--format arrow one row per location to an Arrow IPC stream (see arrow_ipc.py).
+Progress is checkpointed after every chunk, so a killed job resumes where it stopped.
+
+Usage:
+    python -m app.bulk input.jsonl.gz -o results.jsonl --workers 4
+    python -m app.bulk requests.jsonl -o results.jsonl --id-field request_id --text-field body
+    python -m app.bulk input.jsonl.gz -o locations.arrows --format arrow --fields geonameid,latitude,longitude
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import signal
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import load_config
+from .utils import parse_fields
+from . import arrow_ipc, serialization
+
+logger = logging.getLogger(__name__)
+
+_service = None
+_fields: Dict[str, str] = {}
+
+
+def open_input(path: str):
+    """Open a JSONL input file, transparently decompressing .gz files."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_records(paths: List[str]) -> Iterator[str]:
+    """Yield the non-empty lines of all input files in order."""
+    for path in paths:
+        with open_input(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def count_records(paths: List[str]) -> int:
+    """Count the records of all input files."""
+    return sum(1 for _ in iter_records(paths))
+
+
+def iter_chunks(records: Iterator[str], chunk_size: int, skip: int = 0) -> Iterator[Tuple[int, List[str]]]:
+    """Group records into chunks, skipping the first records that were already processed."""
+    chunk: List[str] = []
+    start = skip
+    for index, line in enumerate(records):
+        if index < skip:
+            continue
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def _init_worker(fields: Dict[str, str], torch_threads: int):
+    """Build one GeoParserService per worker process."""
+    global _service, _fields
+    from .prefork import configure_torch_threads
+
+    # Ctrl+C is handled by the parent, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from .service import GeoParserService
+
+    config = load_config()
+    logging.basicConfig(
+        level=getattr(logging, config.log_level.upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    )
+    # The bulk workers are the inference processes themselves
+    config.inference_backend = 'local'
+    if config.torch_num_threads <= 0:
+        # Avoid oversubscribing the CPU with one full torch thread pool per process
+        config.torch_num_threads = torch_threads
+    configure_torch_threads(config.torch_num_threads)
+
+    _fields = fields
+    serialization.setup(config.json_encoder)
+    _service = GeoParserService(config)
+
+
+def _record_item(record: Dict) -> Dict:
+    """
+    Build the parse_batch item of a record.
+
+    Raises:
+    - ValueError: If the text is not a string or the languages are not a string or a list of strings.
+    """
+    item = {'text': record.get(_fields['text'])}
+    if record.get(_fields['id']) is not None:
+        item['id'] = record[_fields['id']]
+    if record.get(_fields['languages']) is not None:
+        item['languages'] = record[_fields['languages']]
+    error = _service.item_error(item)
+    if error is not None:
+        raise ValueError(error)
+    return item
+
+
+def _parse_chunk(
+        start: int,
+        lines: List[str],
+        model_size: Optional[str],
+        location_fields: Optional[Tuple[str, ...]] = None,
+        output_format: str = 'jsonl'
+) -> Tuple[int, bytes]:
+    """
+    Parse a chunk of JSONL records in a worker process.
+
+    Returns:
+    - A tuple of (number of records, their encoded results). The results are encoded in the
+      worker, so the writing process only appends bytes.
+    """
+    items = []
+    errors: Dict[int, str] = {}
+    for offset, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record is not a JSON object")
+        except ValueError as e:
+            errors[offset] = f"Invalid JSON: {str(e)}"
+            continue
+        try:
+            items.append(_record_item(record))
+        except ValueError as e:
+            errors[offset] = f"Invalid record: {str(e)}"
+
+    parsed = iter(_service.parse_batch_isolated(items, model_size=model_size, fields=location_fields) if items else [])
+
+    results = []
+    for offset in range(len(lines)):
+        if offset in errors:
+            result = {'success': False, 'error': errors[offset], 'locations': []}
+        else:
+            result = next(parsed)
+        result['record'] = start + offset
+        results.append(result)
+
+    if output_format == 'arrow':
+        batch = arrow_ipc.location_batch(results, location_fields, indexes=[result['record'] for result in results])
+        return len(results), arrow_ipc.batch_message(batch)
+    return len(results), b''.join(serialization.dumps(result) + b'\n' for result in results)
+
+
+class Checkpoint:
+    """
+    Progress of a bulk job: the number of records written and the output size after them.
+    """
+    def __init__(self, path: str, inputs: List[str], output: str, output_format: str = 'jsonl',
+                 fields: Optional[Tuple[str, ...]] = None):
+        self.path = path
+        self.inputs = [os.path.abspath(p) for p in inputs]
+        self.output = os.path.abspath(output)
+        self.output_format = output_format
+        self.fields = list(fields) if fields is not None else None
+        self.records_done = 0
+        self.output_bytes = 0
+
+    def load(self) -> bool:
+        """Load the checkpoint if it exists and belongs to the same job."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('inputs') != self.inputs or state.get('output') != self.output or \
+                state.get('format', 'jsonl') != self.output_format:
+            raise ValueError(f"Checkpoint '{self.path}' belongs to a different job; remove it or use --checkpoint.")
+        # The Arrow schema and the JSONL results already written depend on the location fields
+        if state.get('fields') != self.fields:
+            raise ValueError(f"Checkpoint '{self.path}' was written with --fields "
+                             f"{','.join(state.get('fields') or []) or '(all)'}; resume with the same fields.")
+        self.records_done = state['records_done']
+        self.output_bytes = state['output_bytes']
+        return True
+
+    def save(self):
+        """Atomically write the checkpoint."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'inputs': self.inputs,
+                'output': self.output,
+                'format': self.output_format,
+                'fields': self.fields,
+                'records_done': self.records_done,
+                'output_bytes': self.output_bytes,
+                'updated_at': time.time()
+            }, f)
+        os.replace(tmp_path, self.path)
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _report(done: int, total: Optional[int], processed: int, elapsed: float):
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    if total:
+        remaining = (total - done) / rate if rate > 0 else 0
+        message = f"{done:,}/{total:,} records ({done / total:.1%}) | {rate:,.1f} rec/s | ETA {_format_eta(remaining)}"
+    else:
+        message = f"{done:,} records | {rate:,.1f} rec/s"
+    print(message, file=sys.stderr, flush=True)
+
+
+def run(args: argparse.Namespace) -> int:
+    config = load_config()
+    chunk_size = max(min(args.batch_size or config.max_batch_size, config.max_batch_size), 1)
+    checkpoint = Checkpoint(args.checkpoint or args.output + '.checkpoint', args.inputs, args.output, args.format,
+                            args.fields)
+
+    try:
+        resumed = checkpoint.load()
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    if resumed:
+        output_size = os.path.getsize(args.output) if os.path.exists(args.output) else None
+        if output_size is None or output_size < checkpoint.output_bytes:
+            print(f"Output '{args.output}' is missing or shorter than the {checkpoint.output_bytes:,} bytes recorded "
+                  f"in '{checkpoint.path}'; cannot resume. Remove the checkpoint to start over.", file=sys.stderr)
+            return 1
+        print(f"Resuming after {checkpoint.records_done:,} records", file=sys.stderr)
+    elif os.path.exists(args.output):
+        print(f"Output '{args.output}' exists without a checkpoint; refusing to overwrite it.", file=sys.stderr)
+        return 1
+
+    total = None if args.no_count else count_records(args.inputs)
+
+    # Drop anything written after the last checkpoint, e.g. by a killed job
+    with open(args.output, 'ab') as f:
+        f.truncate(checkpoint.output_bytes)
+
+    fields = {'id': args.id_field, 'text': args.text_field, 'languages': args.languages_field}
+    torch_threads = max((os.cpu_count() or 1) // args.workers, 1)
+    chunks = iter_chunks(iter_records(args.inputs), chunk_size, skip=checkpoint.records_done)
+
+    start_time = time.time()
+    last_report = 0.0
+    processed = 0
+
+    pool = multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(fields, torch_threads))
+    try:
+        with open(args.output, 'ab') as out:
+            if args.format == 'arrow' and out.tell() == 0:
+                # Record batches are appended after the schema; the end-of-stream marker follows the last one
+                out.write(arrow_ipc.schema_message(arrow_ipc.location_schema(args.fields)))
+            pending = deque()
+            max_in_flight = args.workers * 2
+
+            while True:
+                # Keep a bounded number of chunks in flight so memory does not grow with the input
+                while len(pending) < max_in_flight:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    start, lines = chunk
+                    pending.append(pool.apply_async(_parse_chunk, (start, lines, args.model_size, args.fields, args.format)))
+                if not pending:
+                    break
+
+                # Results are written in input order so the checkpoint is always a prefix
+                records, data = pending.popleft().get()
+                out.write(data)
+                out.flush()
+
+                processed += records
+                checkpoint.records_done += records
+                checkpoint.output_bytes = out.tell()
+                checkpoint.save()
+
+                now = time.time()
+                if now - last_report >= args.progress_interval:
+                    _report(checkpoint.records_done, total, processed, now - start_time)
+                    last_report = now
+
+            if args.format == 'arrow':
+                out.write(arrow_ipc.END_OF_STREAM)
+
+        pool.close()
+    except KeyboardInterrupt:
+        print(f"Interrupted after {checkpoint.records_done:,} records; rerun the same command to resume.", file=sys.stderr)
+        pool.terminate()
+        return 130
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    _report(checkpoint.records_done, total, processed, time.time() - start_time)
+    os.remove(checkpoint.path)
+    print(f"Finished: {checkpoint.records_done:,} records written to '{args.output}'", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.bulk',
+        description='Geoparse JSONL records offline with a pool of worker processes.'
+    )
+    parser.add_argument('inputs', nargs='+', help='Input JSONL files (.gz is decompressed)')
+    parser.add_argument('-o', '--output', required=True, help='Output JSONL file')
+    parser.add_argument('-w', '--workers', type=int, default=max((os.cpu_count() or 2) // 2, 1),
+                        help='Number of worker processes (default: half the CPUs)')
+    parser.add_argument('-b', '--batch-size', type=int, default=None,
+                        help='Records per parse_batch call (default and maximum: MAX_BATCH_SIZE)')
+    parser.add_argument('--model-size', default=None, help='Model size for all records')
+    parser.add_argument('--checkpoint', default=None, help='Checkpoint file (default: <output>.checkpoint)')
+    parser.add_argument('--id-field', default='id', help='Record field holding the id (default: id)')
+    parser.add_argument('--text-field', default='text', help='Record field holding the text (default: text)')
+    parser.add_argument('--languages-field', default='languages',
+                        help='Record field holding the language codes (default: languages)')
+    parser.add_argument('--format', choices=['jsonl', 'arrow'], default='jsonl',
+                        help='Output format: JSONL results or an Arrow IPC stream of locations (default: jsonl)')
+    parser.add_argument('--fields', default=None,
+                        help='Comma-separated location fields to write, e.g. geonameid,latitude,longitude (default: all)')
+    parser.add_argument('--no-count', action='store_true', help='Do not pre-count the input, i.e. no ETA')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='Seconds between progress reports')
+    args = parser.parse_args(argv)
+
+    if args.workers <= 0:
+        parser.error('--workers must be positive')
+    try:
+        args.fields = parse_fields(args.fields)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.format == 'arrow' and not arrow_ipc.available():
+        parser.error('--format arrow requires pyarrow')
+
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
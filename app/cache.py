@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory footprint of a cached value in bytes.
+    Walks dictionaries, lists and tuples; other objects are measured with sys.getsizeof.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with entry and byte budgets and optional TTL expiry.
+    """
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 0, ttl: float = 0):
+        """
+        Initialize the cache.
+
+        Parameters:
+        - max_entries: Maximum number of entries. 0 disables the entry budget.
+        - max_bytes: Maximum estimated size of all entries in bytes. 0 disables the byte budget.
+        - ttl: Time to live of an entry in seconds. 0 disables expiry.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # key -> (value, size, expires_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, count: bool = True) -> Optional[Dict]:
+        """
+        Return the cached value for the key and mark it as recently used, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] and entry[2] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Dict):
+        """
+        Insert or replace a value, evicting least recently used entries to stay within budget.
+        """
+        size = estimate_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            # A single value larger than the whole budget is never cached
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while self._entries and (
+                    (self.max_entries and len(self._entries) > self.max_entries) or
+                    (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        """
+        Remove an entry; the caller must hold the lock.
+        """
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> int:
+        """
+        Remove all entries and return how many were removed.
+        """
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return removed
+
+    def stats(self) -> Dict:
+        """
+        Get cache statistics.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+class PersistentCache:
+    """
+    Result cache stored in a local SQLite database and shared by all worker processes on a host.
+    Entries survive worker recycling; the database is compacted to stay within a byte budget.
+    """
+    def __init__(self, path: str, max_bytes: int = 0, ttl: float = 0, compact_interval: int = 200):
+        """
+        Initialize the cache and create the database if necessary.
+
+        Parameters:
+        - path: Path of the SQLite database file.
+        - max_bytes: Maximum size of all stored values in bytes. 0 disables compaction.
+        - ttl: Time to live of an entry in seconds. 0 disables expiry.
+        - compact_interval: Number of inserts by this process between two compaction checks.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compact_interval = compact_interval
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts_since_compaction = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, "
+            "value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed_at ON results (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread, reconnecting after a fork.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            # auto_vacuum only takes effect on a new database, before the journal mode is set
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def reset(self):
+        """
+        Drop the connection of the current thread, e.g. in a worker forked from a process that used it.
+        """
+        self._local = threading.local()
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Return the stored value for the key, or None on a miss or database error.
+        """
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT value, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or (row[1] and row[1] < now):
+                self._count('misses')
+                return None
+
+            conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count('hits')
+            return json.loads(row[0])
+
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Persistent cache lookup failed: {e}")
+            self._count('errors')
+            return None
+
+    def put(self, key: str, value: Dict):
+        """
+        Store a value, compacting the database every compact_interval inserts.
+        """
+        try:
+            data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+            now = time.time()
+            expires_at = now + self.ttl if self.ttl else 0
+            self._connection().execute(
+                "INSERT OR REPLACE INTO results (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), expires_at, now)
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Persistent cache insert failed: {e}")
+            self._count('errors')
+            return
+
+        with self._lock:
+            self._puts_since_compaction += 1
+            should_compact = self._puts_since_compaction >= self.compact_interval
+            if should_compact:
+                self._puts_since_compaction = 0
+
+        if should_compact:
+            self.compact()
+
+    def compact(self) -> int:
+        """
+        Remove expired entries and, if the byte budget is exceeded, the least recently
+        used entries until the database is at 90% of the budget.
+
+        Returns:
+        - The number of removed entries.
+        """
+        try:
+            conn = self._connection()
+            removed = conn.execute(
+                "DELETE FROM results WHERE expires_at > 0 AND expires_at < ?", (time.time(),)
+            ).rowcount
+
+            if self.max_bytes:
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                if total > self.max_bytes:
+                    to_free = total - int(self.max_bytes * 0.9)
+                    keys = []
+                    for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed_at"):
+                        keys.append((key,))
+                        to_free -= size
+                        if to_free <= 0:
+                            break
+                    conn.executemany("DELETE FROM results WHERE key = ?", keys)
+                    removed += len(keys)
+                    self._count('evictions', len(keys))
+
+            if removed:
+                conn.execute("PRAGMA incremental_vacuum")
+                logger.debug(f"Persistent cache compacted, removed {removed} entries.")
+            return removed
+
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache compaction failed: {e}")
+            self._count('errors')
+            return 0
+
+    def clear(self) -> int:
+        """
+        Remove all entries and return how many were removed, 0 on a database error.
+        """
+        try:
+            conn = self._connection()
+            removed = conn.execute("DELETE FROM results").rowcount
+            conn.execute("PRAGMA incremental_vacuum")
+            return removed
+
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache clear failed: {e}")
+            self._count('errors')
+            return 0
+
+    def stats(self) -> Dict:
+        """
+        Get cache statistics. Entry counts and sizes cover all workers, hit counters only this one.
+        """
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'errors': self.errors
+            }
@@ -0,0 +1,112 @@
+import re
+from typing import Dict, List, Tuple
+
+# Sentence ends: Latin punctuation followed by whitespace, CJK full-width punctuation
+# (which is usually not followed by a space) and line breaks. Closing quotes and
+# brackets stay with the sentence they close.
+_SENTENCE_END = re.compile(
+    r'[.!?]+["\'”’)\]]*\s+'
+    r'|[。！？]+["”’」』）]*\s*'
+    r'|\n\s*'
+)
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """
+    Split text into sentences.
+
+    Returns:
+    - A list of (start, end) character offsets that together cover the whole text.
+    """
+    spans = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() > start:
+            spans.append((start, match.end()))
+            start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def _split_long(text: str, span: Tuple[int, int], max_length: int) -> List[Tuple[int, int]]:
+    """
+    Split a sentence longer than max_length at whitespace, or hard if there is none.
+    """
+    start, end = span
+    pieces = []
+    while end - start > max_length:
+        cut = text.rfind(' ', start + 1, start + max_length)
+        if cut <= start:
+            cut = start + max_length
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def chunk_text(text: str, chunk_size: int, overlap: int = 1) -> List[Tuple[int, int, int]]:
+    """
+    Split text into chunks of whole sentences.
+
+    Each chunk holds up to chunk_size characters of new sentences (its core), preceded
+    by the last overlap sentences of the previous chunk as context.
+
+    Parameters:
+    - text: The text to split.
+    - chunk_size: Maximum number of characters in the core of a chunk.
+    - overlap: Number of sentences of the previous chunk repeated at the start of a chunk.
+
+    Returns:
+    - A list of (start, core_start, end) character offsets, one per chunk.
+    """
+    pieces = []
+    for span in split_sentences(text):
+        pieces.extend(_split_long(text, span, chunk_size))
+
+    chunks = []
+    i = 0
+    while i < len(pieces):
+        core_start = pieces[i][0]
+        j = i + 1
+        while j < len(pieces) and pieces[j][1] - core_start <= chunk_size:
+            j += 1
+        start = pieces[max(i - overlap, 0)][0]
+        chunks.append((start, core_start, pieces[j - 1][1]))
+        i = j
+    return chunks
+
+
+def merge_chunk_locations(chunks: List[Tuple[int, int, int]], chunk_locations: List[List[Dict]]) -> List[Dict]:
+    """
+    Map the locations found in each chunk to offsets in the original text and drop duplicates.
+
+    Locations in the overlap of a chunk belong to the previous chunk and are dropped, unless
+    they cross into the core of the chunk, i.e. were cut off at the end of the previous chunk.
+
+    Parameters:
+    - chunks: The (start, core_start, end) offsets returned by chunk_text.
+    - chunk_locations: The locations found in each chunk, with start_char and end_char relative to the chunk.
+
+    Returns:
+    - The locations of the whole text, ordered by start_char.
+    """
+    candidates = []
+    for (start, core_start, _), locations in zip(chunks, chunk_locations):
+        for location in locations:
+            location_start = start + location['start_char']
+            location_end = start + location['end_char']
+            if location_end <= core_start:
+                continue
+            location['start_char'] = location_start
+            location['end_char'] = location_end
+            candidates.append(location)
+
+    # Prefer the longest of overlapping mentions
+    candidates.sort(key=lambda location: (location['start_char'], -location['end_char']))
+    merged = []
+    for location in candidates:
+        if merged and location['start_char'] < merged[-1]['end_char']:
+            continue
+        merged.append(location)
+    return merged
@@ -1,6 +1,6 @@
 import os
 import logging
-from typing import List
+from typing import Dict, List
 from dataclasses import dataclass
 
 @dataclass
@@ -14,6 +14,27 @@ class GeoParserConfig:
     # Supported languages
     supported_languages: List[str] = None
 
+    # Model pool configurations
+    model_pool_max_models: int = 0  # 0 disables the instance budget
+    model_pool_max_memory_mb: int = 0  # 0 disables the memory budget
+    pinned_models: List[str] = None  # "lang:size" entries, None pins the default size of every supported language
+    model_concurrency: int = 1  # threads that may run the same model at the same time
+
+    # spaCy components turned off after loading a model: a list of component names or "auto"
+    # for all components not needed for NER and sentence boundaries. Empty keeps the full pipeline.
+    spacy_disable: List[str] = None
+    spacy_disable_by_language: Dict[str, List[str]] = None  # per-language overrides of spacy_disable
+    spacy_pipe_mode: str = "disable"  # "disable" keeps the components loaded, "exclude" removes them
+
+    # Intra-op threads per process for torch, 0 keeps the torch default
+    torch_num_threads: int = 0
+
+    # Inference backend: "local" runs the models in each web worker,
+    # "process" runs them in a separate pool of inference processes
+    inference_backend: str = "local"
+    inference_processes: int = 1
+    inference_socket_dir: str = "/tmp/geoparser-inference"
+
     # Model paths
     spacy_model_path: str = "/app/models/spacy"
     transformers_model_path: str = "/app/models/transformers"
@@ -24,6 +45,80 @@ class GeoParserConfig:
     timeout: int = 30  # seconds
     enable_cache: bool = True
     max_batch_size: int = 100
+    stream_window_size: int = 32  # items parsed together by /api/parse/stream
+
+    # Sentence-aligned chunking of /api/parse texts longer than chunk_size
+    enable_chunking: bool = False
+    chunk_size: int = 2000  # characters of new sentences per chunk
+    chunk_overlap: int = 1  # sentences of the previous chunk repeated as context
+    max_document_length: int = 1000000  # replaces max_text_length for chunked texts
+
+    # Micro-batching of concurrent /api/parse requests
+    enable_micro_batching: bool = False
+    micro_batch_max_size: int = 16
+    micro_batch_max_wait_ms: int = 5
+
+    # Cache configurations
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 268435456  # 256 MB, 0 disables the byte budget
+    cache_ttl: int = 0  # seconds, 0 disables expiry
+
+    # Sentence-level cache for texts that are re-sent with small edits
+    enable_sentence_cache: bool = False
+    sentence_cache_max_entries: int = 100000
+    sentence_cache_max_bytes: int = 134217728  # 128 MB, 0 disables the byte budget
+
+    # Toponym resolution cache shared by all models of a process
+    enable_resolution_cache: bool = False
+    resolution_cache_max_entries: int = 100000
+    resolution_context_chars: int = 64  # characters on each side of a mention in the cache key
+
+    # Precomputed candidate embeddings, built with `python -m app.build_index`
+    enable_embedding_index: bool = False
+    embedding_index_path: str = ""  # empty uses a path under geonames_data_path
+
+    # Columnar copy of the gazetteer locations, built with `python -m app.build_index records`
+    enable_gazetteer_store: bool = False
+    gazetteer_store_path: str = ""  # empty uses a path under geonames_data_path
+
+    # Identify the language of texts sent without languages; below the minimum confidence the
+    # first supported language is used. Off by default so such texts keep using English
+    enable_language_detection: bool = False
+    language_detection_min_confidence: float = 0.4
+
+    # Skip the geoparser for texts without plausible toponyms: off, conservative or aggressive
+    prefilter_mode: str = "off"
+    prefilter_path: str = ""  # empty uses a path under geonames_data_path
+
+    # Persistent cache shared by all workers on the host
+    enable_persistent_cache: bool = False
+    persistent_cache_path: str = "/app/data/cache/results.db"
+    persistent_cache_max_bytes: int = 1073741824  # 1 GB, 0 disables compaction
+
+    # Warm-up of the models loaded at startup, before /api/health/ready reports ready
+    enable_warmup: bool = True
+    warmup_corpus_path: str = ""  # optional JSONL corpus added to the built-in texts
+
+    # Prometheus metrics on /metrics, requires prometheus_client
+    enable_metrics: bool = True
+
+    # Response serialization: auto uses orjson if it is installed, json the standard library
+    json_encoder: str = "auto"
+    enable_compression: bool = True  # gzip or deflate, negotiated through Accept-Encoding
+    compression_min_size: int = 1024  # smaller bodies are sent uncompressed
+    compression_level: int = 6
+
+    # Asynchronous jobs on /api/jobs, parsed by job workers from a persistent SQLite queue
+    enable_jobs: bool = False
+    job_queue_path: str = "/app/data/jobs/jobs.db"
+    job_workers: int = 1
+    job_chunk_size: int = 32  # texts parsed at a time, capped at max_batch_size
+    job_max_texts: int = 100000
+    job_lease_seconds: int = 300  # chunks not completed in time are parsed again
+    job_max_attempts: int = 3
+    job_retention_seconds: int = 604800  # finished jobs are removed after a week
+    job_worker_nice: int = 10  # CPU priority of the job workers below the web workers
+    job_poll_interval: float = 1.0
 
     # Logging configurations
     log_level: str = "INFO"
@@ -38,6 +133,10 @@ class GeoParserConfig:
             self.supported_languages = ["en", "de", "fr", "zh", "es"]
         if self.available_model_sizes is None:
             self.available_model_sizes = ["sm", "md", "lg", "trf"]
+        if self.spacy_disable is None:
+            self.spacy_disable = []
+        if self.spacy_disable_by_language is None:
+            self.spacy_disable_by_language = {}
     
     @property
     def default_model_size(self) -> str:
@@ -49,12 +148,69 @@ class GeoParserConfig:
         if self.max_text_length <= 0:
             raise ValueError("max_text_length must be positive")
         
+        if self.model_pool_max_models < 0 or self.model_pool_max_memory_mb < 0:
+            raise ValueError("model_pool_max_models and model_pool_max_memory_mb must not be negative")
+        
+        if self.model_concurrency <= 0:
+            raise ValueError("model_concurrency must be positive")
+        
+        if self.spacy_pipe_mode not in ("disable", "exclude"):
+            raise ValueError("spacy_pipe_mode must be 'disable' or 'exclude'")
+        
+        if self.inference_backend not in ("local", "process"):
+            raise ValueError("inference_backend must be 'local' or 'process'")
+        
+        if self.inference_processes <= 0:
+            raise ValueError("inference_processes must be positive")
+        
         if self.max_batch_size <= 0:
             raise ValueError("max_batch_size must be positive")
         
+        if self.stream_window_size <= 0:
+            raise ValueError("stream_window_size must be positive")
+        
+        if self.chunk_size <= 0 or self.chunk_overlap < 0 or self.max_document_length <= 0:
+            raise ValueError("chunk_size and max_document_length must be positive and chunk_overlap must not be negative")
+        
+        if self.micro_batch_max_size <= 0 or self.micro_batch_max_wait_ms < 0:
+            raise ValueError("micro_batch_max_size must be positive and micro_batch_max_wait_ms must not be negative")
+        
         if self.timeout <= 0:
             raise ValueError("timeout must be positive")
         
+        if self.cache_max_entries < 0 or self.cache_max_bytes < 0 or self.cache_ttl < 0:
+            raise ValueError("cache_max_entries, cache_max_bytes and cache_ttl must not be negative")
+        
+        if self.sentence_cache_max_entries < 0 or self.sentence_cache_max_bytes < 0:
+            raise ValueError("sentence_cache_max_entries and sentence_cache_max_bytes must not be negative")
+        
+        if self.resolution_cache_max_entries < 0 or self.resolution_context_chars < 0:
+            raise ValueError("resolution_cache_max_entries and resolution_context_chars must not be negative")
+        
+        if not 0.0 <= self.language_detection_min_confidence <= 1.0:
+            raise ValueError("language_detection_min_confidence must be between 0 and 1")
+        
+        if self.prefilter_mode not in ("off", "conservative", "aggressive"):
+            raise ValueError("prefilter_mode must be 'off', 'conservative' or 'aggressive'")
+        
+        if self.persistent_cache_max_bytes < 0:
+            raise ValueError("persistent_cache_max_bytes must not be negative")
+        
+        if self.json_encoder not in ("auto", "orjson", "json"):
+            raise ValueError("json_encoder must be 'auto', 'orjson' or 'json'")
+        
+        if self.compression_min_size < 0 or not 1 <= self.compression_level <= 9:
+            raise ValueError("compression_min_size must not be negative and compression_level must be between 1 and 9")
+        
+        if self.job_workers < 0 or self.job_chunk_size <= 0 or self.job_max_texts <= 0:
+            raise ValueError("job_workers must not be negative and job_chunk_size and job_max_texts must be positive")
+        
+        if self.job_lease_seconds <= 0 or self.job_max_attempts <= 0 or self.job_poll_interval <= 0:
+            raise ValueError("job_lease_seconds, job_max_attempts and job_poll_interval must be positive")
+        
+        if self.job_retention_seconds < 0 or self.job_worker_nice < 0:
+            raise ValueError("job_retention_seconds and job_worker_nice must not be negative")
+        
         valid_log_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
         if self.log_level not in valid_log_levels:
             raise ValueError(f"log_level must be one of {valid_log_levels}")
@@ -71,17 +227,46 @@ def load_config() -> GeoParserConfig:
                 logging.warning(f"Invalid integer value for {value}, using default {default}")
                 return default
             
+        # Safe conversion of environment variables to float
+        def safe_float(value: str, default: float) -> float:
+            try:
+                return float(value)
+            except (ValueError, TypeError):
+                logging.warning(f"Invalid float value for {value}, using default {default}")
+                return default
+
         # Safe conversion of environment variables to boolean
         def safe_bool(value: str, default: bool) -> bool:
             if isinstance(value, str):
                 return value.lower() in ("true", "1", "yes", "on")
             return default
 
+        # Comma-separated spaCy component names
+        def components(value: str) -> List[str]:
+            return [component.strip() for component in value.split(",") if component.strip()]
+
+        supported_languages = os.getenv("SUPPORTED_LANGUAGES", "en,de,fr,zh,es").split(",")
+
         return GeoParserConfig(
             transformer_model=os.getenv("TRANSFORMER_MODEL", "dguzh/geo-all-MiniLM-L6-v2"),
             gazetteer=os.getenv("GAZETTEER", "geonames"),
             available_model_sizes=os.getenv("AVAILABLE_MODEL_SIZES", "sm,md,lg,trf").split(","),
-            supported_languages=os.getenv("SUPPORTED_LANGUAGES", "en,de,fr,zh,es").split(","),
+            supported_languages=supported_languages,
+            model_pool_max_models=safe_int(os.getenv("MODEL_POOL_MAX_MODELS", "0"), 0),
+            model_pool_max_memory_mb=safe_int(os.getenv("MODEL_POOL_MAX_MEMORY_MB", "0"), 0),
+            model_concurrency=safe_int(os.getenv("MODEL_CONCURRENCY", "1"), 1),
+            spacy_disable=components(os.getenv("SPACY_DISABLE", "")),
+            spacy_disable_by_language={
+                lang.strip(): components(os.getenv(f"SPACY_DISABLE_{lang.strip().upper()}"))
+                for lang in supported_languages
+                if os.getenv(f"SPACY_DISABLE_{lang.strip().upper()}") is not None
+            },
+            spacy_pipe_mode=os.getenv("SPACY_PIPE_MODE", "disable").lower(),
+            torch_num_threads=safe_int(os.getenv("TORCH_NUM_THREADS", "0"), 0),
+            pinned_models=[spec for spec in os.getenv("PINNED_MODELS").split(",") if spec.strip()] if os.getenv("PINNED_MODELS") is not None else None,
+            inference_backend=os.getenv("INFERENCE_BACKEND", "local").lower(),
+            inference_processes=safe_int(os.getenv("INFERENCE_PROCESSES", "1"), 1),
+            inference_socket_dir=os.getenv("INFERENCE_SOCKET_DIR", "/tmp/geoparser-inference"),
             spacy_model_path=os.getenv("SPACY_MODEL_PATH", "/app/models/spacy"),
             transformers_model_path=os.getenv("TRANSFORMERS_MODEL_PATH", "/app/models/transformers"),
             geonames_data_path=os.getenv("GEONAMES_DATA_PATH", "/app/data/geonames"),
@@ -89,6 +274,51 @@ def load_config() -> GeoParserConfig:
             timeout=safe_int(os.getenv("TIMEOUT", "30"), 30),
             enable_cache=safe_bool(os.getenv("ENABLE_CACHE", "true"), True),
             max_batch_size=safe_int(os.getenv("MAX_BATCH_SIZE", "100"), 100),
+            stream_window_size=safe_int(os.getenv("STREAM_WINDOW_SIZE", "32"), 32),
+            enable_chunking=safe_bool(os.getenv("ENABLE_CHUNKING", "false"), False),
+            chunk_size=safe_int(os.getenv("CHUNK_SIZE", "2000"), 2000),
+            chunk_overlap=safe_int(os.getenv("CHUNK_OVERLAP", "1"), 1),
+            max_document_length=safe_int(os.getenv("MAX_DOCUMENT_LENGTH", "1000000"), 1000000),
+            enable_micro_batching=safe_bool(os.getenv("ENABLE_MICRO_BATCHING", "false"), False),
+            micro_batch_max_size=safe_int(os.getenv("MICRO_BATCH_MAX_SIZE", "16"), 16),
+            micro_batch_max_wait_ms=safe_int(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"), 5),
+            cache_max_entries=safe_int(os.getenv("CACHE_MAX_ENTRIES", "10000"), 10000),
+            cache_max_bytes=safe_int(os.getenv("CACHE_MAX_BYTES", "268435456"), 268435456),
+            cache_ttl=safe_int(os.getenv("CACHE_TTL", "0"), 0),
+            enable_sentence_cache=safe_bool(os.getenv("ENABLE_SENTENCE_CACHE", "false"), False),
+            sentence_cache_max_entries=safe_int(os.getenv("SENTENCE_CACHE_MAX_ENTRIES", "100000"), 100000),
+            sentence_cache_max_bytes=safe_int(os.getenv("SENTENCE_CACHE_MAX_BYTES", "134217728"), 134217728),
+            enable_resolution_cache=safe_bool(os.getenv("ENABLE_RESOLUTION_CACHE", "false"), False),
+            resolution_cache_max_entries=safe_int(os.getenv("RESOLUTION_CACHE_MAX_ENTRIES", "100000"), 100000),
+            resolution_context_chars=safe_int(os.getenv("RESOLUTION_CONTEXT_CHARS", "64"), 64),
+            enable_embedding_index=safe_bool(os.getenv("ENABLE_EMBEDDING_INDEX", "false"), False),
+            embedding_index_path=os.getenv("EMBEDDING_INDEX_PATH", ""),
+            enable_gazetteer_store=safe_bool(os.getenv("ENABLE_GAZETTEER_STORE", "false"), False),
+            gazetteer_store_path=os.getenv("GAZETTEER_STORE_PATH", ""),
+            enable_language_detection=safe_bool(os.getenv("ENABLE_LANGUAGE_DETECTION", "false"), False),
+            language_detection_min_confidence=safe_float(os.getenv("LANGUAGE_DETECTION_MIN_CONFIDENCE", "0.4"), 0.4),
+            prefilter_mode=os.getenv("PREFILTER_MODE", "off").lower(),
+            prefilter_path=os.getenv("PREFILTER_PATH", ""),
+            enable_persistent_cache=safe_bool(os.getenv("ENABLE_PERSISTENT_CACHE", "false"), False),
+            persistent_cache_path=os.getenv("PERSISTENT_CACHE_PATH", "/app/data/cache/results.db"),
+            persistent_cache_max_bytes=safe_int(os.getenv("PERSISTENT_CACHE_MAX_BYTES", "1073741824"), 1073741824),
+            enable_warmup=safe_bool(os.getenv("ENABLE_WARMUP", "true"), True),
+            warmup_corpus_path=os.getenv("WARMUP_CORPUS_PATH", ""),
+            enable_metrics=safe_bool(os.getenv("ENABLE_METRICS", "true"), True),
+            json_encoder=os.getenv("JSON_ENCODER", "auto").lower(),
+            enable_compression=safe_bool(os.getenv("ENABLE_COMPRESSION", "true"), True),
+            compression_min_size=safe_int(os.getenv("COMPRESSION_MIN_SIZE", "1024"), 1024),
+            compression_level=safe_int(os.getenv("COMPRESSION_LEVEL", "6"), 6),
+            enable_jobs=safe_bool(os.getenv("ENABLE_JOBS", "false"), False),
+            job_queue_path=os.getenv("JOB_QUEUE_PATH", "/app/data/jobs/jobs.db"),
+            job_workers=safe_int(os.getenv("JOB_WORKERS", "1"), 1),
+            job_chunk_size=safe_int(os.getenv("JOB_CHUNK_SIZE", "32"), 32),
+            job_max_texts=safe_int(os.getenv("JOB_MAX_TEXTS", "100000"), 100000),
+            job_lease_seconds=safe_int(os.getenv("JOB_LEASE_SECONDS", "300"), 300),
+            job_max_attempts=safe_int(os.getenv("JOB_MAX_ATTEMPTS", "3"), 3),
+            job_retention_seconds=safe_int(os.getenv("JOB_RETENTION_SECONDS", "604800"), 604800),
+            job_worker_nice=safe_int(os.getenv("JOB_WORKER_NICE", "10"), 10),
+            job_poll_interval=safe_float(os.getenv("JOB_POLL_INTERVAL", "1.0"), 1.0),
             log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
             host=os.getenv("HOST", "0.0.0.0"),
             port=safe_int(os.getenv("PORT", "5000"), 5000),
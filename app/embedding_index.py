@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SUFFIXES = ('.json', '.ids.npy', '.embeddings.npy')
+
+
+def index_path(config) -> str:
+    """
+    Base path of the candidate embedding index for the configured gazetteer and transformer model.
+
+    The index consists of three files next to each other: <base>.embeddings.npy (float16 matrix,
+    one normalized row per location), <base>.ids.npy (sorted location ids) and <base>.json (metadata).
+    """
+    if config.embedding_index_path:
+        return config.embedding_index_path
+    model_name = re.sub(r'[^A-Za-z0-9._-]+', '_', config.transformer_model)
+    return os.path.join(config.geonames_data_path, f"{config.gazetteer}-{model_name}")
+
+
+class EmbeddingIndex:
+    """
+    Read-only, memory-mapped matrix of precomputed candidate embeddings.
+
+    Rows are L2-normalized, so the cosine similarity with a normalized context embedding is a
+    plain dot product. The files are mapped rather than read, so all processes on a host share
+    the same pages of the page cache.
+    """
+    def __init__(self, path: str):
+        """
+        Open an index built by build_index.
+
+        Parameters:
+        - path: Base path of the index files, see index_path.
+        """
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        self.ids = np.load(path + '.ids.npy', mmap_mode='r')
+        self.embeddings = np.load(path + '.embeddings.npy', mmap_mode='r')
+        if self.embeddings.shape[0] != len(self.ids):
+            raise ValueError(f"Index '{path}' has {self.embeddings.shape[0]} embeddings for {len(self.ids)} ids")
+        self.path = path
+
+    @property
+    def dimension(self) -> int:
+        return self.embeddings.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, location_ids: List[str]) -> np.ndarray:
+        """
+        Find the rows of a list of location ids.
+
+        Returns:
+        - An array with the row of each id, or -1 for ids that are not in the index.
+        """
+        rows = np.full(len(location_ids), -1, dtype=np.int64)
+        if not location_ids or not len(self.ids):
+            return rows
+
+        if self.metadata['id_type'] == 'int':
+            valid = np.array([str(location_id).isdigit() for location_id in location_ids], dtype=bool)
+            keys = np.array([int(location_id) if ok else -1 for location_id, ok in zip(location_ids, valid)], dtype=np.int64)
+        else:
+            encoded = [str(location_id).encode('utf-8') for location_id in location_ids]
+            # Longer ids would be truncated to the width of the array and could match another id
+            valid = np.array([len(key) <= self.ids.dtype.itemsize for key in encoded], dtype=bool)
+            keys = np.array(encoded, dtype=self.ids.dtype)
+
+        positions = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        found = valid & (self.ids[positions] == keys)
+        rows[found] = positions[found]
+        return rows
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Read the embeddings of the given rows as a float32 matrix.
+        """
+        return np.asarray(self.embeddings[rows], dtype=np.float32)
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'locations': len(self),
+            'dimension': self.dimension,
+            'size_bytes': self.embeddings.nbytes,
+            'transformer_model': self.metadata.get('transformer_model'),
+            'min_population': self.metadata.get('min_population'),
+            'built_at': self.metadata.get('built_at')
+        }
+
+
+def open_index(config) -> Optional[EmbeddingIndex]:
+    """
+    Open the candidate embedding index for the configured gazetteer and transformer model.
+
+    Returns:
+    - The index, or None if it does not exist or was built for another gazetteer or model.
+    """
+    path = index_path(config)
+    if not os.path.exists(path + '.json'):
+        logger.warning(f"Embedding index not found at '{path}'; candidates are embedded at request time. "
+                       f"Build it with 'python -m app.build_index'.")
+        return None
+
+    try:
+        index = EmbeddingIndex(path)
+    except Exception as e:
+        logger.error(f"Failed to open embedding index at '{path}': {e}")
+        return None
+
+    built_for = (index.metadata.get('gazetteer'), index.metadata.get('transformer_model'))
+    if built_for != (config.gazetteer, config.transformer_model):
+        logger.warning(f"Embedding index at '{path}' was built for {built_for}, not "
+                       f"{(config.gazetteer, config.transformer_model)}; ignoring it")
+        return None
+
+    logger.info(f"Embedding index enabled at '{path}' ({len(index):,} locations, {index.embeddings.nbytes / 1024 / 1024:.0f} MB)")
+    return index
+
+
+def build_index(
+    gazetteer,
+    transformer,
+    transformer_model: str,
+    path: str,
+    batch_size: int = 256,
+    min_population: int = 0,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    Embed the descriptions of all gazetteer locations and write them as an index.
+
+    The files are written under temporary names and renamed when complete, so a running
+    service never sees a partially written index.
+
+    Parameters:
+    - gazetteer: The geoparser gazetteer whose locations are embedded.
+    - transformer: The SentenceTransformer used for disambiguation.
+    - transformer_model: Name of the transformer model, stored in the metadata.
+    - path: Base path of the index files.
+    - batch_size: Number of locations embedded at once.
+    - min_population: Only index locations with at least this population (0 indexes all).
+    - progress: Called with (done, total) after every batch.
+
+    Returns:
+    - The metadata of the index.
+    """
+    identifier = gazetteer.config.location_identifier
+    columns = [column.name for column in gazetteer.config.location_columns]
+    if min_population and 'population' not in columns:
+        raise ValueError(f"Gazetteer '{gazetteer.config.name}' has no population column")
+
+    where, params = ("WHERE population >= ?", (min_population,)) if min_population else ("", ())
+    connection = sqlite3.connect(f"file:{gazetteer.db_path}?mode=ro", uri=True)
+    try:
+        total = connection.execute(f"SELECT COUNT(*) FROM locations {where}", params).fetchone()[0]
+        non_numeric = connection.execute(
+            f"SELECT 1 FROM locations WHERE {identifier} IS NULL OR {identifier} = '' OR {identifier} GLOB '*[^0-9]*' LIMIT 1"
+        ).fetchone()
+
+        # Rows must come out in the order of the id array so lookups can use binary search
+        if non_numeric is None:
+            id_type = 'int'
+            ids = np.empty(total, dtype=np.int64)
+            order = f"CAST({identifier} AS INTEGER)"
+        else:
+            id_type = 'str'
+            width = connection.execute(f"SELECT MAX(LENGTH(CAST({identifier} AS BLOB))) FROM locations").fetchone()[0] or 1
+            ids = np.empty(total, dtype=f'S{width}')
+            order = f"CAST({identifier} AS BLOB)"
+
+        dimension = transformer.get_sentence_embedding_dimension()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        embeddings = np.lib.format.open_memmap(path + '.embeddings.npy.tmp', mode='w+', dtype=np.float16, shape=(total, dimension))
+
+        cursor = connection.execute(f"SELECT * FROM locations {where} ORDER BY {order}", params)
+        done = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            locations = [dict(zip(columns, row)) for row in rows]
+            vectors = transformer.encode(
+                [gazetteer.get_location_description(location) for location in locations],
+                batch_size=batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+            embeddings[done:done + len(rows)] = vectors
+            ids[done:done + len(rows)] = [
+                int(location[identifier]) if id_type == 'int' else str(location[identifier]).encode('utf-8')
+                for location in locations
+            ]
+            done += len(rows)
+            if progress is not None:
+                progress(done, total)
+    finally:
+        connection.close()
+
+    embeddings.flush()
+    del embeddings
+    with open(path + '.ids.npy.tmp', 'wb') as f:
+        np.save(f, ids)
+
+    metadata = {
+        'gazetteer': gazetteer.config.name,
+        'transformer_model': transformer_model,
+        'dimension': dimension,
+        'locations': total,
+        'id_type': id_type,
+        'min_population': min_population,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    # The metadata file is renamed last: an index is only opened once it exists
+    for suffix in reversed(_SUFFIXES):
+        os.replace(path + suffix + '.tmp', path + suffix)
+    return metadata
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .utils import LOCATION_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Attributes stored for each location besides the geonameid
+STRING_COLUMNS = ('name', 'feature_type', 'admin2_name', 'admin1_name', 'country_name')
+NUMERIC_COLUMNS = {'latitude': np.float64, 'longitude': np.float64, 'elevation': np.int32, 'population': np.int64}
+
+# Missing values: -1 for string indexes, NaN for coordinates and the minimum for integers
+_MISSING_INT = {np.int32: np.iinfo(np.int32).min, np.int64: np.iinfo(np.int64).min}
+
+
+def store_path(config) -> str:
+    """
+    Base path of the gazetteer record store for the configured gazetteer.
+    """
+    if config.gazetteer_store_path:
+        return config.gazetteer_store_path
+    return os.path.join(config.geonames_data_path, f"{config.gazetteer}-records")
+
+
+class GazetteerStore:
+    """
+    Read-only, memory-mapped columnar copy of the gazetteer locations.
+
+    Each attribute is a NumPy array with one entry per location, ordered by geonameid. Text
+    attributes are indexes into a table of distinct strings stored as one UTF-8 buffer, so
+    repeated values such as feature types and country names are stored once. A lookup is a
+    binary search on the ids and an array index per attribute, without a database query.
+    """
+    def __init__(self, path: str, string_cache_size: int = 65536):
+        """
+        Open a store built by build_store.
+
+        Parameters:
+        - path: Base path of the store files, see store_path.
+        - string_cache_size: Number of decoded strings kept in memory.
+        """
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        self.ids = np.load(path + '.ids.npy', mmap_mode='r')
+        self.columns = {
+            column: np.load(f"{path}.{column}.npy", mmap_mode='r')
+            for column in (*STRING_COLUMNS, *NUMERIC_COLUMNS)
+        }
+        self.strings = np.load(path + '.strings.npy', mmap_mode='r')
+        self.string_offsets = np.load(path + '.string_offsets.npy', mmap_mode='r')
+        for column, values in self.columns.items():
+            if len(values) != len(self.ids):
+                raise ValueError(f"Store '{path}' has {len(values)} values of '{column}' for {len(self.ids)} ids")
+        self.path = path
+        self._string = lru_cache(maxsize=string_cache_size)(self._decode)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _decode(self, index: int) -> str:
+        return self.strings[self.string_offsets[index]:self.string_offsets[index + 1]].tobytes().decode('utf-8')
+
+    def rows(self, location_ids: List[Optional[str]]) -> np.ndarray:
+        """
+        Find the rows of a list of location ids.
+
+        Returns:
+        - An array with the row of each id, or -1 for ids that are None or not in the store.
+        """
+        rows = np.full(len(location_ids), -1, dtype=np.int64)
+        if not location_ids or not len(self.ids):
+            return rows
+
+        valid = np.array([location_id is not None and str(location_id).isdigit() for location_id in location_ids], dtype=bool)
+        keys = np.array([int(location_id) if ok else -1 for location_id, ok in zip(location_ids, valid)], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        found = valid & (self.ids[positions] == keys)
+        rows[found] = positions[found]
+        return rows
+
+    def _value(self, field: str, row: int):
+        """
+        Read one attribute of a row.
+        """
+        if field == 'geonameid':
+            return str(int(self.ids[row]))
+        if field in STRING_COLUMNS:
+            index = int(self.columns[field][row])
+            return self._string(index) if index >= 0 else None
+        if NUMERIC_COLUMNS[field] is np.float64:
+            value = float(self.columns[field][row])
+            return None if np.isnan(value) else value
+        value = int(self.columns[field][row])
+        return None if value == _MISSING_INT[NUMERIC_COLUMNS[field]] else value
+
+    def record(self, row: int, fields: Optional[Sequence[str]] = None) -> Dict:
+        """
+        Build the location data of a row, in the format of extract_location_data.
+        With fields, only those columns are read.
+        """
+        return {field: self._value(field, row) for field in fields or LOCATION_FIELDS}
+
+    def records(self, location_ids: List[Optional[str]], fields: Optional[Sequence[str]] = None) -> List[Optional[Dict]]:
+        """
+        Look up the location data of a list of location ids.
+
+        Parameters:
+        - location_ids: The location ids to look up.
+        - fields: The attributes to read, None for all attributes.
+
+        Returns:
+        - The location data of each id, or None for ids that are None or not in the store.
+        """
+        return [self.record(row, fields) if row >= 0 else None for row in self.rows(location_ids)]
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'locations': len(self),
+            'strings': len(self.string_offsets) - 1,
+            'size_bytes': self.ids.nbytes + self.strings.nbytes + self.string_offsets.nbytes +
+                          sum(values.nbytes for values in self.columns.values()),
+            'string_cache': self._string.cache_info()._asdict(),
+            'min_population': self.metadata.get('min_population'),
+            'built_at': self.metadata.get('built_at')
+        }
+
+
+def open_store(config) -> Optional[GazetteerStore]:
+    """
+    Open the gazetteer record store for the configured gazetteer.
+
+    Returns:
+    - The store, or None if it does not exist or was built for another gazetteer.
+    """
+    path = store_path(config)
+    if not os.path.exists(path + '.json'):
+        logger.warning(f"Gazetteer store not found at '{path}'; locations are read from the gazetteer database. "
+                       f"Build it with 'python -m app.build_index records'.")
+        return None
+
+    try:
+        store = GazetteerStore(path)
+    except Exception as e:
+        logger.error(f"Failed to open gazetteer store at '{path}': {e}")
+        return None
+
+    if store.metadata.get('gazetteer') != config.gazetteer:
+        logger.warning(f"Gazetteer store at '{path}' was built for '{store.metadata.get('gazetteer')}', "
+                       f"not '{config.gazetteer}'; ignoring it")
+        return None
+
+    logger.info(f"Gazetteer store enabled at '{path}' ({len(store):,} locations, {store.stats()['size_bytes'] / 1024 / 1024:.0f} MB)")
+    return store
+
+
+def build_store(
+    gazetteer,
+    path: str,
+    batch_size: int = 100000,
+    min_population: int = 0,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    Copy the locations of a gazetteer into a columnar store.
+
+    The files are written under temporary names and renamed when complete, so a running
+    service never sees a partially written store.
+
+    Parameters:
+    - gazetteer: The geoparser gazetteer whose locations are copied; its ids must be integers.
+    - path: Base path of the store files.
+    - batch_size: Number of rows read from the database at once.
+    - min_population: Only store locations with at least this population (0 stores all).
+    - progress: Called with (done, total) after every batch.
+
+    Returns:
+    - The metadata of the store.
+    """
+    identifier = gazetteer.config.location_identifier
+    columns = [column.name for column in gazetteer.config.location_columns]
+    missing = [column for column in (*STRING_COLUMNS, *NUMERIC_COLUMNS) if column not in columns]
+    if missing:
+        raise ValueError(f"Gazetteer '{gazetteer.config.name}' has no column(s) {missing}")
+
+    where, params = ("WHERE population >= ?", (min_population,)) if min_population else ("", ())
+    connection = sqlite3.connect(f"file:{gazetteer.db_path}?mode=ro", uri=True)
+    try:
+        non_numeric = connection.execute(
+            f"SELECT 1 FROM locations WHERE {identifier} IS NULL OR {identifier} = '' OR {identifier} GLOB '*[^0-9]*' LIMIT 1"
+        ).fetchone()
+        if non_numeric is not None:
+            raise ValueError(f"Gazetteer '{gazetteer.config.name}' has non-numeric ids")
+
+        total = connection.execute(f"SELECT COUNT(*) FROM locations {where}", params).fetchone()[0]
+        ids = np.empty(total, dtype=np.int64)
+        arrays = {column: np.empty(total, dtype=np.int32) for column in STRING_COLUMNS}
+        arrays.update({column: np.empty(total, dtype=dtype) for column, dtype in NUMERIC_COLUMNS.items()})
+
+        # Distinct strings in order of first appearance
+        string_index: Dict[str, int] = {}
+
+        def intern(value) -> int:
+            if value is None:
+                return -1
+            value = str(value)
+            index = string_index.get(value)
+            if index is None:
+                index = string_index[value] = len(string_index)
+            return index
+
+        def number(value, dtype):
+            if value is None or value == '':
+                return np.nan if dtype is np.float64 else _MISSING_INT[dtype]
+            try:
+                return float(value) if dtype is np.float64 else int(float(value))
+            except (TypeError, ValueError):
+                return np.nan if dtype is np.float64 else _MISSING_INT[dtype]
+
+        select = ', '.join([identifier, *STRING_COLUMNS, *NUMERIC_COLUMNS])
+        cursor = connection.execute(f"SELECT {select} FROM locations {where} ORDER BY CAST({identifier} AS INTEGER)", params)
+        done = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            end = done + len(rows)
+            ids[done:end] = [int(row[0]) for row in rows]
+            for offset, column in enumerate(STRING_COLUMNS, start=1):
+                arrays[column][done:end] = [intern(row[offset]) for row in rows]
+            for offset, (column, dtype) in enumerate(NUMERIC_COLUMNS.items(), start=1 + len(STRING_COLUMNS)):
+                arrays[column][done:end] = [number(row[offset], dtype) for row in rows]
+            done = end
+            if progress is not None:
+                progress(done, total)
+    finally:
+        connection.close()
+
+    encoded = [value.encode('utf-8') for value in string_index]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=string_offsets[1:])
+    strings = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    files = {'ids': ids, 'strings': strings, 'string_offsets': string_offsets, **arrays}
+    for name, values in files.items():
+        with open(f"{path}.{name}.npy.tmp", 'wb') as f:
+            np.save(f, values)
+
+    metadata = {
+        'gazetteer': gazetteer.config.name,
+        'locations': total,
+        'strings': len(encoded),
+        'min_population': min_population,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    # The metadata file is renamed last: a store is only opened once it exists
+    for name in files:
+        os.replace(f"{path}.{name}.npy.tmp", f"{path}.{name}.npy")
+    os.replace(path + '.json.tmp', path + '.json')
+    return metadata
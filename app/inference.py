@@ -0,0 +1,336 @@
+"""
+Inference backend that runs the models in a pool of dedicated processes.
+
+With INFERENCE_BACKEND=process the web workers do not load any model. GeoParserService
+sends each group of texts to one of the inference processes over a unix socket
+(multiprocessing.connection, pickled messages), so a slow parse only occupies an
+inference process and the web workers keep serving other requests.
+
+The pool is started by the Gunicorn master (see gunicorn.conf.py) or by app.main.
+A supervisor process restarts inference processes that exit.
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import logging
+import itertools
+import threading
+import dataclasses
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Tuple
+
+from .config import GeoParserConfig, load_config
+from .prefork import memory_report
+from .supervisor import SupervisorProcess, supervise, watch_parent
+
+logger = logging.getLogger(__name__)
+
+
+def socket_path(socket_dir: str, index: int) -> str:
+    """Path of the unix socket of the inference process with the given index."""
+    return os.path.join(socket_dir, f"inference-{index}.sock")
+
+
+def _authkey() -> bytes:
+    """
+    Key used to authenticate connections. multiprocessing passes it on to spawned
+    processes and forked Gunicorn workers inherit it from the master.
+    """
+    return bytes(multiprocessing.current_process().authkey)
+
+
+class InferenceClient:
+    """
+    Client used by the web workers to run inference in the inference processes.
+
+    Each thread keeps one connection per inference process. Requests are spread
+    round robin; a process that is not reachable is skipped.
+    """
+    def __init__(self, socket_dir: str, processes: int, timeout: float = 30):
+        """
+        Initialize the client.
+
+        Parameters:
+        - socket_dir: Directory holding the sockets of the inference processes.
+        - processes: Number of inference processes.
+        - timeout: Seconds to wait for an inference process to become available.
+        """
+        self.paths = [socket_path(socket_dir, index) for index in range(processes)]
+        self.timeout = timeout
+        self._local = threading.local()
+        self._next = itertools.count()
+
+    def _connections(self) -> Dict[str, object]:
+        # Connections are per thread and must not be reused in a forked child
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.pid = os.getpid()
+            self._local.connections = {}
+        return self._local.connections
+
+    def _connect(self, path: str):
+        connections = self._connections()
+        connection = connections.get(path)
+        if connection is None:
+            connection = Client(path, family='AF_UNIX', authkey=_authkey())
+            connections[path] = connection
+        return connection
+
+    def _drop(self, path: str):
+        connection = self._connections().pop(path, None)
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def reset(self):
+        """Close the connections of the current thread."""
+        for path in list(self._connections()):
+            self._drop(path)
+
+    def _request(self, message: tuple, path: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Send a message to one inference process and return its reply.
+
+        Parameters:
+        - message: Tuple of the message type and its arguments.
+        - path: Socket of the process to send the message to. Any process if None.
+        - timeout: Seconds to wait for a process to become available. Defaults to the client timeout.
+
+        Raises:
+        - RuntimeError if no inference process is available, the process exits while
+          handling the message or the message fails in the process.
+        """
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        while True:
+            if path is not None:
+                paths = [path]
+            else:
+                start = next(self._next) % len(self.paths)
+                paths = self.paths[start:] + self.paths[:start]
+
+            for candidate in paths:
+                try:
+                    connection = self._connect(candidate)
+                except (OSError, EOFError, multiprocessing.AuthenticationError):
+                    # Not started yet, still loading models or restarting
+                    self._drop(candidate)
+                    continue
+
+                try:
+                    connection.send(message)
+                except (OSError, EOFError):
+                    # The process went away since the connection was opened
+                    self._drop(candidate)
+                    continue
+
+                try:
+                    status, payload = connection.recv()
+                except (OSError, EOFError):
+                    # Not retried elsewhere: the same input could take down another process
+                    self._drop(candidate)
+                    raise RuntimeError("Inference process exited while handling the request")
+
+                if status != 'ok':
+                    raise RuntimeError(payload)
+                return payload
+
+            if time.time() >= deadline:
+                raise RuntimeError("No inference process is available")
+            time.sleep(0.2)
+
+    def run(
+            self,
+            lang_code: str,
+            model_size: str,
+            texts: List[str],
+            fields: Optional[Tuple[str, ...]] = None
+    ) -> List[List[Dict]]:
+        """
+        Parse a group of texts with the model for the language and size.
+        Each location has the start_char and end_char of its mention.
+        With fields, only those attributes of each location are extracted.
+
+        Returns:
+        - A list with the extracted locations for each input text, in input order.
+        """
+        return self._request(('parse', lang_code, model_size, texts, fields))
+
+    def stats(self) -> List[Dict]:
+        """
+        Get the statistics of every inference process.
+        """
+        stats = []
+        for index, path in enumerate(self.paths):
+            try:
+                process_stats = self._request(('stats',), path=path, timeout=0)
+                process_stats['available'] = True
+            except RuntimeError as e:
+                process_stats = {'available': False, 'error': str(e)}
+            process_stats['index'] = index
+            stats.append(process_stats)
+        return stats
+
+
+def _handle_connection(service, connection, counters: Dict):
+    """Serve the messages of one client connection until it is closed."""
+    with connection:
+        while True:
+            try:
+                message = connection.recv()
+            except (OSError, EOFError):
+                return
+
+            try:
+                if message[0] == 'parse':
+                    _, lang_code, model_size, texts, fields = message
+                    reply = ('ok', service._run_inference(lang_code, model_size, texts, fields=fields))
+                    with counters['lock']:
+                        counters['requests'] += 1
+                        counters['texts'] += len(texts)
+                elif message[0] == 'stats':
+                    reply = ('ok', {
+                        'pid': os.getpid(),
+                        'loaded_models': [f"{lang}:{size}" for lang, size in service.models.keys()],
+                        'model_pool': service.models.stats(),
+                        'spacy_pipelines': service.spacy_pipelines(),
+                        'warmup': service._warmup,
+                        'resolution_cache': service._resolution_cache.stats() if service._resolution_cache is not None else None,
+                        'embedding_index': service._embedding_index.stats() if service._embedding_index is not None else None,
+                        'gazetteer_store': service._gazetteer_store.stats() if service._gazetteer_store is not None else None,
+                        'requests': counters['requests'],
+                        'texts': counters['texts'],
+                        'process_memory': memory_report()
+                    })
+                else:
+                    reply = ('error', f"Unknown message '{message[0]}'")
+            except Exception as e:
+                reply = ('error', str(e))
+
+            try:
+                connection.send(reply)
+            except (OSError, EOFError):
+                return
+
+
+def _serve(index: int, path: str, parent_pid: int):
+    """
+    Entry point of an inference process: load the models and serve parse requests.
+    """
+    # Shutdown is driven by the supervisor, not by Ctrl+C in the terminal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from .service import GeoParserService
+
+    base_config = load_config()
+    logging.basicConfig(
+        level=getattr(logging, base_config.log_level.upper()),
+        format=f'%(asctime)s - inference-{index} - %(name)s - %(levelname)s - %(message)s',
+    )
+    # Caching, prefiltering and micro-batching happen in the web workers
+    config = dataclasses.replace(
+        base_config,
+        inference_backend='local',
+        enable_cache=False,
+        enable_persistent_cache=False,
+        enable_micro_batching=False,
+        prefilter_mode='off'
+    )
+
+    threading.Thread(target=watch_parent, args=(parent_pid,), daemon=True).start()
+
+    service = GeoParserService(config)
+
+    if os.path.exists(path):
+        os.unlink(path)
+    # The socket only appears once the models are loaded, so clients never wait on a loading process
+    listener = Listener(path, family='AF_UNIX', authkey=_authkey())
+    logger.info(f"Inference process {index} (pid {os.getpid()}) listening on '{path}'")
+
+    counters = {'requests': 0, 'texts': 0, 'lock': threading.Lock()}
+    while True:
+        try:
+            connection = listener.accept()
+        except (OSError, EOFError) as e:
+            # Failed handshakes, e.g. a client with a wrong key
+            logger.warning(f"Rejected inference connection: {e}")
+            continue
+        threading.Thread(target=_handle_connection, args=(service, connection, counters), daemon=True).start()
+
+
+def _supervise(processes: int, socket_dir: str, parent_pid: int):
+    """
+    Main loop of the supervisor process: run the inference processes and restart them when they exit.
+    """
+    supervise(
+        processes,
+        _serve,
+        lambda index: (index, socket_path(socket_dir, index), os.getpid()),
+        label='Inference process',
+        name='geoparser-inference',
+        parent_pid=parent_pid
+    )
+
+
+class InferencePool:
+    """
+    Handle on the supervisor process that runs the inference processes.
+    """
+    def __init__(self, config: GeoParserConfig):
+        """
+        Initialize the pool.
+
+        Parameters:
+        - config: GeoParserConfig object containing configuration settings.
+        """
+        self.processes = config.inference_processes
+        self.socket_dir = config.inference_socket_dir
+        self._supervisor = SupervisorProcess('app.inference')
+
+    def start(self) -> 'InferencePool':
+        """
+        Start the supervisor, which starts the inference processes.
+        """
+        os.makedirs(self.socket_dir, mode=0o700, exist_ok=True)
+        # Clients authenticate with the key of this process, passed to the supervisor over its stdin
+        self._supervisor.start(
+            ['--processes', str(self.processes), '--socket-dir', self.socket_dir],
+            secret=_authkey().hex().encode()
+        )
+        logger.info(f"Started inference pool with {self.processes} processes (supervisor pid {self._supervisor.pid})")
+        return self
+
+    def stop(self, timeout: float = 15):
+        """
+        Stop the supervisor and the inference processes.
+        """
+        if not self._supervisor.stop(timeout):
+            return
+
+        for index in range(self.processes):
+            path = socket_path(self.socket_dir, index)
+            if os.path.exists(path):
+                os.unlink(path)
+        logger.info("Stopped inference pool")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m app.inference', description='Run the GeoParser inference processes.')
+    parser.add_argument('--processes', type=int, required=True)
+    parser.add_argument('--socket-dir', required=True)
+    parser.add_argument('--parent-pid', type=int, required=True)
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    logging.basicConfig(
+        level=getattr(logging, config.log_level.upper()),
+        format='%(asctime)s - inference-supervisor - %(name)s - %(levelname)s - %(message)s',
+    )
+
+    # Clients authenticate with the key of the process that started the pool
+    multiprocessing.current_process().authkey = bytes.fromhex(sys.stdin.read().strip())
+    _supervise(args.processes, args.socket_dir, args.parent_pid)
+
@@ -0,0 +1,512 @@
+"""
+Asynchronous parse jobs for large workloads, backed by a persistent queue in a local SQLite file.
+
+POST /api/jobs stores the texts of a job in chunks of JOB_CHUNK_SIZE and returns at once. Job
+workers, separate processes started with the server (see gunicorn.conf.py), lease the chunks
+one at a time, parse them with GeoParserService.parse_batch and store one result per text, so
+bulk submitters never hold a web worker and progress and results can be read while a job runs.
+
+A leased chunk that is not completed within JOB_LEASE_SECONDS, e.g. because its worker was
+killed or the server restarted, is leased again; after JOB_MAX_ATTEMPTS leases its texts get an
+error result. Jobs therefore survive restarts of the workers and of the server. Cancelled jobs
+keep the results of the chunks finished so far; finished jobs are removed after
+JOB_RETENTION_SECONDS.
+"""
+import os
+import json
+import math
+import time
+import uuid
+import signal
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import dataclasses
+from typing import Dict, List, Optional, Sequence
+
+from .config import GeoParserConfig, load_config
+from .supervisor import SupervisorProcess, supervise, watch_parent
+from . import serialization
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'cancelled')
+
+# Seconds between two purges of expired jobs by a worker
+_PURGE_INTERVAL = 3600.0
+
+
+class JobQueue:
+    """
+    Jobs, their pending chunks and their results in a SQLite database shared by the web workers
+    and the job workers.
+    """
+    def __init__(self, path: str, chunk_size: int = 32, lease_seconds: float = 300, max_attempts: int = 3):
+        """
+        Initialize the queue and create the database if necessary.
+
+        Parameters:
+        - path: Path of the SQLite database file.
+        - chunk_size: Number of texts a job worker parses at a time.
+        - lease_seconds: Time after which a chunk that was not completed is leased again.
+        - max_attempts: Number of leases of a chunk before its texts are given up.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "status TEXT NOT NULL, "
+            "model_size TEXT, "
+            "fields TEXT, "
+            "total INTEGER NOT NULL, "
+            "processed INTEGER NOT NULL DEFAULT 0, "
+            "failed INTEGER NOT NULL DEFAULT 0, "
+            "chunks INTEGER NOT NULL, "
+            "chunks_done INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, "
+            "started_at REAL, "
+            "finished_at REAL)"
+        )
+        # Only chunks that still have to be parsed are stored; a chunk is deleted when its results are
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "job_id TEXT NOT NULL, "
+            "chunk INTEGER NOT NULL, "
+            "start INTEGER NOT NULL, "
+            "items BLOB NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "lease_owner TEXT, "
+            "lease_expires REAL NOT NULL DEFAULT 0, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (job_id, chunk))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "job_id TEXT NOT NULL, "
+            "position INTEGER NOT NULL, "
+            "result BLOB NOT NULL, "
+            "PRIMARY KEY (job_id, position))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread, reconnecting after a fork.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Submitting a large job holds the write lock for a while, so waits are longer than in the cache
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def submit(self, texts: List, model_size: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> Dict:
+        """
+        Store a job and its chunks.
+
+        Parameters:
+        - texts: The items to parse, in the format of GeoParserService.parse_batch.
+        - model_size: Optional model size to use for parsing.
+        - fields: Optional location attributes to return, None for all attributes.
+
+        Returns:
+        - The status of the new job.
+        """
+        job_id = uuid.uuid4().hex
+        chunks = math.ceil(len(texts) / self.chunk_size)
+        rows = (
+            (job_id, index, start, serialization.dumps(texts[start:start + self.chunk_size]))
+            for index, start in enumerate(range(0, len(texts), self.chunk_size))
+        )
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, status, model_size, fields, total, chunks, created_at) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, model_size, json.dumps(list(fields)) if fields is not None else None, len(texts), chunks, time.time())
+            )
+            conn.executemany("INSERT INTO chunks (job_id, chunk, start, items) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Queued job {job_id} with {len(texts)} texts in {chunks} chunks")
+        return self.status(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        Get the status and progress of a job, or None if there is no such job.
+        """
+        row = self._connection().execute(
+            "SELECT id, status, model_size, fields, total, processed, failed, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, status, model_size, fields, total, processed, failed, created_at, started_at, finished_at = row
+        return {
+            'job_id': job_id,
+            'status': status,
+            'model_size': model_size,
+            'fields': json.loads(fields) if fields is not None else None,
+            'total': total,
+            'processed': processed,
+            'failed': failed,
+            'progress': processed / total if total else 1.0,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at
+        }
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Cancel a queued or running job. Chunks being parsed are finished, the others dropped.
+
+        Returns:
+        - The status of the job, or None if there is no such job.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cancelled = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            ).rowcount
+            if cancelled:
+                conn.execute("DELETE FROM chunks WHERE job_id = ? AND status = 'pending'", (job_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if cancelled:
+            logger.info(f"Cancelled job {job_id}")
+        return self.status(job_id)
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
+        """
+        Get the results of the texts at positions offset to offset + limit of a job.
+
+        Texts that have not been parsed yet are left out; every result carries the position
+        of its text in the job as 'index'.
+        """
+        rows = self._connection().execute(
+            "SELECT position, result FROM results WHERE job_id = ? AND position >= ? AND position < ? ORDER BY position",
+            (job_id, offset, offset + limit)
+        ).fetchall()
+        results = []
+        for position, data in rows:
+            result = json.loads(data)
+            result['index'] = position
+            results.append(result)
+        return results
+
+    def lease(self, owner: str) -> Optional[Dict]:
+        """
+        Lease the next chunk to parse, from the oldest job first.
+
+        Chunks whose lease expired are leased again. A chunk that has been leased max_attempts
+        times without being completed is finished with an error result for each text.
+
+        Parameters:
+        - owner: Identifier of the job worker, checked when the chunk is completed.
+
+        Returns:
+        - The task with the job id, chunk, start position, items, model size and fields,
+          or None if there is nothing to do.
+        """
+        conn = self._connection()
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT c.job_id, c.chunk, c.start, c.items, c.attempts, j.model_size, j.fields "
+                    "FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                    "WHERE j.status IN ('queued', 'running') "
+                    "AND (c.status = 'pending' OR c.lease_expires < ?) "
+                    "ORDER BY j.created_at, c.chunk LIMIT 1", (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                job_id, chunk, start, items, attempts, model_size, fields = row
+                items = json.loads(items)
+                if attempts >= self.max_attempts:
+                    # Most likely a text that crashes the worker every time
+                    logger.error(f"Giving up chunk {chunk} of job {job_id} after {attempts} attempts")
+                    error = {'success': False, 'error': f'Parsing failed after {attempts} attempts', 'locations': []}
+                    self._finish_chunk(conn, job_id, chunk, start, [error] * len(items), now)
+                    conn.execute("COMMIT")
+                    continue
+
+                conn.execute(
+                    "UPDATE chunks SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE job_id = ? AND chunk = ?", (owner, now + self.lease_seconds, job_id, chunk)
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ? AND status = 'queued'",
+                    (now, job_id)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            return {
+                'job_id': job_id,
+                'chunk': chunk,
+                'start': start,
+                'items': items,
+                'owner': owner,
+                'model_size': model_size,
+                'fields': json.loads(fields) if fields is not None else None
+            }
+
+    def complete(self, task: Dict, results: List[Dict]) -> bool:
+        """
+        Store the results of a leased chunk.
+
+        Returns:
+        - False if the lease was lost, e.g. because it expired and another worker took the chunk.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            owned = conn.execute(
+                "SELECT 1 FROM chunks WHERE job_id = ? AND chunk = ? AND status = 'leased' AND lease_owner = ?",
+                (task['job_id'], task['chunk'], task['owner'])
+            ).fetchone()
+            if owned:
+                self._finish_chunk(conn, task['job_id'], task['chunk'], task['start'], results, time.time())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if not owned:
+            logger.warning(f"Lease of chunk {task['chunk']} of job {task['job_id']} was lost, discarding its results")
+        return bool(owned)
+
+    def release(self, task: Dict):
+        """
+        Return a leased chunk to the queue, e.g. after an error, so it is leased again.
+        """
+        self._connection().execute(
+            "UPDATE chunks SET status = 'pending', lease_owner = NULL, lease_expires = 0 "
+            "WHERE job_id = ? AND chunk = ? AND status = 'leased' AND lease_owner = ?",
+            (task['job_id'], task['chunk'], task['owner'])
+        )
+
+    def _finish_chunk(self, conn: sqlite3.Connection, job_id: str, chunk: int, start: int, results: List[Dict], now: float):
+        """
+        Store the results of a chunk and update the progress of its job, inside a transaction.
+        """
+        conn.execute("DELETE FROM chunks WHERE job_id = ? AND chunk = ?", (job_id, chunk))
+        conn.executemany(
+            "INSERT OR REPLACE INTO results (job_id, position, result) VALUES (?, ?, ?)",
+            ((job_id, start + offset, serialization.dumps(result)) for offset, result in enumerate(results))
+        )
+        conn.execute(
+            "UPDATE jobs SET processed = processed + ?, failed = failed + ?, chunks_done = chunks_done + 1 WHERE id = ?",
+            (len(results), sum(1 for result in results if not result.get('success', False)), job_id)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'completed', finished_at = ? WHERE id = ? AND status = 'running' AND chunks_done >= chunks",
+            (now, job_id)
+        )
+
+    def purge(self, retention: float) -> int:
+        """
+        Remove completed and cancelled jobs that finished more than retention seconds ago.
+
+        Returns:
+        - The number of removed jobs.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('completed', 'cancelled') AND finished_at < ?",
+                (time.time() - retention,)
+            )]
+            for job_id in expired:
+                conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM chunks WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if expired:
+            logger.info(f"Removed {len(expired)} expired jobs")
+        return len(expired)
+
+    def stats(self) -> Dict:
+        """
+        Get the number of jobs by status and of texts waiting to be parsed.
+        """
+        conn = self._connection()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        pending = conn.execute(
+            "SELECT COALESCE(SUM(total - processed), 0) FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchone()[0]
+        return {
+            'path': self.path,
+            'jobs': {status: counts.get(status, 0) for status in JOB_STATUSES},
+            'pending_texts': pending
+        }
+
+
+def open_queue(config: GeoParserConfig) -> JobQueue:
+    """ The job queue of a configuration """
+    return JobQueue(
+        config.job_queue_path,
+        chunk_size=min(config.job_chunk_size, config.max_batch_size),
+        lease_seconds=config.job_lease_seconds,
+        max_attempts=config.job_max_attempts
+    )
+
+
+def _work(index: int, parent_pid: int):
+    """
+    Entry point of a job worker: parse leased chunks until the worker is stopped.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The chunk being parsed is finished before exiting; if that takes too long its lease expires
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+
+    from .service import GeoParserService
+    from .prefork import configure_torch_threads
+
+    base_config = load_config()
+    logging.basicConfig(
+        level=getattr(logging, base_config.log_level.upper()),
+        format=f'%(asctime)s - job-worker-{index} - %(name)s - %(levelname)s - %(message)s',
+    )
+    threading.Thread(target=watch_parent, args=(parent_pid,), daemon=True).start()
+
+    # Below the web workers in CPU priority, so interactive requests are served first
+    if base_config.job_worker_nice > 0:
+        os.nice(base_config.job_worker_nice)
+
+    # The job workers run their own models; nobody else waits on them, so there is nothing to micro-batch
+    config = dataclasses.replace(
+        base_config,
+        inference_backend='local',
+        enable_micro_batching=False,
+        torch_num_threads=base_config.torch_num_threads if base_config.torch_num_threads > 0
+        else max(1, (os.cpu_count() or 1) // max(1, base_config.job_workers))
+    )
+    configure_torch_threads(config.torch_num_threads)
+    serialization.setup(config.json_encoder)
+
+    service = GeoParserService(config)
+    queue = open_queue(config)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Job worker {index} (pid {os.getpid()}) processing jobs from '{config.job_queue_path}'")
+
+    last_purge = 0.0
+    while not stopping.is_set():
+        try:
+            if time.time() - last_purge >= _PURGE_INTERVAL:
+                queue.purge(config.job_retention_seconds)
+                last_purge = time.time()
+            task = queue.lease(owner)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to lease a job chunk: {e}")
+            stopping.wait(config.job_poll_interval)
+            continue
+
+        if task is None:
+            stopping.wait(config.job_poll_interval)
+            continue
+
+        try:
+            results = service.parse_batch_isolated(task['items'], model_size=task['model_size'], fields=task['fields'])
+            if len(results) != len(task['items']):
+                # Errors of the whole batch, e.g. an invalid field projection, apply to every text
+                results = [results[0]] * len(task['items'])
+            queue.complete(task, results)
+        except Exception as e:
+            logger.error(f"Failed to parse chunk {task['chunk']} of job {task['job_id']}: {e}")
+            try:
+                queue.release(task)
+            except sqlite3.Error:
+                # The lease expires instead
+                pass
+
+    logger.info(f"Job worker {index} stopped")
+
+
+def _supervise(workers: int, parent_pid: int):
+    """
+    Main loop of the supervisor process: run the job workers and restart them when they exit.
+    """
+    supervise(
+        workers,
+        _work,
+        lambda index: (index, os.getpid()),
+        label='Job worker',
+        name='geoparser-job-worker',
+        parent_pid=parent_pid
+    )
+
+
+class JobRunner:
+    """
+    Handle on the supervisor process that runs the job workers.
+    """
+    def __init__(self, config: GeoParserConfig):
+        """
+        Initialize the runner.
+
+        Parameters:
+        - config: GeoParserConfig object containing configuration settings.
+        """
+        self.workers = config.job_workers
+        self._supervisor = SupervisorProcess('app.jobs')
+
+    def start(self) -> 'JobRunner':
+        """
+        Start the supervisor, which starts the job workers.
+        """
+        self._supervisor.start(['--workers', str(self.workers)])
+        logger.info(f"Started {self.workers} job workers (supervisor pid {self._supervisor.pid})")
+        return self
+
+    def stop(self, timeout: float = 15):
+        """
+        Stop the supervisor and the job workers.
+        """
+        if self._supervisor.stop(timeout):
+            logger.info("Stopped job workers")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m app.jobs', description='Run the GeoParser job workers.')
+    parser.add_argument('--workers', type=int, required=True)
+    parser.add_argument('--parent-pid', type=int, required=True)
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    logging.basicConfig(
+        level=getattr(logging, config.log_level.upper()),
+        format='%(asctime)s - job-supervisor - %(name)s - %(levelname)s - %(message)s',
+    )
+    _supervise(args.workers, args.parent_pid)
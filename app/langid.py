@@ -0,0 +1,198 @@
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Languages written in their own script are identified by the script alone
+_SCRIPTS = [
+    ('ko', re.compile(r'[\uac00-\ud7af\u1100-\u11ff\u3130-\u318f]')),
+    ('ja', re.compile(r'[\u3040-\u30ff]')),
+    ('zh', re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')),
+    ('el', re.compile(r'[\u0370-\u03ff\u1f00-\u1fff]')),
+    ('cyrillic', re.compile(r'[\u0400-\u04ff]')),
+    ('latin', re.compile(r'[A-Za-z\u00c0-\u024f]')),
+]
+_LETTERS = re.compile(r'[^\W\d_]+')
+
+# Most frequent words of each language, from which the character n-gram profiles are built.
+# Function words carry most of the signal in short texts, and the n-grams of these words
+# generalize to the spelling conventions of other words of the language.
+_WORDS = {
+    'latin': {
+        'en': "the of and to a in is that for it as was with be by on not he i this are or his from at which but have an they you were her she there one all we their has been would when who will more if out so up said what about can other into them than only its time could new some these two may first then do any like my now over such our man me even most made after also did many before must through back years where much your way well down should because each just those people how too little state good very make world still own see men work long get here between both life being under never day same another know while last might us great old year off come since against go came right used take three",
+        'de': "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war haben nur oder aber vor zur bis mehr durch man sein wurde sei prozent hatte kann gegen vom können schon wenn habe seine ihre dann unter wir soll ich eines jahr zwei jahren diese dieser wieder keine seiner worden will zwischen immer was sagte gibt alle diesem seit muss wurden beim doch jetzt weil waren heute weiter sehr ohne",
+        'fr': "de la le et les des en un du une que est pour qui dans a par plus pas au sur ne se ce il sont avec son cette aux elle mais ou comme y été tout nous sa leur ont on ses ces fait deux même bien aussi peut entre très sans dont était après faire avant encore autres depuis tous lui sous nos notre leurs contre donc où moins déjà alors quand ans cela fois chez toute si avait être vous je ma mon mes ta ton tu moi peu selon année",
+        'es': "de la que el en y a los se del las un por con no una su para es al lo como más pero sus le ya o este sí porque esta entre cuando muy sin sobre también me hasta hay donde quien desde todo nos durante todos uno les ni contra otros ese eso ante ellos e esto mí mi tu te ir hacer puede bien ahora vez así día antes algunos qué unos yo otro otras otra él tanto esa estos mucho quienes nada muchos cual poco ella estar estas algunas algo nosotros año años fue ha han era",
+        'it': "di e il la che in a per un è del non una le si i con da al dei delle della gli come anche più ma sono nel alla lo ha ci ne se o questo quando essere tra stato fatto dopo ancora suo sua loro nella solo cui mi perché hanno era molto tutti tutto già due questa anni fra sul così poi quello dal degli ad nei può io noi dove senza sempre ogni fare",
+        'pt': "de a o que e do da em um para é com não uma os no se na por mais as dos como mas foi ao ele das tem à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso ela entre era depois sem mesmo aos ter seus quem nas me esse eles estão você tinha foram essa num nem suas meu às minha têm numa pelos elas havia seja qual será nós lhe deles essas esses pelas este fosse dele anos ano",
+        'nl': "de en van het een in is dat op te zijn voor met die niet aan er om ook als bij of door maar uit dan over worden nog wordt naar tot wel kan meer ze hij al heeft was zich deze wat moet werd geen zo hun ik jaar tussen veel onder na we heb hebben geweest twee omdat waren toen zou kunnen sinds alleen hier daar zij",
+        'ca': "de la i el que a en les l els un per d amb no una del es s al com més o va però ha seu han fer tot sobre ja aquest també ser són ni aquesta hi entre on quan ell ells era fins molt perquè sense sí tots des pot any anys dues dos després però cap mateix nostra",
+        'ro': "de și în a la cu pe din care nu un o să se este că pentru mai sunt ca al au fost iar dar prin ce ei lui după sau între fi acest această fără până doar vor poate care cel cea ani anul foarte acum când unde noi eu el ea lor avea are fost sale sau toate toți",
+        'sv': "och i att det som en på är av för med till den har de inte om ett han men var jag sig från vi så kan man när år säger hon under också efter eller nu sin där vid mot ska skulle kommer ut få får finns bara hade alla två andra mycket än sedan dem här in åt över honom",
+        'da': "og i at det er en til på som de med af for ikke den har der et var om vi men han så kan jeg fra også efter skal sig ud eller hun når være blev nu år have havde alle over hvor mange to under da hvis andre kun vil ved mod sin meget dem mellem her selv",
+        'nb': "og i det som på er en til av at for med har de ikke den han om et var jeg men så vi fra kan seg også etter skal ut eller hun når være ble nå år hadde alle over hvor mange to under da hvis andre bare vil ved mot sin mye dem mellom her selv blir noen",
+        'fi': "ja on ei se että oli hän mutta kuin myös tai ovat jo kun mukaan sen vuonna sekä jotka joka nyt tämä ole olla hänen niin vain kanssa mitä jos vielä ennen sitten kaikki voi koska sitä olisi ollut minä me he tässä siitä pitää hyvin aina paljon kaksi",
+        'pl': "w i na z do się nie że to jest o jak a co od po przez za tak ale dla jego już są tym roku może był lub tylko jej przy czy był być ich oraz jednak które który która te także było więc kiedy gdzie bardzo ze ma mnie ja my on ona oni dwa lat",
+        'hr': "i je u se na da su za od a s o iz ne to kao koji koja koje će bi sa što ali bio bila godine samo još nije po do sve ili može već te pa biti kada gdje vrlo ima smo sam mi on ona oni dva nakon prema između",
+        'sl': "in je v na se da za so z s pa ki od tudi po ne iz bi ter kot so bo do lahko še le ali pri to ga jih smo sem mi on ona oni dva leta let zelo kjer kdaj že samo vse med",
+        'lt': "ir į kad su iš už tai yra buvo ne kaip bet jo jos o per apie dar nuo iki arba metų mes jie jis ji taip tik kur kai labai du po prie tarp šis ši bus gali",
+    },
+    'cyrillic': {
+        'ru': "и в не на я что он с как а то все она так его но да ты к у же вы за бы по только ее мне было вот от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже себе под будет ж тогда кто этот году года",
+        'uk': "і в не на що я з він як а та це все вона так його але ти до у же ви за б по тільки її мені було ось від мене ще ні о із йому тепер коли навіть ну якщо вже або бути був нього вам там потім себе нічого їй може вони тут де є треба для ми тебе їх чим була сам без також під буде хто цей році року",
+        'mk': "и во на не да се со од што е за ги ја го тоа тој таа ние вие тие ќе беше би како но или само уште сега кога каде многу два години година сите меѓу по пред",
+    },
+}
+
+_MAX_CHARS = 1000
+_NGRAM_SIZES = (1, 2, 3)
+
+
+def _ngrams(word: str) -> List[str]:
+    """
+    Character n-grams of a word padded with spaces, plus the word itself as a feature.
+    """
+    padded = f" {word} "
+    return [padded[i:i + n] for n in _NGRAM_SIZES for i in range(len(padded) - n + 1)] + [padded]
+
+
+class _NgramModel:
+    """
+    Multinomial naive Bayes over character 1-3 grams of the words of a text.
+    """
+    def __init__(self, profiles: Dict[str, str], languages: Sequence[str]):
+        self.languages = [lang for lang in languages if lang in profiles]
+        counts: Dict[str, np.ndarray] = {}
+        for column, lang in enumerate(self.languages):
+            words = profiles[lang].split()
+            for rank, word in enumerate(words):
+                # Zipf-like weights: frequent words contribute more
+                weight = 1.0 / (rank + 10)
+                for gram in _ngrams(word):
+                    if gram not in counts:
+                        counts[gram] = np.zeros(len(self.languages), dtype=np.float64)
+                    counts[gram][column] += weight
+
+        self.vocabulary = {gram: index for index, gram in enumerate(counts)}
+        matrix = np.array(list(counts.values()), dtype=np.float64).reshape(len(counts), len(self.languages))
+        alpha = 0.01
+        totals = matrix.sum(axis=0) + alpha * len(counts)
+        self.log_probs = np.log((matrix + alpha) / totals).astype(np.float32)
+
+    def score(self, texts: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score tokenized texts in one pass.
+
+        Returns:
+        - The summed log-likelihoods per text and language, and the number of known n-grams per text.
+        """
+        rows: List[int] = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for index, words in enumerate(texts):
+            known = [self.vocabulary[gram] for word in words for gram in _ngrams(word) if gram in self.vocabulary]
+            rows.extend(known)
+            lengths[index] = len(known)
+
+        scores = np.zeros((len(texts), len(self.languages)), dtype=np.float32)
+        if rows:
+            gathered = self.log_probs[np.asarray(rows, dtype=np.int64)]
+            nonempty = lengths > 0
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+            scores[nonempty] = np.add.reduceat(gathered, offsets, axis=0)
+        return scores, lengths
+
+
+class LanguageIdentifier:
+    """
+    Lightweight language identification for the supported languages.
+
+    Texts are first assigned to a script. Korean, Japanese, Chinese and Greek are identified by
+    their script alone; Latin and Cyrillic texts are scored with a character n-gram model
+    built at startup from word frequency profiles that ship with the service.
+    """
+    def __init__(self, languages: Sequence[str], sharpness: float = 10.0):
+        """
+        Initialize the identifier.
+
+        Parameters:
+        - languages: Language codes that may be returned; others are never predicted.
+        - sharpness: Scale of the per-n-gram log-likelihood margin in the confidence.
+        """
+        self.languages = list(dict.fromkeys(lang.strip().lower() for lang in languages if lang.strip()))
+        self.sharpness = sharpness
+        self._models = {
+            script: _NgramModel(profiles, self.languages)
+            for script, profiles in _WORDS.items()
+        }
+
+    def _script(self, text: str) -> Optional[str]:
+        counts = [(len(pattern.findall(text)), name) for name, pattern in _SCRIPTS]
+        count, name = max(counts, key=lambda item: item[0])
+        if count == 0:
+            return None
+        # Japanese mixes kanji and kana
+        if name == 'zh' and counts[1][0] > 0:
+            return 'ja'
+        return name
+
+    def detect(self, texts: List[str]) -> List[Tuple[Optional[str], float]]:
+        """
+        Identify the language of a batch of texts.
+
+        Returns:
+        - A (language code, confidence) tuple per text; the code is None if no supported
+          language matches the text.
+        """
+        results: List[Tuple[Optional[str], float]] = [(None, 0.0)] * len(texts)
+        pending: Dict[str, List[int]] = {}
+
+        for index, text in enumerate(texts):
+            text = text[:_MAX_CHARS]
+            script = self._script(text)
+            if script is None:
+                continue
+            if script in self._models:
+                pending.setdefault(script, []).append(index)
+            elif script in self.languages:
+                results[index] = (script, 1.0)
+
+        for script, indexes in pending.items():
+            model = self._models[script]
+            if not model.languages:
+                continue
+            if len(model.languages) == 1:
+                for index in indexes:
+                    results[index] = (model.languages[0], 1.0)
+                continue
+
+            tokenized = [_LETTERS.findall(texts[index][:_MAX_CHARS].lower()) for index in indexes]
+            scores, lengths = model.score(tokenized)
+
+            # Posterior from the average log-likelihood per n-gram, so that the confidence
+            # does not saturate for long texts
+            scaled = self.sharpness * scores / np.maximum(lengths, 1)[:, None]
+            scaled -= scaled.max(axis=1, keepdims=True)
+            posterior = np.exp(scaled)
+            posterior /= posterior.sum(axis=1, keepdims=True)
+            best = posterior.argmax(axis=1)
+
+            for row, index in enumerate(indexes):
+                if lengths[row] > 0:
+                    results[index] = (model.languages[best[row]], float(posterior[row, best[row]]))
+        return results
+
+
+_identifiers: Dict[Tuple[str, ...], LanguageIdentifier] = {}
+_identifiers_lock = threading.Lock()
+
+
+def get_identifier(languages: Sequence[str]) -> LanguageIdentifier:
+    """
+    Get the shared identifier for a set of languages, building it on first use.
+    """
+    key = tuple(languages)
+    with _identifiers_lock:
+        if key not in _identifiers:
+            _identifiers[key] = LanguageIdentifier(languages)
+        return _identifiers[key]
@@ -11,4 +11,21 @@ def setup_logging(log_level: str):
 if __name__ == "__main__":
     config = load_config()
     setup_logging(config.log_level)
-    app.run(host=config.host, port=config.port, debug=config.debug)
\ No newline at end of file
+
+    inference_pool = None
+    if config.inference_backend == "process":
+        from .inference import InferencePool
+        inference_pool = InferencePool(config).start()
+
+    job_runner = None
+    if config.enable_jobs and config.job_workers > 0:
+        from .jobs import JobRunner
+        job_runner = JobRunner(config).start()
+
+    try:
+        app.run(host=config.host, port=config.port, debug=config.debug, use_reloader=config.debug and inference_pool is None and job_runner is None)
+    finally:
+        if job_runner is not None:
+            job_runner.stop()
+        if inference_pool is not None:
+            inference_pool.stop()
\ No newline at end of file
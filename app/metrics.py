@@ -0,0 +1,168 @@
+"""
+Prometheus metrics of the GeoParser API.
+
+The metrics are only recorded if prometheus_client is installed and ENABLE_METRICS is set.
+Under Gunicorn every worker (and every inference process) is a separate process, so the
+metrics are written to memory-mapped files in PROMETHEUS_MULTIPROC_DIR and /metrics
+aggregates the files of all processes. gunicorn.conf.py sets up the directory and removes the
+live gauges of exited workers.
+"""
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - prometheus_client is optional
+    prometheus_client = None
+    multiprocess = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds, from sub-millisecond cache lookups to long documents on large models
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+_metrics: Optional[Dict] = None
+
+
+def multiprocess_dir() -> Optional[str]:
+    """ The directory shared by the processes, or None in single-process mode """
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def setup(enabled: bool = True) -> bool:
+    """
+    Create the metrics of this process. Calling it again has no effect.
+
+    Returns:
+    - Whether metrics are recorded.
+    """
+    global _metrics
+    if _metrics is not None or not enabled:
+        return _metrics is not None
+    if prometheus_client is None:
+        logger.warning("prometheus_client is not installed; metrics are disabled.")
+        return False
+
+    _metrics = {
+        'requests': prometheus_client.Counter(
+            'geoparser_requests_total', 'HTTP requests by endpoint and status code', ['endpoint', 'status']
+        ),
+        'request_seconds': prometheus_client.Histogram(
+            'geoparser_request_seconds', 'HTTP request latency by endpoint', ['endpoint'], buckets=STAGE_BUCKETS
+        ),
+        'texts': prometheus_client.Counter(
+            'geoparser_texts_total', 'Parsed texts by endpoint, language, model size and status',
+            ['endpoint', 'language', 'model_size', 'status']
+        ),
+        'stage_seconds': prometheus_client.Histogram(
+            'geoparser_stage_seconds', 'Time spent per processing stage', ['stage'], buckets=STAGE_BUCKETS
+        ),
+        'cache_lookups': prometheus_client.Counter(
+            'geoparser_cache_lookups_total', 'Result cache lookups by outcome', ['result']
+        ),
+        'batch_size': prometheus_client.Histogram(
+            'geoparser_batch_size', 'Texts per batch request or stream window', ['endpoint'], buckets=BATCH_SIZE_BUCKETS
+        ),
+        'inference_batch_size': prometheus_client.Histogram(
+            'geoparser_inference_batch_size', 'Texts per geoparser pass', buckets=BATCH_SIZE_BUCKETS
+        ),
+        'in_flight': prometheus_client.Gauge(
+            'geoparser_requests_in_flight', 'Requests being handled', multiprocess_mode='livesum'
+        ),
+        'loaded_models': prometheus_client.Gauge(
+            'geoparser_loaded_models', 'Resident model instances', multiprocess_mode='livesum'
+        ),
+    }
+    return True
+
+
+def enabled() -> bool:
+    return _metrics is not None
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a processing stage, e.g. 'validation', 'cache_lookup', 'inference', 'extract' or 'serialization'.
+    """
+    if _metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _metrics['stage_seconds'].labels(name).observe(time.perf_counter() - start)
+
+
+def observe_cache_lookup(hit: bool):
+    if _metrics is not None:
+        _metrics['cache_lookups'].labels('hit' if hit else 'miss').inc()
+
+
+def observe_text(endpoint: str, result: Dict):
+    """ Count a parsed text by the language and model size of its result """
+    if _metrics is None:
+        return
+    model_used = result.get('model_used') or ''
+    _metrics['texts'].labels(
+        endpoint,
+        result.get('language_detected') or 'unknown',
+        model_used.rsplit('_', 1)[-1] if model_used else 'unknown',
+        'success' if result.get('success') else 'error'
+    ).inc()
+
+
+def observe_batch_size(endpoint: str, size: int):
+    if _metrics is not None:
+        _metrics['batch_size'].labels(endpoint).observe(size)
+
+
+def observe_inference_batch_size(size: int):
+    if _metrics is not None:
+        _metrics['inference_batch_size'].observe(size)
+
+
+def set_loaded_models(count: int):
+    if _metrics is not None:
+        _metrics['loaded_models'].set(count)
+
+
+def request_started():
+    if _metrics is not None:
+        _metrics['in_flight'].inc()
+
+
+def request_finished(endpoint: str, status: int, seconds: float):
+    if _metrics is not None:
+        _metrics['in_flight'].dec()
+        _metrics['requests'].labels(endpoint, str(status)).inc()
+        _metrics['request_seconds'].labels(endpoint).observe(seconds)
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Render the metrics of all processes in the Prometheus text format.
+
+    Returns:
+    - The body and its content type.
+    """
+    if multiprocess_dir():
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """
+    Remove the live gauges of an exited process from the shared directory.
+    """
+    if multiprocess is not None and multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
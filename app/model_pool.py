@@ -0,0 +1,262 @@
+import gc
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is optional
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str]
+
+
+@dataclass
+class ModelEntry:
+    """ A loaded model and its bookkeeping """
+    model: Any
+    model_name: str
+    pinned: bool = False
+    memory_mb: Optional[float] = None
+    load_time: float = 0.0
+    loaded_at: float = 0.0
+    last_used: float = 0.0
+    uses: int = 0
+    # Limits the number of threads running the model at the same time
+    semaphore: Any = None
+
+
+def _rss_mb() -> Optional[float]:
+    """Resident set size of the current process in MB, or None if psutil is not available."""
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+class ModelPool:
+    """
+    Pool of models keyed by (language, model size).
+
+    Models are loaded on first use and evicted in least recently used order once
+    the instance or memory budget is exceeded. Pinned models are never evicted.
+    """
+    # Seconds before a model that failed to load is tried again
+    FAILED_RETRY_SECONDS = 300
+
+    def __init__(
+            self,
+            loader: Callable[[str, str], Tuple[Any, str]],
+            max_models: int = 0,
+            max_memory_mb: int = 0,
+            concurrency: int = 1,
+    ):
+        """
+        Initialize the pool.
+
+        Parameters:
+        - loader: Callable taking (lang_code, model_size) and returning (model, model_name).
+        - max_models: Maximum number of resident models. 0 disables the instance budget.
+        - max_memory_mb: Maximum estimated memory of all resident models in MB. 0 disables the memory budget.
+        - concurrency: Number of threads that may run the same model at the same time.
+        """
+        self._loader = loader
+        self.max_models = max_models
+        self.max_memory_mb = max_memory_mb
+        self.concurrency = max(concurrency, 1)
+
+        self._entries: "OrderedDict[ModelKey, ModelEntry]" = OrderedDict()
+        self._loading: Dict[ModelKey, threading.Event] = {}
+        self._failed: Dict[ModelKey, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.evictions = 0
+
+        if max_memory_mb and psutil is None:
+            logger.warning("psutil is not installed; the model memory budget cannot be enforced.")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> List[ModelKey]:
+        """Keys of the resident models, least recently used first."""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def entries(self) -> List[Tuple[ModelKey, ModelEntry]]:
+        """Resident models, least recently used first."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def is_loaded(self, lang_code: str, model_size: str) -> bool:
+        return (lang_code, model_size) in self._entries
+
+    def has_failed(self, lang_code: str, model_size: str) -> bool:
+        """Whether the model failed to load recently and should not be retried yet."""
+        failure = self._failed.get((lang_code, model_size))
+        return failure is not None and time.time() - failure[0] < self.FAILED_RETRY_SECONDS
+
+    def get(self, lang_code: str, model_size: str) -> ModelEntry:
+        """
+        Get the model for the key, loading it if necessary, and mark it as recently used.
+
+        Raises:
+        - RuntimeError if the model cannot be loaded.
+        """
+        return self._acquire((lang_code, model_size), pin=False)
+
+    def load(self, lang_code: str, model_size: str, pin: bool = False) -> ModelEntry:
+        """
+        Load the model for the key if necessary, optionally pinning it.
+        """
+        return self._acquire((lang_code, model_size), pin=pin)
+
+    def _acquire(self, key: ModelKey, pin: bool) -> ModelEntry:
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.last_used = time.time()
+                    entry.uses += 1
+                    entry.pinned = entry.pinned or pin
+                    return entry
+
+                if self.has_failed(*key):
+                    raise RuntimeError(f"Model for '{key[0]}' ({key[1]}) failed to load: {self._failed[key][1]}")
+
+                event = self._loading.get(key)
+                if event is None:
+                    # This thread loads the model, others wait for it
+                    event = threading.Event()
+                    self._loading[key] = event
+                    break
+
+            event.wait()
+
+        try:
+            self._make_room()
+            entry = self._load(key, pin)
+        except Exception as e:
+            with self._lock:
+                self._failed[key] = (time.time(), str(e))
+            raise RuntimeError(f"Failed to load model for '{key[0]}' ({key[1]}): {e}") from e
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+        with self._lock:
+            self._failed.pop(key, None)
+            self._entries[key] = entry
+            self.loads += 1
+            evicted = self._evict_over_budget(keep=key)
+
+        self._release(evicted)
+        return entry
+
+    def _load(self, key: ModelKey, pin: bool) -> ModelEntry:
+        lang_code, model_size = key
+        rss_before = _rss_mb()
+        start = time.time()
+        model, model_name = self._loader(lang_code, model_size)
+        load_time = time.time() - start
+        rss_after = _rss_mb()
+
+        memory_mb = None
+        if rss_before is not None and rss_after is not None:
+            memory_mb = max(rss_after - rss_before, 0.0)
+
+        now = time.time()
+        logger.info(f"Loaded model '{model_name}' for ('{lang_code}', '{model_size}') in {load_time:.2f}s"
+                    + (f", ~{memory_mb:.0f} MB" if memory_mb is not None else ""))
+        return ModelEntry(
+            model=model,
+            model_name=model_name,
+            pinned=pin,
+            memory_mb=memory_mb,
+            load_time=load_time,
+            loaded_at=now,
+            last_used=now,
+            uses=1,
+            semaphore=threading.BoundedSemaphore(self.concurrency)
+        )
+
+    def _memory_mb(self) -> float:
+        return sum(entry.memory_mb or 0.0 for entry in self._entries.values())
+
+    def _over_budget(self, extra_models: int = 0) -> bool:
+        if self.max_models and len(self._entries) + extra_models > self.max_models:
+            return True
+        if self.max_memory_mb and self._memory_mb() > self.max_memory_mb:
+            return True
+        return False
+
+    def _evict_over_budget(self, keep: Optional[ModelKey] = None, extra_models: int = 0, warn: bool = True) -> List[ModelEntry]:
+        """
+        Remove least recently used unpinned models while over budget; the caller must hold the lock.
+        """
+        evicted = []
+        while self._over_budget(extra_models):
+            victim = next(
+                (key for key, entry in self._entries.items() if not entry.pinned and key != keep),
+                None
+            )
+            if victim is None:
+                if warn:
+                    logger.warning("Model pool is over budget but all resident models are pinned.")
+                break
+            entry = self._entries.pop(victim)
+            self.evictions += 1
+            logger.info(f"Evicting model '{entry.model_name}' for {victim} from the model pool")
+            evicted.append(entry)
+        return evicted
+
+    def _make_room(self):
+        """Evict models before loading a new one so the instance budget is not exceeded."""
+        with self._lock:
+            evicted = self._evict_over_budget(extra_models=1, warn=False)
+        self._release(evicted)
+
+    def _release(self, evicted: Iterable[ModelEntry]):
+        """
+        Collect evicted models. Callers still using an evicted model keep their own reference,
+        so its memory is freed once they are done.
+        """
+        if list(evicted):
+            gc.collect()
+
+    def stats(self) -> Dict:
+        """
+        Get model pool statistics.
+        """
+        with self._lock:
+            return {
+                'resident_models': len(self._entries),
+                'max_models': self.max_models,
+                'memory_mb': round(self._memory_mb(), 1),
+                'max_memory_mb': self.max_memory_mb,
+                'concurrency_per_model': self.concurrency,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'models': [
+                    {
+                        'language': key[0],
+                        'model_size': key[1],
+                        'model_name': entry.model_name,
+                        'pinned': entry.pinned,
+                        'memory_mb': round(entry.memory_mb, 1) if entry.memory_mb is not None else None,
+                        'load_time': round(entry.load_time, 3),
+                        'uses': entry.uses,
+                        'idle_seconds': round(time.time() - entry.last_used, 1)
+                    }
+                    for key, entry in self._entries.items()
+                ],
+                'failed_models': [f"{key[0]}:{key[1]}" for key in self._failed if self.has_failed(*key)]
+            }
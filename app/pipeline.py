@@ -0,0 +1,94 @@
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SPACY_PIPE_MODES = ('disable', 'exclude')
+
+# Components providing sentence boundaries, in order of preference; the geoparser builds the
+# context of a toponym from its sentence, so one of them must stay enabled
+_SENTENCE_COMPONENTS = ('senter', 'sentencizer', 'parser')
+
+
+def _listening_components(nlp, name: str) -> List[str]:
+    """
+    Components whose models read the output of a shared embedding component (tok2vec or transformer).
+    """
+    return list(getattr(nlp.get_pipe(name), 'listening_components', None) or [])
+
+
+def required_components(nlp) -> Optional[List[str]]:
+    """
+    Components needed for named entities and sentence boundaries.
+
+    Returns:
+    - The names of the required components, or None if the pipeline has no NER or no component
+      providing sentence boundaries.
+    """
+    names = nlp.component_names
+    if 'ner' not in names:
+        return None
+    sentence_component = next((name for name in _SENTENCE_COMPONENTS if name in names), None)
+    if sentence_component is None:
+        return None
+
+    required = ['ner', sentence_component]
+    for name in names:
+        if name not in required and set(_listening_components(nlp, name)) & set(required):
+            required.append(name)
+    return required
+
+
+def trim_pipeline(nlp, components: List[str], mode: str = 'disable') -> Dict:
+    """
+    Disable or remove the spaCy components that are not needed for geoparsing.
+
+    Parameters:
+    - nlp: The loaded spaCy pipeline, modified in place.
+    - components: Names of the components to turn off, or ['auto'] for all components other than
+      the named entity recognizer, a sentence boundary component and the embedding layers they use.
+    - mode: 'disable' keeps the components loaded so they could be enabled again, 'exclude'
+      removes them from the pipeline and frees their memory.
+
+    Returns:
+    - A description of the active pipeline.
+    """
+    info = {'mode': mode, 'requested': list(components), 'removed': [], 'fallback': None}
+    if components:
+        name = f"{nlp.meta.get('lang')}_{nlp.meta.get('name')}"
+        required = required_components(nlp)
+        remove = []
+        if required is None:
+            info['fallback'] = "the pipeline has no NER or sentence boundary component"
+        elif 'auto' in components:
+            remove = [component for component in nlp.component_names if component not in required]
+        else:
+            unknown = [component for component in components if component not in nlp.component_names]
+            if unknown:
+                logger.info(f"spaCy pipeline '{name}' has no component(s) {unknown}")
+            remove = [component for component in components if component in nlp.component_names]
+            kept = [component for component in nlp.component_names if component not in remove]
+            used = [component for component in remove if set(_listening_components(nlp, component)) & set(kept)]
+            if 'ner' not in kept:
+                info['fallback'] = "the NER component would be removed"
+            elif not any(component in kept for component in _SENTENCE_COMPONENTS):
+                info['fallback'] = "no sentence boundary component would remain"
+            elif used:
+                info['fallback'] = f"component(s) {used} are used by the remaining components"
+
+        if info['fallback'] is None:
+            for component in remove:
+                if mode == 'exclude':
+                    nlp.remove_pipe(component)
+                elif component not in nlp.disabled:
+                    nlp.disable_pipe(component)
+            # A sentence boundary component that is off by default (senter) replaces a removed parser
+            if not any(component in nlp.pipe_names for component in _SENTENCE_COMPONENTS):
+                nlp.enable_pipe(next(component for component in _SENTENCE_COMPONENTS if component in nlp.component_names))
+            info['removed'] = remove
+        else:
+            logger.warning(f"Keeping the full spaCy pipeline of '{name}': {info['fallback']}")
+
+    info['components'] = list(nlp.pipe_names)
+    info['disabled'] = list(nlp.disabled)
+    return info
@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PREFILTER_MODES = ('off', 'conservative', 'aggressive')
+
+# Words as tokenized by the unicode61 tokenizer of the gazetteer's full-text index
+_WORD = re.compile(r'\w+')
+# Scripts written without spaces between words: a run of such characters is one token in the
+# full-text index, and a mention can be any part of it
+_UNSPACED = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]')
+
+# Capitalized words that start many sentences and also happen to be place names somewhere
+_STOPWORDS = {
+    'en': {'a', 'i', 'the', 'this', 'that', 'we', 'you', 'he', 'she', 'it', 'they', 'my', 'our', 'is', 'are', 'was',
+           'hi', 'hello', 'thanks', 'ok', 'yes', 'no', 'so', 'but', 'and', 'if', 'when', 'what', 'how', 'why', 'mr', 'mrs'},
+    'de': {'der', 'die', 'das', 'ein', 'eine', 'ich', 'wir', 'sie', 'er', 'es', 'ist', 'und', 'aber', 'wenn', 'hallo',
+           'danke', 'ja', 'nein', 'was', 'wie', 'warum', 'herr', 'frau'},
+    'fr': {'le', 'la', 'les', 'un', 'une', 'je', 'nous', 'vous', 'il', 'elle', 'est', 'et', 'mais', 'si', 'bonjour',
+           'merci', 'oui', 'non', 'quand', 'comment', 'pourquoi', 'monsieur', 'madame'},
+    'es': {'el', 'la', 'los', 'las', 'un', 'una', 'yo', 'nosotros', 'usted', 'es', 'y', 'pero', 'si', 'hola',
+           'gracias', 'no', 'cuando', 'como', 'por', 'senor', 'senora'},
+}
+
+
+def normalize(text: str) -> str:
+    """
+    Casefold text and strip diacritics, like the unicode61 tokenizer of the full-text index.
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def _hashes(values: Iterable[str]) -> np.ndarray:
+    """
+    Stable 64-bit hashes of strings; Python's hash() differs between processes.
+    """
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little') for value in values],
+        dtype=np.uint64
+    )
+
+
+def prefilter_path(config) -> str:
+    """
+    Base path of the prefilter name sets for the configured gazetteer.
+    """
+    if config.prefilter_path:
+        return config.prefilter_path
+    return os.path.join(config.geonames_data_path, f"{config.gazetteer}-names")
+
+
+class ToponymPrefilter:
+    """
+    Cheap test whether a text can contain a toponym that the gazetteer would resolve.
+
+    The gazetteer names are stored as two sorted arrays of 64-bit hashes: one of the words
+    of all names and one of the full names. A text is matched by hashing its words (or the
+    substrings of runs of unspaced scripts such as Chinese) and looking them up with a
+    vectorized binary search, so the cost is linear in the text and independent of the
+    size of the gazetteer.
+
+    Modes:
+    - conservative: skip texts none of whose words occur in any gazetteer name. Candidate
+      retrieval matches the words of a mention against the names, so such texts cannot
+      produce locations.
+    - aggressive: skip texts without a full gazetteer name starting with a capital letter
+      (or, for unspaced scripts, of at least two characters), ignoring common sentence
+      starters. Faster, at the cost of missing lowercase mentions.
+    """
+    def __init__(self, path: str, mode: str = 'conservative', max_words: int = 4, max_chars: int = 8):
+        """
+        Open the name sets built by build_prefilter.
+
+        Parameters:
+        - path: Base path of the name set files, see prefilter_path.
+        - mode: 'conservative' or 'aggressive'.
+        - max_words: Longest name, in words, matched in aggressive mode.
+        - max_chars: Longest name, in characters, matched in runs of unspaced scripts.
+        """
+        if mode not in ('conservative', 'aggressive'):
+            raise ValueError(f"Unknown prefilter mode '{mode}'")
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        self.words = np.load(path + '.words.npy', mmap_mode='r')
+        self.names = np.load(path + '.names.npy', mmap_mode='r')
+        self.path = path
+        self.mode = mode
+        self.max_words = max_words
+        self.max_chars = max_chars
+
+    @staticmethod
+    def _contains_any(array: np.ndarray, values: List[str]) -> bool:
+        if not values or not len(array):
+            return False
+        keys = _hashes(values)
+        positions = np.minimum(np.searchsorted(array, keys), len(array) - 1)
+        return bool(np.any(array[positions] == keys))
+
+    def _substrings(self, run: str, min_chars: int) -> List[str]:
+        return [
+            run[start:start + length]
+            for start in range(len(run))
+            for length in range(min_chars, min(self.max_chars, len(run) - start) + 1)
+        ]
+
+    def has_candidates(self, text: str, lang_code: str = 'en') -> bool:
+        """
+        Check whether a text may contain a toponym with gazetteer candidates.
+
+        Parameters:
+        - text: The input text.
+        - lang_code: The language the text is parsed with, used for the sentence starters of aggressive mode.
+
+        Returns:
+        - False if the text certainly (conservative) or very likely (aggressive) yields no locations.
+        """
+        words = _WORD.findall(text)
+        if self.mode == 'conservative':
+            values = []
+            for word in words:
+                normalized = normalize(word)
+                values.append(normalized)
+                if _UNSPACED.search(word):
+                    values.extend(self._substrings(normalized, 1))
+            return self._contains_any(self.words, values)
+
+        stopwords = _STOPWORDS.get(lang_code, set())
+        normalized = [normalize(word) for word in words]
+        values = []
+        for start, word in enumerate(words):
+            if _UNSPACED.search(word):
+                values.extend(self._substrings(normalized[start], 2))
+            elif word[0].isupper() and normalized[start] not in stopwords:
+                for end in range(start + 1, min(start + self.max_words, len(words)) + 1):
+                    values.append(' '.join(normalized[start:end]))
+        return self._contains_any(self.names, values)
+
+    def stats(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'path': self.path,
+            'words': len(self.words),
+            'names': len(self.names),
+            'size_bytes': self.words.nbytes + self.names.nbytes,
+            'built_at': self.metadata.get('built_at')
+        }
+
+
+def open_prefilter(config) -> Optional[ToponymPrefilter]:
+    """
+    Open the prefilter for the configured gazetteer and mode.
+
+    Returns:
+    - The prefilter, or None if it is off or its name sets do not exist or were built for another gazetteer.
+    """
+    if config.prefilter_mode == 'off':
+        return None
+
+    path = prefilter_path(config)
+    if not os.path.exists(path + '.json'):
+        logger.warning(f"Prefilter name sets not found at '{path}'; all texts are parsed. "
+                       f"Build them with 'python -m app.build_index names'.")
+        return None
+
+    try:
+        prefilter = ToponymPrefilter(path, mode=config.prefilter_mode)
+    except Exception as e:
+        logger.error(f"Failed to open prefilter at '{path}': {e}")
+        return None
+
+    # Name sets of another gazetteer would skip texts with toponyms of this one
+    if prefilter.metadata.get('gazetteer') != config.gazetteer:
+        logger.warning(f"Prefilter name sets at '{path}' were built for '{prefilter.metadata.get('gazetteer')}', "
+                       f"not '{config.gazetteer}'; all texts are parsed")
+        return None
+
+    logger.info(f"Prefilter enabled in {config.prefilter_mode} mode at '{path}' "
+                f"({len(prefilter.words):,} words, {len(prefilter.names):,} names)")
+    return prefilter
+
+
+def build_prefilter(
+    gazetteer,
+    path: str,
+    batch_size: int = 100000,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    Hash the words and the full names of all gazetteer names into sorted arrays.
+
+    Parameters:
+    - gazetteer: The geoparser gazetteer whose names table is read.
+    - path: Base path of the name set files.
+    - batch_size: Number of names read from the database at once.
+    - progress: Called with (done, total) after every batch.
+
+    Returns:
+    - The metadata of the name sets.
+    """
+    connection = sqlite3.connect(f"file:{gazetteer.db_path}?mode=ro", uri=True)
+    word_batches: List[np.ndarray] = []
+    name_batches: List[np.ndarray] = []
+    try:
+        total = connection.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+        cursor = connection.execute("SELECT name FROM names")
+        done = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            words = set()
+            names = set()
+            for (name,) in rows:
+                tokens = _WORD.findall(normalize(name or ''))
+                if tokens:
+                    words.update(tokens)
+                    names.add(' '.join(tokens))
+            word_batches.append(np.unique(_hashes(words)))
+            name_batches.append(np.unique(_hashes(names)))
+            done += len(rows)
+            if progress is not None:
+                progress(done, total)
+    finally:
+        connection.close()
+
+    words = np.unique(np.concatenate(word_batches)) if word_batches else np.empty(0, dtype=np.uint64)
+    names = np.unique(np.concatenate(name_batches)) if name_batches else np.empty(0, dtype=np.uint64)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    for suffix, values in (('.words.npy', words), ('.names.npy', names)):
+        with open(path + suffix + '.tmp', 'wb') as f:
+            np.save(f, values)
+
+    metadata = {
+        'gazetteer': gazetteer.config.name,
+        'words': len(words),
+        'names': len(names),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    # The metadata file is renamed last: name sets are only opened once it exists
+    for suffix in ('.words.npy', '.names.npy', '.json'):
+        os.replace(path + suffix + '.tmp', path + suffix)
+    return metadata
@@ -0,0 +1,115 @@
+import gc
+import os
+import logging
+from typing import Dict, Optional
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is optional
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+_preloading = False
+_forked = False
+
+
+def disable_gc():
+    """
+    Disable automatic garbage collection in the master process while the models are loaded,
+    so collections do not leave freed holes in pages that the workers will share.
+    Also marks the process as a preloading master, which defers the warm-up to the workers.
+    """
+    global _preloading
+    _preloading = True
+    gc.disable()
+
+
+def preloading() -> bool:
+    """ Whether this process loads the models for workers that will be forked from it """
+    return _preloading
+
+
+def freeze_for_fork():
+    """
+    Move every object tracked by the garbage collector to the permanent generation right
+    before each fork, so collections in the workers never write to the shared pages.
+
+    Workers forked later, e.g. to replace recycled ones, get the objects the master created
+    in the meantime frozen as well. Garbage collection of the master is turned back on after
+    the first freeze, since the models are loaded by then.
+    """
+    global _forked
+    if not _forked:
+        try:
+            import torch
+            if torch.cuda.is_available() and torch.cuda.is_initialized():
+                logger.warning("CUDA was initialized in the master process. CUDA cannot be used in forked workers; "
+                               "disable PRELOAD_APP for GPU inference.")
+        except ImportError:
+            pass
+
+    gc.freeze()
+    gc.enable()
+    if not _forked:
+        logger.info(f"Froze {gc.get_freeze_count()} objects before forking workers")
+    _forked = True
+
+
+def configure_torch_threads(num_threads: int):
+    """
+    Set the number of intra-op threads used by torch. 0 keeps the torch default.
+    """
+    if num_threads <= 0:
+        return
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+
+def reset_torch_threads(num_threads: int):
+    """
+    Re-create the torch thread pool in a forked process, whose inherited OpenMP state is not
+    usable. 0 keeps the number of threads of the parent.
+    """
+    try:
+        import torch
+        torch.set_num_threads(num_threads if num_threads > 0 else torch.get_num_threads())
+    except ImportError:
+        pass
+
+
+def after_fork(service):
+    """
+    Re-initialize the fork-unsafe parts of a preloaded service in a freshly forked worker.
+    """
+    gc.enable()
+    if service is not None:
+        service.after_fork()
+
+
+def memory_report() -> Optional[Dict]:
+    """
+    Report the memory of the current process in MB, split into memory unique to the process
+    (uss) and memory shared with other processes such as the preloading master.
+    """
+    if psutil is None:
+        return None
+
+    try:
+        info = psutil.Process(os.getpid()).memory_full_info()
+    except (psutil.Error, AttributeError):
+        return None
+
+    mb = 1024 * 1024
+    report = {
+        'pid': os.getpid(),
+        'rss_mb': round(info.rss / mb, 1),
+        'unique_mb': round(info.uss / mb, 1),
+        'shared_mb': round((info.rss - info.uss) / mb, 1)
+    }
+    if hasattr(info, 'pss'):
+        report['pss_mb'] = round(info.pss / mb, 1)
+    return report
@@ -0,0 +1,171 @@
+import re
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache import ResultCache
+from .embedding_index import EmbeddingIndex
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+class ToponymResolver:
+    """
+    Wrapper around a Geoparser instance that replaces its toponym resolution.
+
+    Toponyms are recognized as usual. With a cache, each toponym is then looked up in a shared
+    cache keyed by the normalized toponym and a hash of the characters around its mention, and
+    only cache misses are resolved. With an embedding index, candidates are scored against their
+    precomputed embeddings, so only the mention contexts go through the transformer. Otherwise
+    resolution works the same way as Geoparser.resolve.
+    """
+    def __init__(
+        self,
+        geoparser: Any,
+        cache: Optional[ResultCache] = None,
+        index: Optional[EmbeddingIndex] = None,
+        context_chars: int = 64
+    ):
+        """
+        Initialize the resolver.
+
+        Parameters:
+        - geoparser: The Geoparser instance used for recognition and resolution.
+        - cache: Cache of (loc_id, score) by toponym and context, shared by all models.
+        - index: Precomputed candidate embeddings, shared by all models.
+        - context_chars: Number of characters on each side of a mention that make up its context key.
+        """
+        self.geoparser = geoparser
+        self.cache = cache
+        self.index = index
+        self.context_chars = context_chars
+
+    def __getattr__(self, name):
+        # Everything but parsing is delegated to the wrapped Geoparser
+        return getattr(self.geoparser, name)
+
+    def _cache_key(self, toponym: Any) -> str:
+        """
+        Key of a toponym: its normalized text and the normalized characters around the mention.
+        """
+        text = toponym.doc.text
+        start, end = toponym.start_char, toponym.end_char
+        context = (
+            _normalize(text[max(start - self.context_chars, 0):start]) + '\x00' +
+            _normalize(text[end:end + self.context_chars])
+        )
+        return hashlib.md5(f"{_normalize(toponym.text)}\x1f{context}".encode()).hexdigest()
+
+    def parse(self, texts: List[str], batch_size: int = 8) -> List[Any]:
+        """
+        Recognize and resolve toponyms in a list of texts, using cached resolutions where possible.
+
+        Returns:
+        - The parsed documents, as returned by Geoparser.parse.
+        """
+        docs = self.geoparser.recognize(texts, batch_size=batch_size)
+        if self.cache is None:
+            self._resolve([toponym for doc in docs for toponym in doc.toponyms], batch_size)
+            return docs
+
+        # Cache misses by key; repeated mentions in the same context are resolved once
+        pending: Dict[str, List[Any]] = {}
+        for doc in docs:
+            for toponym in doc.toponyms:
+                key = self._cache_key(toponym)
+                if key in pending:
+                    pending[key].append(toponym)
+                    continue
+                cached: Optional[Tuple] = self.cache.get(key)
+                if cached is None:
+                    pending[key] = [toponym]
+                else:
+                    toponym._.loc_id, toponym._.loc_score = cached
+
+        if pending:
+            self._resolve([toponyms[0] for toponyms in pending.values()], batch_size)
+            for key, toponyms in pending.items():
+                resolution = (toponyms[0]._.loc_id, toponyms[0]._.loc_score)
+                for toponym in toponyms[1:]:
+                    toponym._.loc_id, toponym._.loc_score = resolution
+                self.cache.put(key, resolution)
+
+        return docs
+
+    def _resolve(self, toponyms: List[Any], batch_size: int):
+        """
+        Resolve a subset of toponyms, mirroring Geoparser.resolve for whole documents.
+        """
+        candidates = [toponym.get_candidates() for toponym in toponyms]
+        candidate_ids = list({candidate_id for toponym_candidates in candidates for candidate_id in toponym_candidates})
+        if not candidate_ids:
+            return
+
+        if self.index is not None:
+            self._resolve_indexed(toponyms, candidates, candidate_ids, batch_size)
+            return
+
+        candidate_embeddings_lookup = self.geoparser._get_candidate_embeddings_lookup(candidate_ids, batch_size)
+        toponym_embeddings = self.geoparser.transformer.encode(
+            [toponym.context.text for toponym in toponyms],
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_tensor=True
+        )
+
+        for index, (toponym, toponym_candidates) in enumerate(zip(toponyms, candidates)):
+            if toponym_candidates:
+                toponym._.loc_id, toponym._.loc_score = self.geoparser._resolve_toponym(
+                    candidate_embeddings_lookup,
+                    toponym_candidates,
+                    toponym_embeddings,
+                    index
+                )
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return self.geoparser.transformer.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+
+    def _resolve_indexed(self, toponyms: List[Any], candidates: List[List[str]], candidate_ids: List[str], batch_size: int):
+        """
+        Score candidates against their precomputed embeddings.
+
+        Embeddings are normalized, so the cosine similarities of all toponyms with all
+        candidates are a single matrix product. Candidates missing from the index, e.g.
+        because it was built with a population threshold, are embedded on the fly.
+        """
+        rows = self.index.rows(candidate_ids)
+        found = rows >= 0
+        candidate_embeddings = np.empty((len(candidate_ids), self.index.dimension), dtype=np.float32)
+        if found.any():
+            candidate_embeddings[found] = self.index.vectors(rows[found])
+        if not found.all():
+            missing = [candidate_id for candidate_id, ok in zip(candidate_ids, found) if not ok]
+            descriptions = [
+                self.geoparser.gazetteer.get_location_description(location)
+                for location in self.geoparser.gazetteer.query_locations(missing)
+            ]
+            candidate_embeddings[~found] = self._encode(descriptions, batch_size)
+
+        toponym_embeddings = self._encode([toponym.context.text for toponym in toponyms], batch_size)
+        similarities = candidate_embeddings @ toponym_embeddings.T
+
+        positions = {candidate_id: position for position, candidate_id in enumerate(candidate_ids)}
+        for index, (toponym, toponym_candidates) in enumerate(zip(toponyms, candidates)):
+            if toponym_candidates:
+                scores = similarities[[positions[candidate_id] for candidate_id in toponym_candidates], index]
+                best = int(np.argmax(scores))
+                toponym._.loc_id, toponym._.loc_score = toponym_candidates[best], float(scores[best])
@@ -0,0 +1,110 @@
+"""
+JSON serialization and compression of API responses.
+
+orjson is used if it is installed; it encodes large result lists several times faster than the
+json module. JSON_ENCODER=json forces the standard library. Both produce compact UTF-8 JSON with
+non-ASCII characters kept, indented only on request. Bodies are compressed with gzip or deflate
+when the client accepts it and the body is large enough for compression to pay off.
+"""
+import gzip
+import json
+import zlib
+import logging
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_ENCODERS = ('auto', 'orjson', 'json')
+CONTENT_ENCODINGS = ('gzip', 'deflate')
+
+_use_orjson = orjson is not None
+
+
+def setup(encoder: str = 'auto') -> str:
+    """
+    Choose the JSON encoder of this process.
+
+    Parameters:
+    - encoder: 'auto' or 'orjson' use orjson if it is installed, 'json' the standard library.
+
+    Returns:
+    - The name of the encoder in use.
+    """
+    global _use_orjson
+    if encoder == 'orjson' and orjson is None:
+        logger.warning("orjson is not installed; using the json module.")
+    _use_orjson = orjson is not None and encoder != 'json'
+    return encoder_name()
+
+
+def encoder_name() -> str:
+    """ The name of the JSON encoder in use """
+    return 'orjson' if _use_orjson else 'json'
+
+
+def dumps(data: Any, pretty: bool = False) -> bytes:
+    """
+    Serialize data to UTF-8 JSON.
+
+    Parameters:
+    - data: The value to serialize.
+    - pretty: Indent by two spaces instead of the compact form.
+
+    Returns:
+    - The JSON document.
+    """
+    if _use_orjson:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, option=option)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the json module can encode
+            pass
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def choose_encoding(accept_encodings, body_size: int, min_size: int) -> Optional[str]:
+    """
+    Negotiate the content encoding of a response body.
+
+    Parameters:
+    - accept_encodings: The parsed Accept-Encoding header (werkzeug's request.accept_encodings).
+    - body_size: Size of the uncompressed body in bytes.
+    - min_size: Smaller bodies are sent uncompressed.
+
+    Returns:
+    - 'gzip', 'deflate' or None to send the body as it is.
+    """
+    if body_size < min_size:
+        return None
+    # Quality values are respected; gzip wins a tie
+    return accept_encodings.best_match(CONTENT_ENCODINGS)
+
+
+def compress(body: bytes, encoding: str, level: int = 6) -> bytes:
+    """
+    Compress a response body.
+
+    Parameters:
+    - body: The uncompressed body.
+    - encoding: 'gzip' or 'deflate'.
+    - level: Compression level from 1 (fastest) to 9 (smallest).
+
+    Returns:
+    - The compressed body.
+    """
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'deflate':
+        # The deflate content coding is the zlib format, not a raw deflate stream
+        return zlib.compress(body, level)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
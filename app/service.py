@@ -1,17 +1,53 @@
 import os 
-import io
+import hashlib
 import logging
+import threading
 import time
-from contextlib import redirect_stdout, redirect_stderr
-from typing import Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 from geoparser import Geoparser
 import numpy as np
 
-from .utils import map_to_spacy_model, extract_location_data
+from .utils import map_to_spacy_model, extract_location_data, parse_fields, suppress_output
 from .config import GeoParserConfig
+from .cache import ResultCache, PersistentCache
+from .model_pool import ModelPool
+from .batching import MicroBatcher
+from .inference import InferenceClient
+from .chunking import chunk_text, merge_chunk_locations, split_sentences
+from .resolution import ToponymResolver
+from .embedding_index import EmbeddingIndex, open_index
+from .gazetteer_store import GazetteerStore, open_store
+from .prefilter import ToponymPrefilter, open_prefilter
+from .langid import LanguageIdentifier, get_identifier
+from .pipeline import trim_pipeline
+from .warmup import warm_up
+from . import metrics
+from .prefork import configure_torch_threads, memory_report, preloading, reset_torch_threads
 
 logger = logging.getLogger(__name__)
 
+# Part of every result cache key; bump it when the format of cached results changes
+_CACHE_KEY_VERSION = 2
+
+
+def _languages_valid(languages) -> bool:
+    """
+    Whether languages is None, a string or a list of strings.
+    """
+    return languages is None or isinstance(languages, str) or (
+        isinstance(languages, list) and all(isinstance(language, str) for language in languages))
+
+
+def _copy_result(result: Dict) -> Dict:
+    """
+    Copy a parse result together with its location dictionaries, which are flat.
+    """
+    copied = result.copy()
+    if 'locations' in copied:
+        copied['locations'] = [location.copy() for location in copied['locations']]
+    return copied
+
 class GeoParserService:
     """
     GeoParser Service for parsing geographic information from text.
@@ -24,47 +60,201 @@ class GeoParserService:
         - config: GeoParserConfig object containing configuration settings.
         """
         self.config = config
-        self.nlp_models: Dict[str, Geoparser] = {}
-        self._cache: Dict[str, Dict] = {} if config.enable_cache else None
+        metrics.setup(config.enable_metrics)
+        self.models = ModelPool(
+            self._create_model,
+            max_models=config.model_pool_max_models,
+            max_memory_mb=config.model_pool_max_memory_mb,
+            concurrency=config.model_concurrency
+        )
+        self._supported_codes = {map_to_spacy_model([lang])[0] for lang in config.supported_languages}
+        # Active spaCy pipeline of every model loaded by this process, by model name
+        self._pipelines: Dict[str, Dict] = {}
+        self._batcher: Optional[MicroBatcher] = MicroBatcher(
+            lambda key, texts: self._run_inference(key[0], key[1], texts, fields=key[2]),
+            max_batch_size=config.micro_batch_max_size,
+            max_wait_ms=config.micro_batch_max_wait_ms
+        ) if config.enable_micro_batching else None
+        self._cache: Optional[ResultCache] = ResultCache(
+            max_entries=config.cache_max_entries,
+            max_bytes=config.cache_max_bytes,
+            ttl=config.cache_ttl
+        ) if config.enable_cache else None
+        self._persistent_cache: Optional[PersistentCache] = self._init_persistent_cache()
+        # Locations per sentence, so texts re-sent with small edits only parse the changed sentences
+        self._sentence_cache: Optional[ResultCache] = ResultCache(
+            max_entries=config.sentence_cache_max_entries,
+            max_bytes=config.sentence_cache_max_bytes,
+            ttl=config.cache_ttl
+        ) if config.enable_sentence_cache else None
+        # Resolved toponyms by toponym and context, shared by the models of this process
+        self._resolution_cache: Optional[ResultCache] = ResultCache(
+            max_entries=config.resolution_cache_max_entries,
+            max_bytes=0,
+            ttl=0
+        ) if config.enable_resolution_cache and config.inference_backend == 'local' else None
+        # Precomputed candidate embeddings, memory-mapped and shared by all processes on the host
+        self._embedding_index: Optional[EmbeddingIndex] = open_index(config) if config.enable_embedding_index and config.inference_backend == 'local' else None
+        # Location attributes by geonameid, memory-mapped like the embedding index
+        self._gazetteer_store: Optional[GazetteerStore] = open_store(config) if config.enable_gazetteer_store and config.inference_backend == 'local' else None
+
+        # Languages of texts sent without languages, instead of always parsing them as English
+        self._language_identifier: Optional[LanguageIdentifier] = get_identifier(config.supported_languages) if config.enable_language_detection else None
+        # Texts without plausible toponyms are answered without running the geoparser
+        self._prefilter: Optional[ToponymPrefilter] = open_prefilter(config)
+        self._short_circuited = 0
+        # Request threads share the service, so its counters are updated under a lock
+        self._stats_lock = threading.Lock()
+
+        # With the process backend the models live in the inference processes, not in this one
+        self._inference: Optional[InferenceClient] = InferenceClient(
+            config.inference_socket_dir,
+            config.inference_processes,
+            timeout=config.timeout
+        ) if config.inference_backend == 'process' else None
+
+        # Result of the startup warm-up, served by readiness(); None until it has run or if disabled
+        self._warmup: Optional[Dict] = None
+
+        if self._inference is not None:
+            logger.info(f"Using {config.inference_processes} inference processes at '{config.inference_socket_dir}'")
+            return
+
+        configure_torch_threads(config.torch_num_threads)
 
         # Pre-load models if necessary
         self._load_models()
 
+        # Pay first-call costs before the worker accepts requests. A preloading master must not
+        # run inference before forking, so its workers warm up after the fork instead
+        if config.enable_warmup and not preloading():
+            self._warmup = warm_up(self, config.warmup_corpus_path)
+
+    def after_fork(self):
+        """
+        Re-initialize fork-unsafe state in a worker forked from the process that built the service.
+        Models are shared copy-on-write; torch threads and database connections are per process,
+        and the warm-up deferred by a preloading master runs here.
+        """
+        if self._persistent_cache is not None:
+            self._persistent_cache.reset()
+        if self._inference is not None:
+            self._inference.reset()
+            return
+
+        reset_torch_threads(self.config.torch_num_threads)
+        if self.config.enable_warmup and self._warmup is None:
+            self._warmup = warm_up(self, self.config.warmup_corpus_path)
+
+    def _init_persistent_cache(self) -> Optional[PersistentCache]:
+        """
+        Open the persistent cache shared by all workers on the host, if enabled.
+        """
+        if not self.config.enable_persistent_cache:
+            return None
+
+        try:
+            cache = PersistentCache(
+                self.config.persistent_cache_path,
+                max_bytes=self.config.persistent_cache_max_bytes,
+                ttl=self.config.cache_ttl
+            )
+            logger.info(f"Persistent cache enabled at '{self.config.persistent_cache_path}'")
+            return cache
+        except Exception as e:
+            logger.error(f"Failed to open persistent cache at '{self.config.persistent_cache_path}': {e}")
+            return None
+
+    def _create_model(self, lang_code: str, model_size: str) -> Tuple[Geoparser, str]:
+        """
+        Create the Geoparser instance for a language and model size.
+        """
+        _, model_name = map_to_spacy_model([lang_code], model_size=model_size)
+        logger.info(f"Loading model for language '{lang_code}' with model name '{model_name}'")
+
+        # Load the model without timeout control (signal doesn't work in Flask threads)
+        model = Geoparser(
+            spacy_model=model_name,
+            transformer_model=self.config.transformer_model,
+            gazetteer=self.config.gazetteer
+        )
+        self._pipelines[model_name] = trim_pipeline(model.nlp, self._spacy_disable(lang_code), mode=self.config.spacy_pipe_mode)
+        logger.info(f"spaCy pipeline of '{model_name}': {self._pipelines[model_name]['components']}")
+        if self._resolution_cache is not None or self._embedding_index is not None:
+            model = ToponymResolver(
+                model,
+                cache=self._resolution_cache,
+                index=self._embedding_index,
+                context_chars=self.config.resolution_context_chars
+            )
+        return model, model_name
+
+    def _spacy_disable(self, lang_code: str) -> List[str]:
+        """
+        The spaCy components to turn off for a language: its override, or the global setting.
+        """
+        for lang, components in self.config.spacy_disable_by_language.items():
+            if map_to_spacy_model([lang])[0] == lang_code:
+                return components
+        return self.config.spacy_disable
+
+    def spacy_pipelines(self) -> Dict[str, Dict]:
+        """
+        Active spaCy pipeline of each model resident in this process.
+        """
+        return {
+            entry.model_name: self._pipelines.get(entry.model_name)
+            for _, entry in self.models.entries()
+        }
+
+    def _pinned_model_keys(self) -> List[Tuple[str, str]]:
+        """
+        Resolve the configured pinned models to (lang_code, model_size) keys.
+        Defaults to the default model size of every supported language.
+        """
+        if self.config.pinned_models is None:
+            specs = [f"{lang}:{self.config.default_model_size}" for lang in self.config.supported_languages]
+        else:
+            specs = self.config.pinned_models
+
+        keys = []
+        for spec in specs:
+            lang, _, size = spec.strip().partition(':')
+            if not lang:
+                continue
+            size = self._resolve_model_size(size or None)
+            lang_code, model_name = map_to_spacy_model([lang], model_size=size)
+            key = (lang_code, model_name.rsplit('_', 1)[-1])
+            if key not in keys:
+                keys.append(key)
+        return keys
+
     def _load_models(self):
         """
-        Pre-load Spacy and Transformer models based on the configuration.
+        Pre-load the pinned Spacy and Transformer models. Other models are loaded on first use.
         """
+        pinned_keys = self._pinned_model_keys()
+        if not pinned_keys:
+            logger.info("No pinned models configured, all models will be loaded on first use.")
+            return
+
         logger.info("Start to pre-load spaCy models...")
 
         successful_models = 0
         failed_models = []
 
-        for lang in self.config.supported_languages:
+        for lang_code, model_size in pinned_keys:
             try:
-                lang_code, model_name = map_to_spacy_model(
-                    [lang],
-                    model_size=self.config.default_model_size
-                )
-
-                logger.info(f"Loading model for language '{lang_code}' with model name '{model_name}'")
-
-                # Load the model without timeout control (signal doesn't work in Flask threads)
-                self.nlp_models[lang_code] = Geoparser(
-                    spacy_model=model_name,
-                    transformer_model=self.config.transformer_model,
-                    gazetteer=self.config.gazetteer
-                )
+                self.models.load(lang_code, model_size, pin=True)
                 successful_models += 1
-                logger.info(f"Model for language '{lang_code}' loaded successfully.")
-
-                logger.info(f"Successfully loaded model for language '{lang_code}'")
+                logger.info(f"Successfully loaded model for language '{lang_code}' ({model_size})")
             
             except Exception as e:
-                logger.error(f"Failed to load model for language '{lang}': {e}")
-                failed_models.append(lang)
+                logger.error(f"Failed to load model for language '{lang_code}' ({model_size}): {e}")
+                failed_models.append(f"{lang_code}:{model_size}")
                 continue
 
-        logger.info(f"Finished pre-loading spaCy models, successful: {successful_models}/{len(self.config.supported_languages)} languages: {list(self.nlp_models.keys())}")
+        logger.info(f"Finished pre-loading spaCy models, successful: {successful_models}/{len(pinned_keys)} models: {[f'{lang}:{size}' for lang, size in self.models.keys()]}")
 
         if successful_models == 0:
             raise RuntimeError("No models were successfully loaded. Please check your configuration and model paths.")
@@ -72,38 +262,408 @@ class GeoParserService:
         if failed_models:
             logger.warning(f"Failed to load models for the following languages: {', '.join(failed_models)}. Please check your model paths and configurations.")
 
-    def _get_cache_key(self, text:str, lang_code: str, model_size: str) -> str:
+    @property
+    def _caching_enabled(self) -> bool:
+        return self._cache is not None or self._persistent_cache is not None
+
+    def _get_cache_key(self, text:str, lang_code: str, model_size: str, fields: Optional[Tuple[str, ...]] = None) -> str:
         """
-        Generate a cache key based on the input text, language code, and model size.
+        Generate a cache key based on the input text, language code, model size and field projection.
         """
-        import hashlib
-        key_string = f"{text}_{lang_code}_{model_size}"
+        key_string = f"{_CACHE_KEY_VERSION}_{text}_{lang_code}_{model_size}"
+        if fields is not None:
+            key_string += f"_{','.join(fields)}"
         return hashlib.md5(key_string.encode()).hexdigest()
 
-    def _validate_input(self, text: str, languages: Optional[Union[List[str], str]], model_size: str) -> Dict:
+    def _validate_input(
+            self,
+            text: str,
+            languages: Optional[Union[List[str], str]],
+            model_size: str,
+            max_length: Optional[int] = None
+    ) -> Dict:
         """
         Validate the input parameters and return a dictionary with validated values.
         Note: model_size validation is now handled in parse_text method before calling this.
+        max_length defaults to the configured max_text_length.
         """
-        if not text or not text.strip():
+        if not isinstance(text, str) or not text.strip():
             return {
                 "valid": False,
                 "error": "Input text is empty or invalid."
             }
         
-        if len(text) > self.config.max_text_length:
+        # Checked here so a malformed item fails on its own instead of the whole batch
+        if not _languages_valid(languages):
+            return {
+                "valid": False,
+                "error": "languages must be a string or a list of strings."
+            }
+        
+        max_length = max_length or self.config.max_text_length
+        if len(text) > max_length:
             return {
                 "valid": False,
-                "error": f"Input text exceeds maximum length of {self.config.max_text_length} characters."
+                "error": f"Input text exceeds maximum length of {max_length} characters."
             }
         
         return {"valid": True}
 
+    @staticmethod
+    def item_error(item) -> Optional[str]:
+        """
+        Check the types of a parse_batch item, for callers that queue items before parsing them.
+        parse_batch itself gives such items an error result.
+
+        Returns:
+        - Why the item can not be parsed, or None if its types are valid.
+        """
+        if not isinstance(item, dict):
+            return 'item must be an object'
+        if not isinstance(item.get('text'), str):
+            return 'text must be a string'
+        if not _languages_valid(item.get('languages')):
+            return 'languages must be a string or a list of strings'
+        return None
+
+    def _resolve_model_size(self, model_size: Optional[str]) -> str:
+        """
+        Resolve the requested model size, falling back to the first available size if it is not supported.
+        """
+        # Use default model size if not provided
+        if model_size is None:
+            model_size = self.config.default_model_size
+        
+        # Check if model_size is supported, fallback to first available if not
+        if model_size not in self.config.available_model_sizes:
+            fallback_model_size = self.config.available_model_sizes[0] if self.config.available_model_sizes else 'sm'
+            logger.warning(f"Model size '{model_size}' not supported. Using default '{fallback_model_size}' model size.")
+            model_size = fallback_model_size
+
+        return model_size
+
+    def _fallback_language(self) -> str:
+        """
+        Use the first supported language as fallback instead of hardcoded 'en'.
+        """
+        return self.config.supported_languages[0] if self.config.supported_languages else 'en'
+
+    def _detect_languages(self, texts: List[str]) -> List[Tuple[List[str], float]]:
+        """
+        Identify the languages of texts sent without languages, in one pass.
+
+        Returns:
+        - For each text, the languages to parse it with and the confidence of the detection.
+          Texts detected with low confidence are parsed with the first supported language.
+        """
+        results = []
+        for lang_code, confidence in self._language_identifier.detect(texts):
+            if lang_code is None or confidence < self.config.language_detection_min_confidence:
+                lang_code = self._fallback_language()
+            results.append(([lang_code], confidence))
+        return results
+
+    def _select_model(self, lang_code: str, model_name: str, model_size: str) -> Tuple[Optional[str], str, str]:
+        """
+        Select the model for the language code and model size, falling back to the first supported language.
+
+        Returns:
+        - A tuple of (lang_code, model_size, model_name) where model_size is the size actually used.
+          lang_code is None if no model is available.
+        """
+        if lang_code not in self._supported_codes or self.models.has_failed(lang_code, model_name.rsplit('_', 1)[-1]):
+            fallback_lang = self._fallback_language()
+            logger.warning(f"Language '{lang_code}' not supported or model not loaded. Using default '{fallback_lang}' model.")
+            lang_code = map_to_spacy_model([fallback_lang])[0]
+            # Update model_name to match the fallback language
+            _, model_name = map_to_spacy_model([lang_code], model_size=model_size)
+
+            if self.models.has_failed(lang_code, model_name.rsplit('_', 1)[-1]):
+                return None, model_size, model_name
+
+        return lang_code, model_name.rsplit('_', 1)[-1], model_name
+
+    def _run_inference(
+            self,
+            lang_code: str,
+            model_size: str,
+            texts: List[str],
+            fields: Optional[Tuple[str, ...]] = None
+    ) -> List[List[Dict]]:
+        """
+        Run the geoparser for a group of texts sharing the same model in a single pass.
+        The model is loaded into the model pool if it is not resident yet. At most
+        model_concurrency threads run the same model at the same time, since spaCy
+        pipelines and the transformer are not guaranteed to be thread-safe.
+
+        With the process backend the texts are parsed by one of the inference processes.
+        Each location has the start_char and end_char of its mention, whichever path parsed the text.
+        With fields, only those attributes of each location are extracted.
+
+        Returns:
+        - A list with the extracted locations for each input text, in input order.
+        """
+        metrics.observe_inference_batch_size(len(texts))
+        if self._inference is not None:
+            with metrics.stage('inference'):
+                return self._inference.run(lang_code, model_size, texts, fields=fields)
+
+        entry = self.models.get(lang_code, model_size)
+        metrics.set_loaded_models(len(self.models))
+
+        # Excute parsing without the progress output of the geoparser
+        with entry.semaphore, suppress_output(), metrics.stage('inference'):
+            docs = entry.model.parse(texts)
+
+        results = []
+        with metrics.stage('extract'):
+            for i in range(len(texts)):
+                # Extract locations from the parsed document
+                locations = []
+                doc = docs[i] if docs and i < len(docs) else None
+                if doc is not None and self._gazetteer_store is not None:
+                    locations = self._extract_stored_locations(entry.model, doc, fields)
+                elif doc is not None:
+                    # doc.locations is aligned with doc.toponyms, which carry the offsets of their mention
+                    for toponym, location in zip(doc.toponyms, doc.locations):
+                        location_data = extract_location_data(location, fields)
+                        if location_data:
+                            location_data['start_char'] = toponym.start_char
+                            location_data['end_char'] = toponym.end_char
+                            locations.append(location_data)
+                results.append(locations)
+
+        return results
+
+    def _extract_stored_locations(
+            self,
+            model: Geoparser,
+            doc,
+            fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict]:
+        """
+        Extract the locations of a parsed document from the gazetteer store.
+        Locations that are not in the store, e.g. because it was built with a population
+        threshold, are read from the gazetteer database in one query.
+        """
+        toponyms = [toponym for toponym in doc.toponyms if toponym._.loc_id is not None]
+        location_ids = [toponym._.loc_id for toponym in toponyms]
+        records = self._gazetteer_store.records(location_ids, fields)
+
+        missing = [location_id for location_id, record in zip(location_ids, records) if record is None]
+        if missing:
+            fetched = dict(zip(missing, model.gazetteer.query_locations(missing)))
+            records = [
+                record if record is not None else extract_location_data(fetched[location_id], fields)
+                for location_id, record in zip(location_ids, records)
+            ]
+
+        locations = []
+        for toponym, location_data in zip(toponyms, records):
+            if location_data:
+                location_data['start_char'] = toponym.start_char
+                location_data['end_char'] = toponym.end_char
+                locations.append(location_data)
+        return locations
+
+    def _build_result(
+            self,
+            text: str,
+            lang_code: str,
+            model_name: str,
+            locations: List[Dict],
+            processing_time: float,
+            parse_time: float
+    ) -> Dict:
+        """
+        Build the response dictionary for a successfully parsed text.
+        """
+        return {
+            'success': True,
+            'language_detected': lang_code,
+            'model_used': model_name,
+            'text_length': len(text),
+            'locations_found': len(locations),
+            'locations': locations,
+            'processing_time': processing_time,
+            'parse_time': parse_time,
+            'from_cache': False
+        }
+
+    def _short_circuit(self, text: str, lang_code: str, model_name: str, start_time: float) -> Optional[Dict]:
+        """
+        Answer a text without parsing if the prefilter rules out any toponym in it.
+
+        Returns:
+        - An empty result marked as short-circuited, or None if the text has to be parsed.
+        """
+        if self._prefilter is None or self._prefilter.has_candidates(text, lang_code):
+            return None
+
+        with self._stats_lock:
+            self._short_circuited += 1
+        result = self._build_result(text, lang_code, model_name, [], time.time() - start_time, 0.0)
+        result['short_circuited'] = True
+        return result
+
+    def _store_result(self, cache_key: Optional[str], result: Dict):
+        """
+        Cache a parse result if caching is enabled.
+        """
+        if cache_key is None:
+            return
+
+        # The locations are copied as well, so callers changing their result can not change the cache
+        cached_result = _copy_result(result)
+        cached_result.pop('processing_time', None)
+        if self._cache is not None:
+            self._cache.put(cache_key, cached_result)
+        if self._persistent_cache is not None:
+            self._persistent_cache.put(cache_key, cached_result)
+
+    def _lookup_cache(self, cache_key: Optional[str], start_time: float) -> Optional[Dict]:
+        """
+        Return a copy of the cached result for the key, or None on a cache miss.
+        The in-process cache is checked first, then the persistent cache.
+        """
+        if cache_key is None:
+            return None
+
+        with metrics.stage('cache_lookup'):
+            cached = self._cache.get(cache_key) if self._cache is not None else None
+            if cached is None and self._persistent_cache is not None:
+                cached = self._persistent_cache.get(cache_key)
+                # Promote persistent hits to the in-process cache
+                if cached is not None and self._cache is not None:
+                    self._cache.put(cache_key, cached)
+        metrics.observe_cache_lookup(cached is not None)
+        if cached is None:
+            return None
+
+        logger.debug(f"Cache hit for key: {cache_key[:8]}...")
+        cached_result = _copy_result(cached)
+        cached_result['from_cache'] = True
+        cached_result['processing_time'] = time.time() - start_time
+        return cached_result
+
+    def _inference_parallelism(self) -> int:
+        """
+        Number of parses of the same model that can run at the same time.
+        """
+        if self._inference is not None:
+            return self.config.inference_processes
+        return self.config.model_concurrency
+
+    def _parse_chunked(
+            self,
+            lang_code: str,
+            model_size: str,
+            text: str,
+            fields: Optional[Tuple[str, ...]] = None
+    ) -> Tuple[List[Dict], int]:
+        """
+        Parse a long text in sentence-aligned, overlapping chunks.
+
+        The chunks are parsed as one batch, or split into contiguous groups that run in
+        parallel if the model can run concurrently (model_concurrency or several inference
+        processes). Location offsets are mapped back to the text and mentions found twice
+        in the overlap between chunks are dropped.
+
+        Returns:
+        - A tuple of (locations, number of chunks). Each location has start_char and end_char.
+        """
+        chunks = chunk_text(text, self.config.chunk_size, self.config.chunk_overlap)
+        chunk_locations = self._run_inference_parallel(
+            lang_code, model_size, [text[start:end] for start, _, end in chunks], fields
+        )
+
+        logger.debug(f"Parsed {len(text)} characters in {len(chunks)} chunks")
+        return merge_chunk_locations(chunks, chunk_locations), len(chunks)
+
+    def _run_inference_parallel(
+            self,
+            lang_code: str,
+            model_size: str,
+            texts: List[str],
+            fields: Optional[Tuple[str, ...]] = None
+    ) -> List[List[Dict]]:
+        """
+        Run the geoparser for the pieces of one text.
+
+        The pieces are parsed as one batch, or split into contiguous groups that run in
+        parallel if the model can run concurrently (model_concurrency or several inference processes).
+        """
+        parallelism = min(self._inference_parallelism(), len(texts))
+        if parallelism <= 1:
+            return self._run_inference(lang_code, model_size, texts, fields=fields)
+
+        group_size = -(-len(texts) // parallelism)
+        groups = [texts[i:i + group_size] for i in range(0, len(texts), group_size)]
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = [executor.submit(self._run_inference, lang_code, model_size, group, fields) for group in groups]
+            return [locations for future in futures for locations in future.result()]
+
+    def _parse_incremental(
+            self,
+            lang_code: str,
+            model_size: str,
+            text: str,
+            fields: Optional[Tuple[str, ...]] = None
+    ) -> Tuple[List[Dict], int, int]:
+        """
+        Parse a text sentence by sentence, answering unchanged sentences from the sentence cache.
+
+        Sentences are cached by their stripped text, language, model size and fields, with location
+        offsets relative to the sentence. Only sentences missing from the cache are parsed,
+        as one batch.
+
+        Returns:
+        - A tuple of (locations, number of sentences, sentences served from the cache).
+          Each location has start_char and end_char in the text.
+        """
+        sentences = []
+        for start, end in split_sentences(text):
+            sentence = text[start:end]
+            stripped = sentence.strip()
+            if stripped:
+                offset = start + len(sentence) - len(sentence.lstrip())
+                sentences.append((offset, stripped, self._get_cache_key(stripped, lang_code, model_size, fields)))
+
+        sentence_locations: Dict[str, List[Dict]] = {}
+        missing: Dict[str, str] = {}
+        for _, sentence, key in sentences:
+            if key in sentence_locations or key in missing:
+                continue
+            cached = self._sentence_cache.get(key)
+            if cached is None:
+                missing[key] = sentence
+            else:
+                sentence_locations[key] = cached
+
+        if missing:
+            parsed = self._run_inference_parallel(lang_code, model_size, list(missing.values()), fields)
+            for key, locations in zip(missing, parsed):
+                self._sentence_cache.put(key, locations)
+                sentence_locations[key] = locations
+
+        locations = []
+        for offset, _, key in sentences:
+            for location in sentence_locations[key]:
+                location = location.copy()
+                location['start_char'] += offset
+                location['end_char'] += offset
+                locations.append(location)
+
+        cached_sentences = sum(1 for _, _, key in sentences if key not in missing)
+        logger.debug(f"Parsed {len(missing)} of {len(sentences)} sentences, {cached_sentences} from the sentence cache")
+        return locations, len(sentences), cached_sentences
+
     def parse_text(
             self,
             text: str, 
             languages: Optional[Union[List[str], str]] = None, 
             model_size: Optional[str] = None,
+            fields: Optional[Union[List[str], str]] = None
     ) -> Dict:
         """
         Parse geographic information from the input text.
@@ -112,24 +672,28 @@ class GeoParserService:
         - text: The input text to parse.
         - languages: Optional list of language codes to use for parsing. If None, uses default languages.
         - model_size: Optional model size to use for parsing. If None, uses the default model size from configuration.
+        - fields: Optional list of location attributes to return. If None, all attributes are returned.
 
         Returns:
         - A dictionary containing the parsed geographic information, or an error message if parsing fails.
         """
         start_time = time.time()
 
-        # Use default model size if not provided
-        if model_size is None:
-            model_size = self.config.default_model_size
-        
-        # Check if model_size is supported, fallback to first available if not
-        if model_size not in self.config.available_model_sizes:
-            fallback_model_size = self.config.available_model_sizes[0] if self.config.available_model_sizes else 'sm'
-            logger.warning(f"Model size '{model_size}' not supported. Using default '{fallback_model_size}' model size.")
-            model_size = fallback_model_size
+        model_size = self._resolve_model_size(model_size)
+
+        try:
+            fields = parse_fields(fields)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'locations': [],
+                'processing_time': time.time() - start_time
+            }
 
         # Validate input parameters (text length check only, since model_size is already handled)
-        validation = self._validate_input(text, languages, model_size)
+        max_length = self.config.max_document_length if self.config.enable_chunking else None
+        validation = self._validate_input(text, languages, model_size, max_length=max_length)
         if not validation["valid"]:
             return {
                 'success': False,
@@ -142,66 +706,68 @@ class GeoParserService:
         if isinstance(languages, str):
             languages = [languages]
 
+        language_confidence = None
+        if not languages and self._language_identifier is not None:
+            languages, language_confidence = self._detect_languages([text])[0]
+
         lang_code, model_name = map_to_spacy_model(languages, model_size=model_size)
 
-        # Check cache
-        if self._cache is not None:
-            cache_key = self._get_cache_key(text, lang_code, model_size)
-            if cache_key in self._cache:
-                logger.debug(f"Cache hit for key: {cache_key[:8]}...")
-                cached_result = self._cache[cache_key].copy()
-                cached_result['from_cache'] = True
-                cached_result['processing_time'] = time.time() - start_time
-                return cached_result
+        # Check cache, computing the key once for both lookup and insert
+        cache_key = self._get_cache_key(text, lang_code, model_size, fields) if self._caching_enabled else None
+        cached_result = self._lookup_cache(cache_key, start_time)
+        if cached_result is not None:
+            if language_confidence is not None:
+                cached_result['language_confidence'] = language_confidence
+            return cached_result
             
         # Check if the model is valid
-        if lang_code not in self.nlp_models:
-            # Use the first supported language as fallback instead of hardcoded 'en'
-            fallback_lang = self.config.supported_languages[0] if self.config.supported_languages else 'en'
-            logger.warning(f"Language '{lang_code}' not supported or model not loaded. Using default '{fallback_lang}' model.")
-            lang_code = fallback_lang
-            # Update model_name to match the fallback language
-            _, model_name = map_to_spacy_model([lang_code], model_size=model_size)
-
-            if lang_code not in self.nlp_models:
-                return {
-                    'success': False,
-                    'error': f"No model available for language '{lang_code}'.",
-                    'locations': [],
-                    'processing_time': time.time() - start_time
-                }
+        model_lang, model_key_size, model_name = self._select_model(lang_code, model_name, model_size)
+        if model_lang is None:
+            return {
+                'success': False,
+                'error': f"No model available for language '{self._fallback_language()}'.",
+                'locations': [],
+                'processing_time': time.time() - start_time
+            }
             
-        try:
-            # Excute parsing with context management for stdout/stderr
-            parse_start = time.time()
-            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
-                doc = self.nlp_models[lang_code].parse([text])
-            parse_time = time.time() - parse_start
+        short_circuited = self._short_circuit(text, model_lang, model_name, start_time)
+        if short_circuited is not None:
+            if language_confidence is not None:
+                short_circuited['language_confidence'] = language_confidence
+            return short_circuited
 
-            # Extract locations from the parsed document
-            locations = []
-            if doc and len(doc) > 0 and hasattr(doc[0], 'locations') and doc[0].locations:
-                for location in doc[0].locations:
-                    location_data = extract_location_data(location)
-                    if location_data:
-                        locations.append(location_data)
+        try:
+            chunks = None
+            sentences = None
+            if self._sentence_cache is not None:
+                # Only new or changed sentences are parsed
+                parse_start = time.time()
+                locations, sentences, cached_sentences = self._parse_incremental(model_lang, model_key_size, text, fields)
+                parse_time = time.time() - parse_start
+            elif self.config.enable_chunking and len(text) > self.config.chunk_size:
+                # Long texts are parsed in sentence-aligned chunks
+                parse_start = time.time()
+                locations, chunks = self._parse_chunked(model_lang, model_key_size, text, fields)
+                parse_time = time.time() - parse_start
+            elif self._batcher is not None:
+                # Concurrent requests for the same model are parsed together
+                locations, parse_time, _ = self._batcher.submit((model_lang, model_key_size, fields), text)
+            else:
+                parse_start = time.time()
+                locations = self._run_inference(model_lang, model_key_size, [text], fields=fields)[0]
+                parse_time = time.time() - parse_start
 
-            result = {
-                'success': True,
-                'language_detected': lang_code,
-                'model_used': model_name,
-                'text_length': len(text),
-                'locations_found': len(locations),
-                'locations': locations,
-                'processing_time': time.time() - start_time,
-                'parse_time': parse_time,
-                'from_cache': False
-            }
+            result = self._build_result(text, model_lang, model_name, locations, time.time() - start_time, parse_time)
+            if chunks is not None:
+                result['chunks'] = chunks
+            if sentences is not None:
+                result['sentences'] = sentences
+                result['sentences_from_cache'] = cached_sentences
+            if language_confidence is not None:
+                result['language_confidence'] = language_confidence
 
             # Cache the result if caching is enabled
-            if self._cache is not None and len(self._cache) < 1000:  # Limit cache size to 1000 entries
-                cache_key = self._get_cache_key(text, lang_code, model_size)
-                self._cache[cache_key] = {k: v for k, v in result.items() if k != 'processing_time'}
+            self._store_result(cache_key, result)
 
             return result
 
@@ -210,23 +776,102 @@ class GeoParserService:
             return {
                 'success': False,
                 'error': str(e),
-                'language_detected': lang_code,
+                'language_detected': model_lang,
                 'locations': [],
                 'processing_time': time.time() - start_time
             }
 
+    def _parse_group(
+            self,
+            lang_code: str,
+            model_size: str,
+            model_name: str,
+            group: List[Dict],
+            results: List[Optional[Dict]],
+            fields: Optional[Tuple[str, ...]] = None
+    ):
+        """
+        Parse a group of batch items that share a model in a single geoparser pass.
+
+        Each item's processing_time and parse_time are its share of the group time,
+        weighted by text length. If the batched pass fails, the items are parsed
+        one by one so a single bad text does not fail the whole group.
+        """
+        # Identical texts within a group are parsed only once
+        texts = list(dict.fromkeys(entry['text'] for entry in group))
+
+        try:
+            parse_start = time.time()
+            group_locations = dict(zip(texts, self._run_inference(lang_code, model_size, texts, fields=fields)))
+            parse_time = time.time() - parse_start
+        except Exception as e:
+            if len(group) == 1:
+                raise
+            logger.error(f"Error parsing batch group for language '{lang_code}' ({len(group)} texts): {str(e)}. Retrying texts individually.")
+            for entry in group:
+                self._parse_single(lang_code, model_size, model_name, entry, results, fields)
+            return
+
+        group_time = time.time() - parse_start
+        total_length = sum(len(entry['text']) for entry in group) or 1
+
+        for entry in group:
+            locations = group_locations[entry['text']]
+            share = len(entry['text']) / total_length
+            result = self._build_result(
+                entry['text'],
+                lang_code,
+                model_name,
+                locations,
+                entry['prepare_time'] + group_time * share,
+                parse_time * share
+            )
+            if entry.get('language_confidence') is not None:
+                result['language_confidence'] = entry['language_confidence']
+            self._store_result(entry['cache_key'], result)
+            results[entry['index']] = result
+
+    def _parse_single(
+            self,
+            lang_code: str,
+            model_size: str,
+            model_name: str,
+            entry: Dict,
+            results: List[Optional[Dict]],
+            fields: Optional[Tuple[str, ...]] = None
+    ):
+        """
+        Parse a single batch item, recording an error result if parsing fails.
+        """
+        start_time = time.time()
+        try:
+            self._parse_group(lang_code, model_size, model_name, [entry], results, fields)
+        except Exception as e:
+            logger.error(f"Error parsing text: {str(e)}")
+            results[entry['index']] = {
+                'success': False,
+                'error': str(e),
+                'language_detected': lang_code,
+                'locations': [],
+                'processing_time': entry['prepare_time'] + time.time() - start_time
+            }
 
     def parse_batch(
         self, 
         texts: List[Dict],
         model_size: Optional[str] = None,
+        fields: Optional[Union[List[str], str]] = None
     ) -> List[Dict]:
         """
         Parse geographic information from a batch of input texts.
 
+        Items are grouped by resolved language and model size, and each group is
+        parsed in a single geoparser pass. Cached items are answered without inference.
+
         Parameters:
         - texts: A list of input texts to parse.
         - model_size: Optional model size to use for parsing. If None, uses the default
+        - fields: Optional list of location attributes to return. If None, all attributes are returned.
 
         Returns:
         - A list of dictionaries, each containing the parsed geographic information for the corresponding text.
@@ -237,46 +882,197 @@ class GeoParserService:
                 'error': f"Batch size exceeds maximum limit of {self.config.max_batch_size}.",
                 'locations': []
             }]
+
+        try:
+            fields = parse_fields(fields)
+        except ValueError as e:
+            return [{
+                'success': False,
+                'error': str(e),
+                'locations': []
+            }]
         
-        results = []
+        model_size = self._resolve_model_size(model_size)
+
+        results: List[Optional[Dict]] = [None] * len(texts)
+        groups: Dict[Tuple[str, str], List[Dict]] = {}
+        model_names: Dict[Tuple[str, str], str] = {}
+
+        # Languages of items sent without languages are detected for the whole batch at once
+        detected: Dict[int, Tuple[List[str], float]] = {}
+        if self._language_identifier is not None:
+            undetected = [
+                index for index, item in enumerate(texts)
+                if isinstance(item, dict) and isinstance(item.get('text'), str) and not item.get('languages')
+            ]
+            if undetected:
+                detected = dict(zip(undetected, self._detect_languages([texts[index]['text'] for index in undetected])))
+
+        for index, item in enumerate(texts):
+            start_time = time.time()
 
-        for item in texts:
             if not isinstance(item, dict) or 'text' not in item:
-                results.append({
+                results[index] = {
                     'success': False,
                     'error': 'Invalid input format - missing text field',
                     'locations': []
-                })
+                }
                 continue
             
             text = item['text']
             languages = item.get('languages', None)
-            item_id = item.get('id', None)
-            
-            result = self.parse_text(text, languages, model_size)
-            
-            # 添加原始 ID 信息
-            if item_id is not None:
-                result['id'] = item_id
-            
-            results.append(result)
+
+            validation = self._validate_input(text, languages, model_size)
+            if not validation["valid"]:
+                results[index] = {
+                    'success': False,
+                    'error': validation["error"],
+                    'locations': [],
+                    'processing_time': time.time() - start_time
+                }
+                continue
+
+            if isinstance(languages, str):
+                languages = [languages]
+
+            language_confidence = None
+            if index in detected:
+                languages, language_confidence = detected[index]
+
+            lang_code, model_name = map_to_spacy_model(languages, model_size=model_size)
+
+            # Cache hits are answered before inference
+            cache_key = self._get_cache_key(text, lang_code, model_size, fields) if self._caching_enabled else None
+            cached_result = self._lookup_cache(cache_key, start_time)
+            if cached_result is not None:
+                if language_confidence is not None:
+                    cached_result['language_confidence'] = language_confidence
+                results[index] = cached_result
+                continue
+
+            model_lang, model_key_size, model_name = self._select_model(lang_code, model_name, model_size)
+            if model_lang is None:
+                results[index] = {
+                    'success': False,
+                    'error': f"No model available for language '{self._fallback_language()}'.",
+                    'locations': [],
+                    'processing_time': time.time() - start_time
+                }
+                continue
+
+            short_circuited = self._short_circuit(text, model_lang, model_name, start_time)
+            if short_circuited is not None:
+                if language_confidence is not None:
+                    short_circuited['language_confidence'] = language_confidence
+                results[index] = short_circuited
+                continue
+
+            group_key = (model_lang, model_key_size)
+            groups.setdefault(group_key, []).append({
+                'index': index,
+                'text': text,
+                'cache_key': cache_key,
+                'language_confidence': language_confidence,
+                'prepare_time': time.time() - start_time
+            })
+            model_names[group_key] = model_name
+
+        for (lang_code, size), group in groups.items():
+            if len(group) == 1:
+                self._parse_single(lang_code, size, model_names[(lang_code, size)], group[0], results, fields)
+            else:
+                self._parse_group(lang_code, size, model_names[(lang_code, size)], group, results, fields)
+
+        # Attach the original IDs in input order
+        for index, item in enumerate(texts):
+            if isinstance(item, dict) and item.get('id', None) is not None:
+                results[index]['id'] = item['id']
         
         return results
 
+    def parse_batch_isolated(
+        self,
+        texts: List[Dict],
+        model_size: Optional[str] = None,
+        fields: Optional[Union[List[str], str]] = None
+    ) -> List[Dict]:
+        """
+        Parse a batch like parse_batch, for bulk callers that must not lose a whole batch to one item.
+        If parse_batch raises, the items are parsed one at a time, so an item that breaks the
+        parser gets an error result of its own.
+        """
+        try:
+            return self.parse_batch(texts, model_size=model_size, fields=fields)
+        except Exception as e:
+            logger.error(f"Failed to parse a batch of {len(texts)} texts, parsing them one by one: {str(e)}")
+
+        results = []
+        for item in texts:
+            try:
+                results.append(self.parse_batch([item], model_size=model_size, fields=fields)[0])
+            except Exception as e:
+                results.append({'success': False, 'error': f"Parsing failed: {str(e)}", 'locations': []})
+        return results
+
+    def _inference_stats(self) -> Optional[List[Dict]]:
+        """
+        Get the statistics of the inference processes, or None with the local backend.
+        """
+        return self._inference.stats() if self._inference is not None else None
+
+    def _loaded_model_keys(self, inference_stats: Optional[List[Dict]] = None) -> List[Tuple[str, str]]:
+        """
+        Keys of the resident models, in this process or in any inference process.
+        """
+        if self._inference is None:
+            return self.models.keys()
+
+        keys = []
+        for process_stats in inference_stats if inference_stats is not None else self._inference_stats():
+            for spec in process_stats.get('loaded_models', []):
+                key = tuple(spec.split(':', 1))
+                if key not in keys:
+                    keys.append(key)
+        return keys
+
     def get_model_info(self) -> Dict:
         """
         Get information about the loaded models.
         """
+        inference_stats = self._inference_stats()
         return {
-            'loaded_models': list(self.nlp_models.keys()),
+            'loaded_models': list(dict.fromkeys(lang for lang, _ in self._loaded_model_keys(inference_stats))),
+            'model_pool': self.models.stats() if self._inference is None else None,
+            'spacy_pipelines': self.spacy_pipelines() if self._inference is None else None,
+            'inference_backend': self.config.inference_backend,
+            'inference_processes': inference_stats,
             'default_model_size': self.config.default_model_size,
             'transformer_model': self.config.transformer_model,
             'gazetteer': self.config.gazetteer,
             'supported_languages': self.config.supported_languages,
+            'language_detection': {
+                'min_confidence': self.config.language_detection_min_confidence
+            } if self._language_identifier is not None else None,
             'cache_enabled': self.config.enable_cache,
             'cache_size': len(self._cache) if self._cache else 0,
+            'cache_stats': self._cache.stats() if self._cache is not None else None,
+            'sentence_cache_stats': self._sentence_cache.stats() if self._sentence_cache is not None else None,
+            'resolution_cache_stats': self._resolution_cache.stats() if self._resolution_cache is not None else None,
+            'embedding_index': self._embedding_index.stats() if self._embedding_index is not None else None,
+            'gazetteer_store': self._gazetteer_store.stats() if self._gazetteer_store is not None else None,
+            'prefilter': dict(self._prefilter.stats(), short_circuited=self._short_circuited) if self._prefilter is not None else None,
+            'persistent_cache_enabled': self._persistent_cache is not None,
+            'persistent_cache_stats': self._persistent_cache.stats() if self._persistent_cache is not None else None,
             'max_text_length': self.config.max_text_length,
-            'max_batch_size': self.config.max_batch_size
+            'chunking': {
+                'chunk_size': self.config.chunk_size,
+                'chunk_overlap': self.config.chunk_overlap,
+                'max_document_length': self.config.max_document_length
+            } if self.config.enable_chunking else None,
+            'max_batch_size': self.config.max_batch_size,
+            'warmup': self._warmup,
+            'micro_batching': self._batcher.stats() if self._batcher is not None else None,
+            'process_memory': memory_report()
         }
 
     def health_check(self) -> Dict:
@@ -289,7 +1085,7 @@ class GeoParserService:
 
             return {
                 'status': 'healthy',
-                'models_loaded': len(self.nlp_models),
+                'models_loaded': len(self._loaded_model_keys()),
                 'test_parse_success': test_result['success'],
                 'config_valid': True
             }
@@ -298,23 +1094,72 @@ class GeoParserService:
             return {
                 'status': 'unhealthy',
                 'error': str(e),
-                'models_loaded': len(self.nlp_models),
+                'models_loaded': len(self._loaded_model_keys()),
                 'config_valid': False
             }
 
-    def clear_cache(self) -> Dict:
+    def liveness(self) -> Dict:
+        """
+        Liveness of the service, without running inference.
+        """
+        return {
+            'status': 'alive',
+            'pid': os.getpid(),
+            'models_loaded': len(self.models) if self._inference is None else None
+        }
+
+    def readiness(self) -> Dict:
+        """
+        Readiness of the service, from the recorded warm-up instead of a test parse.
+        With the process backend, every inference process must be up and warmed up.
+        """
+        if self._inference is not None:
+            processes = [
+                {
+                    'index': process_stats['index'],
+                    'available': process_stats['available'],
+                    'warmup': process_stats.get('warmup')
+                }
+                for process_stats in self._inference_stats()
+            ]
+            ready = all(
+                process['available'] and (process['warmup'] or {}).get('status') != 'failed'
+                for process in processes
+            )
+            return {'status': 'ready' if ready else 'not_ready', 'inference_processes': processes}
+
+        ready = self._warmup is None or self._warmup['status'] != 'failed'
+        return {
+            'status': 'ready' if ready else 'not_ready',
+            'models_loaded': len(self.models),
+            'warmup': self._warmup
+        }
+
+    def clear_cache(self, include_persistent: bool = True) -> Dict:
         """
         Clear the cache if caching is enabled.
+
+        Parameters:
+        - include_persistent: Also clear the persistent cache shared by all workers on the host.
         """
-        if self._cache is not None:
-            cache_size = len(self._cache)
-            self._cache.clear()
-            return {
-                'success': True,
-                'message': f"Cache cleared successfully. Removed {cache_size} entries.",
-            }
-        else:
+        if not self._caching_enabled and self._sentence_cache is None:
             return {
                 'success': False,
                 'message': "Caching is not enabled. No cache to clear."
-            }
\ No newline at end of file
+            }
+
+        cache_size = self._cache.clear() if self._cache is not None else 0
+        message = f"Cache cleared successfully. Removed {cache_size} entries."
+
+        if self._sentence_cache is not None:
+            sentence_size = self._sentence_cache.clear()
+            message += f" Removed {sentence_size} sentence entries."
+
+        if include_persistent and self._persistent_cache is not None:
+            persistent_size = self._persistent_cache.clear()
+            message += f" Removed {persistent_size} persistent entries."
+
+        return {
+            'success': True,
+            'message': message,
+        }
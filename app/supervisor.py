@@ -0,0 +1,164 @@
+"""
+Supervision of the long-running child processes of the server: the inference processes
+(app.inference) and the job workers (app.jobs).
+
+Both run in a supervisor process that is started as a plain subprocess of the Gunicorn master
+or of app.main. The supervisor spawns the children, restarts the ones that exit with a backoff
+and stops them when it is terminated; children exit on their own when the supervisor is gone.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import subprocess
+import multiprocessing
+from multiprocessing.connection import wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .metrics import mark_process_dead
+
+logger = logging.getLogger(__name__)
+
+# Restart backoff for children that keep exiting
+_RESTART_DELAY = 1.0
+_MAX_RESTART_DELAY = 30.0
+# Children that ran at least this long before exiting are restarted immediately
+_STABLE_SECONDS = 60.0
+
+
+def watch_parent(parent_pid: int):
+    """Exit if the supervisor is gone, e.g. because it was killed. Run in a daemon thread of a child."""
+    while True:
+        time.sleep(5)
+        if os.getppid() != parent_pid:
+            os._exit(0)
+
+
+def restart_delay(previous: float, ran_for: float) -> float:
+    """
+    Seconds to wait before restarting a child that exited after running ran_for seconds.
+
+    Parameters:
+    - previous: The delay before the last restart of the child, 0 for none.
+    - ran_for: Seconds the child ran before it exited.
+    """
+    if ran_for >= _STABLE_SECONDS:
+        return 0.0
+    return min(max(previous * 2, _RESTART_DELAY), _MAX_RESTART_DELAY)
+
+
+def supervise(
+        count: int,
+        target: Callable,
+        make_args: Callable[[int], Tuple],
+        label: str,
+        name: str,
+        parent_pid: int
+):
+    """
+    Main loop of a supervisor process: run count children and restart them when they exit.
+
+    Parameters:
+    - count: Number of children.
+    - target: Entry point of a child, called with make_args(index) in a spawned process.
+    - make_args: Builds the arguments of the child with the given index.
+    - label: Name of a child in log messages, e.g. 'Inference process'.
+    - name: Prefix of the process names, e.g. 'geoparser-inference'.
+    - parent_pid: Pid of the server process; the supervisor stops when it is gone.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Turn SIGTERM into a normal exit so the children are stopped with the supervisor
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    context = multiprocessing.get_context('spawn')
+    children: Dict[int, multiprocessing.Process] = {}
+    started: Dict[int, float] = {}
+    delays: Dict[int, float] = {}
+
+    def start(index: int):
+        process = context.Process(target=target, args=make_args(index), name=f"{name}-{index}", daemon=True)
+        process.start()
+        children[index] = process
+        started[index] = time.time()
+
+    try:
+        for index in range(count):
+            start(index)
+
+        while os.getppid() == parent_pid:
+            sentinels = {process.sentinel: index for index, process in children.items()}
+            for sentinel in wait(list(sentinels), timeout=5):
+                index = sentinels[sentinel]
+                process = children[index]
+                process.join()
+
+                delays[index] = restart_delay(delays.get(index, 0.0), time.time() - started[index])
+                logger.warning(f"{label} {index} (pid {process.pid}) exited with code {process.exitcode}, "
+                               f"restarting in {delays[index]:.0f}s")
+                mark_process_dead(process.pid)
+                time.sleep(delays[index])
+                start(index)
+    finally:
+        for process in children.values():
+            if process.is_alive():
+                process.terminate()
+        for process in children.values():
+            process.join(timeout=10)
+
+
+class SupervisorProcess:
+    """
+    Handle on a supervisor process, started as `python -c 'from <module> import main; main()' <args>`.
+    """
+    def __init__(self, module: str):
+        """
+        Initialize the handle.
+
+        Parameters:
+        - module: Module whose main() runs the supervisor, e.g. 'app.inference'.
+        """
+        self.module = module
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process is not None else None
+
+    def start(self, args: List[str], secret: Optional[bytes] = None) -> 'SupervisorProcess':
+        """
+        Start the supervisor.
+
+        Parameters:
+        - args: Command line arguments of the supervisor; --parent-pid is added.
+        - secret: Written to the stdin of the supervisor, so it does not show up in the process
+          environment or arguments.
+        """
+        # A plain subprocess rather than a multiprocessing child: forked Gunicorn workers
+        # would otherwise inherit it as their own child and try to join it on exit
+        self._process = subprocess.Popen(
+            [sys.executable, '-c', f'from {self.module} import main; main()', *args, '--parent-pid', str(os.getpid())],
+            stdin=subprocess.PIPE if secret is not None else None
+        )
+        if secret is not None:
+            self._process.stdin.write(secret)
+            self._process.stdin.close()
+        return self
+
+    def stop(self, timeout: float = 15) -> bool:
+        """
+        Stop the supervisor and its children.
+
+        Returns:
+        - False if the supervisor was not running.
+        """
+        if self._process is None:
+            return False
+        self._process.terminate()
+        try:
+            self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+        return True
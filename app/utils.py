@@ -1,9 +1,78 @@
+import sys
 import numpy as np
 import logging
-from typing import Union, List, Tuple, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Attributes of a location, in the order of extract_location_data
+LOCATION_FIELDS = (
+    'name', 'geonameid', 'feature_type', 'latitude', 'longitude', 'elevation',
+    'population', 'admin2_name', 'admin1_name', 'country_name'
+)
+
+
+class _ThreadFilteredStream:
+    """
+    Wrapper around a standard stream that drops writes from threads inside suppress_output().
+    """
+    def __init__(self, stream, state: threading.local):
+        self._stream = stream
+        self._state = state
+
+    def write(self, data):
+        if getattr(self._state, 'depth', 0) > 0:
+            return len(data)
+        return self._stream.write(data)
+
+    def writelines(self, lines):
+        if getattr(self._state, 'depth', 0) > 0:
+            return None
+        return self._stream.writelines(lines)
+
+    def flush(self):
+        if getattr(self._state, 'depth', 0) > 0:
+            return None
+        return self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+_suppress_state = threading.local()
+_suppress_lock = threading.Lock()
+
+
+def _install_stream_filters():
+    """
+    Wrap sys.stdout and sys.stderr once; the wrappers pass writes through unless the
+    writing thread is suppressed, so installing them does not change other threads' output.
+    """
+    with _suppress_lock:
+        if not isinstance(sys.stdout, _ThreadFilteredStream):
+            sys.stdout = _ThreadFilteredStream(sys.stdout, _suppress_state)
+        if not isinstance(sys.stderr, _ThreadFilteredStream):
+            sys.stderr = _ThreadFilteredStream(sys.stderr, _suppress_state)
+
+
+@contextmanager
+def suppress_output():
+    """
+    Discard stdout/stderr output (e.g. progress bars) written by the current thread.
+    Unlike redirect_stdout, concurrent threads keep their output.
+    """
+    if not isinstance(sys.stdout, _ThreadFilteredStream) or not isinstance(sys.stderr, _ThreadFilteredStream):
+        _install_stream_filters()
+
+    _suppress_state.depth = getattr(_suppress_state, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _suppress_state.depth -= 1
+
+
 def map_to_spacy_model(
         lang_code: Union[List, np.ndarray, None],
         model_size: str = "sm",
@@ -99,9 +168,39 @@ def map_to_spacy_model(
     return code, model_name
 
 
-def extract_location_data(location) -> Optional[dict]:
+def parse_fields(fields: Optional[Union[str, Iterable[str]]]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a field projection of the location data.
+
+    Parameters:
+    - fields: A list of location attributes or a comma-separated string, None for all attributes.
+
+    Returns:
+    - The requested attributes without duplicates, in request order, or None for all attributes.
+
+    Raises:
+    - ValueError: If an attribute is unknown or no attribute is requested.
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    if not isinstance(fields, (list, tuple)) or not all(isinstance(field, str) for field in fields):
+        raise ValueError("fields must be a list of strings or a comma-separated string")
+
+    fields = tuple(dict.fromkeys(field.strip() for field in fields if field.strip()))
+    unknown = [field for field in fields if field not in LOCATION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}. Available fields: {list(LOCATION_FIELDS)}")
+    if not fields:
+        raise ValueError("fields must name at least one field")
+    return fields
+
+
+def extract_location_data(location, fields: Optional[Sequence[str]] = None) -> Optional[dict]:
     """
     Extract geographic information from a location object.
+    With fields, only those attributes are extracted.
     """
     if location is None:
         return None
@@ -126,15 +225,37 @@ def extract_location_data(location) -> Optional[dict]:
         location = location_dict
     
     # Extract standardized geographic information
-    return {
-        'name': location.get('name', None),
-        'geonameid': location.get('geonameid', None),
-        'feature_type': location.get('feature_type', None),
-        'latitude': location.get('latitude', None),
-        'longitude': location.get('longitude', None),
-        'elevation': location.get('elevation', None),
-        'population': location.get('population', None),
-        'admin2_name': location.get('admin2_name', None),
-        'admin1_name': location.get('admin1_name', None),
-        'country_name': location.get('country_name', None)
-    }
\ No newline at end of file
+    return {field: location.get(field, None) for field in fields or LOCATION_FIELDS}
+
+
+def columnar_locations(results: List[Dict], fields: Optional[Sequence[str]] = None) -> Tuple[List[Dict], Dict[str, List]]:
+    """
+    Convert the locations of a list of parse results to parallel arrays.
+
+    Parameters:
+    - results: Parse results, each with a list of locations.
+    - fields: The location attributes to include, None for all attributes.
+
+    Returns:
+    - A tuple of (results without their locations, columns). The columns hold one array per
+      attribute with the locations of all results in order, and an 'offsets' array with
+      len(results) + 1 entries: the locations of result i are at offsets[i]:offsets[i + 1].
+    """
+    fields = list(fields or LOCATION_FIELDS)
+    # Offsets of the mentions are kept if the locations have them
+    for result in results:
+        if result.get('locations'):
+            fields += [field for field in ('start_char', 'end_char') if field in result['locations'][0]]
+            break
+
+    columns: Dict[str, List] = {field: [] for field in fields}
+    offsets = [0]
+    rows = []
+    for result in results:
+        locations = result.get('locations') or []
+        for field in fields:
+            columns[field].extend(location.get(field) for location in locations)
+        offsets.append(offsets[-1] + len(locations))
+        rows.append({key: value for key, value in result.items() if key != 'locations'})
+    columns['offsets'] = offsets
+    return rows, columns
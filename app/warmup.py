@@ -0,0 +1,123 @@
+import json
+import time
+import logging
+from typing import Dict, List
+
+from .utils import map_to_spacy_model
+
+logger = logging.getLogger(__name__)
+
+# Short and long texts with a few toponyms each, so that the first parses allocate the buffers
+# of realistic batch and document sizes and fill the gazetteer connections and page caches
+WARMUP_TEXTS = {
+    'en': [
+        "I want to travel to Beijing!",
+        "Heavy rain caused flooding along the Rhine between Basel and Cologne, and the port of Rotterdam closed two terminals.",
+        "The conference moved from San Francisco to Toronto. Delegates from Nairobi, Lima and Jakarta arrive on Monday, "
+        "while the organizers stay in Vancouver until the venue in Montreal is confirmed.",
+    ],
+    'de': [
+        "Ich möchte nach Peking reisen!",
+        "Das Hochwasser der Donau erreichte Passau und Regensburg, in Wien blieb der Pegel stabil.",
+        "Der Zug von Hamburg nach München hält in Hannover, Göttingen und Nürnberg. Von dort fahren Busse nach Salzburg und Innsbruck.",
+    ],
+    'fr': [
+        "Je veux voyager à Pékin !",
+        "Les orages ont touché Lyon et Grenoble, tandis que Marseille et Nice sont restées épargnées.",
+        "Le festival quitte Avignon pour Bordeaux cette année. Des troupes de Montréal, Dakar et Bruxelles sont attendues à partir de juillet.",
+    ],
+    'es': [
+        "¡Quiero viajar a Pekín!",
+        "Las lluvias afectaron a Valencia y Murcia, mientras que Sevilla y Málaga registraron temperaturas récord.",
+        "La gira comienza en Madrid y sigue por Barcelona, Bilbao y Zaragoza. Después viaja a Buenos Aires, Santiago y Ciudad de México.",
+    ],
+    'zh': [
+        "我想去北京旅游！",
+        "暴雨导致广州和深圳的航班延误，上海和杭州的交通基本正常。",
+        "代表团从成都出发，经过西安和兰州，最后抵达乌鲁木齐。随后他们将前往香港和台北参加会议。",
+    ],
+}
+
+
+def load_corpus(path: str) -> Dict[str, List[str]]:
+    """
+    Load a warm-up corpus in JSONL format, one {"text": ..., "languages": [...]} object per line.
+
+    Returns:
+    - The texts by spaCy language code; texts without languages are under '' and used for every model.
+    """
+    corpus: Dict[str, List[str]] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            languages = record.get('languages')
+            lang_code = map_to_spacy_model([languages] if isinstance(languages, str) else languages)[0] if languages else ''
+            corpus.setdefault(lang_code, []).append(record['text'])
+    return corpus
+
+
+def corpus_for(lang_code: str, corpus: Dict[str, List[str]]) -> List[str]:
+    """
+    The warm-up texts of a language: the built-in texts (English for other languages) and the configured corpus.
+    """
+    return WARMUP_TEXTS.get(lang_code, WARMUP_TEXTS['en']) + corpus.get(lang_code, []) + corpus.get('', [])
+
+
+def warm_up(service, corpus_path: str = '') -> Dict:
+    """
+    Run the warm-up corpus through every resident model before the service reports ready.
+
+    Every model parses its texts one at a time and as one batch, like the single and batch
+    requests, so that lazy allocations and first-call costs are paid here instead of by the
+    first requests. The language identifier and the prefilter are
+    warmed up as well.
+
+    Parameters:
+    - service: The GeoParserService to warm up.
+    - corpus_path: Optional JSONL corpus added to the built-in texts, see load_corpus.
+
+    Returns:
+    - The warm-up result: the status ('ok', 'degraded' if some models failed, 'failed' if all
+      failed) and the time and outcome per model.
+    """
+    start_time = time.time()
+    corpus: Dict[str, List[str]] = {}
+    if corpus_path:
+        try:
+            corpus = load_corpus(corpus_path)
+        except Exception as e:
+            logger.error(f"Failed to load the warm-up corpus '{corpus_path}', using the built-in texts: {e}")
+
+    all_texts = [text for texts in WARMUP_TEXTS.values() for text in texts]
+    if service._language_identifier is not None:
+        service._detect_languages(all_texts)
+    if service._prefilter is not None:
+        for text in all_texts:
+            service._prefilter.has_candidates(text)
+
+    models = []
+    if service._inference is None:
+        for lang_code, model_size in service.models.keys():
+            texts = corpus_for(lang_code, corpus)
+            model_start = time.time()
+            try:
+                for text in texts:
+                    service._run_inference(lang_code, model_size, [text])
+                service._run_inference(lang_code, model_size, texts)
+                models.append({'model': f"{lang_code}:{model_size}", 'texts': len(texts), 'seconds': round(time.time() - model_start, 3)})
+            except Exception as e:
+                logger.error(f"Warm-up of model '{lang_code}:{model_size}' failed: {e}")
+                models.append({'model': f"{lang_code}:{model_size}", 'texts': len(texts), 'error': str(e)})
+
+    failed = [model for model in models if 'error' in model]
+    status = 'failed' if failed and len(failed) == len(models) else 'degraded' if failed else 'ok'
+    result = {
+        'status': status,
+        'models': models,
+        'seconds': round(time.time() - start_time, 3),
+        'completed_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    logger.info(f"Warm-up finished in {result['seconds']}s with status '{status}' for {len(models)} models")
+    return result
@@ -0,0 +1,121 @@
+"""
+Synthetic multilingual corpus for the benchmarks.
+
+Texts are built from templates with zero to two place names per sentence and a seeded random
+number generator, so the same arguments always produce the same corpus. The place names are
+also the gazetteer of the stub geoparser (see stub.py).
+"""
+import json
+import random
+from typing import Dict, List, Optional
+
+PLACES = {
+    'en': ['London', 'Manchester', 'Boston', 'Chicago', 'Toronto', 'Sydney', 'Dublin', 'Edinburgh', 'Seattle', 'Denver'],
+    'de': ['Berlin', 'München', 'Hamburg', 'Köln', 'Wien', 'Zürich', 'Passau', 'Regensburg', 'Leipzig', 'Dresden'],
+    'fr': ['Paris', 'Lyon', 'Marseille', 'Bordeaux', 'Toulouse', 'Genève', 'Bruxelles', 'Nantes', 'Lille', 'Montréal'],
+    'es': ['Madrid', 'Barcelona', 'Sevilla', 'Valencia', 'Bilbao', 'Málaga', 'Lima', 'Bogotá', 'Quito', 'Santiago'],
+    'zh': ['北京', '上海', '广州', '深圳', '成都', '杭州', '西安', '武汉', '南京', '重庆'],
+}
+
+TEMPLATES = {
+    'en': [
+        "Heavy rain caused flooding between {0} and {1}.",
+        "The delegation travelled from {0} to {1} on Monday.",
+        "A new office opened in {0} this spring.",
+        "Prices in {0} rose faster than anywhere else.",
+    ],
+    'de': [
+        "Das Hochwasser erreichte {0} und {1} am Wochenende.",
+        "Der Zug von {0} nach {1} fiel heute aus.",
+        "In {0} wurde ein neues Museum eröffnet.",
+        "Die Mieten in {0} steigen weiter.",
+    ],
+    'fr': [
+        "Les orages ont touché {0} et {1} pendant la nuit.",
+        "Le festival quitte {0} pour {1} cette année.",
+        "Une nouvelle ligne de tramway a ouvert à {0}.",
+        "Les prix à {0} ont fortement augmenté.",
+    ],
+    'es': [
+        "Las lluvias afectaron a {0} y {1} durante el fin de semana.",
+        "La gira comienza en {0} y termina en {1}.",
+        "Se inauguró un nuevo hospital en {0}.",
+        "Los precios en {0} subieron más que en otras ciudades.",
+    ],
+    'zh': [
+        "暴雨导致{0}和{1}的航班延误。",
+        "代表团从{0}出发前往{1}。",
+        "{0}新开了一家博物馆。",
+        "{0}的房价继续上涨。",
+    ],
+}
+
+FILLER = {
+    'en': ["The committee will meet again next week.", "Officials did not comment on the report.",
+           "Most residents welcomed the decision.", "Further details are expected soon."],
+    'de': ["Der Ausschuss trifft sich nächste Woche erneut.", "Die Behörden äußerten sich nicht.",
+           "Die meisten Anwohner begrüßten die Entscheidung.", "Weitere Einzelheiten folgen."],
+    'fr': ["Le comité se réunira la semaine prochaine.", "Les autorités n'ont pas commenté le rapport.",
+           "La plupart des habitants ont salué la décision.", "D'autres détails sont attendus."],
+    'es': ["El comité se reunirá la próxima semana.", "Las autoridades no comentaron el informe.",
+           "La mayoría de los vecinos aplaudió la decisión.", "Se esperan más detalles pronto."],
+    'zh': ["委员会将于下周再次开会。", "官员没有对报告发表评论。", "大多数居民对这一决定表示欢迎。", "更多细节预计很快公布。"],
+}
+
+
+def synthetic_corpus(
+    languages: List[str],
+    count: int,
+    seed: int = 0,
+    max_sentences: int = 8,
+    toponym_ratio: float = 0.6
+) -> List[Dict]:
+    """
+    Generate a reproducible corpus.
+
+    Parameters:
+    - languages: Languages of the texts, used in turn; unknown languages fall back to English texts.
+    - count: Number of texts per language.
+    - seed: Seed of the random number generator.
+    - max_sentences: Texts have between 1 and max_sentences sentences.
+    - toponym_ratio: Share of sentences with place names.
+
+    Returns:
+    - A list of {"text": ..., "languages": [...]} records.
+    """
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        for language in languages:
+            lang = language if language in TEMPLATES else 'en'
+            sentences = []
+            for _ in range(rng.randint(1, max_sentences)):
+                if rng.random() < toponym_ratio:
+                    first, second = rng.sample(PLACES[lang], 2)
+                    sentences.append(rng.choice(TEMPLATES[lang]).format(first, second))
+                else:
+                    sentences.append(rng.choice(FILLER[lang]))
+            separator = '' if lang == 'zh' else ' '
+            records.append({'text': separator.join(sentences), 'languages': [language]})
+    return records
+
+
+def load_jsonl(path: str, languages: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Load {"text": ..., "languages": [...]} records, optionally only those of the given languages.
+    """
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'text' not in record:
+                continue
+            record_languages = record.get('languages') or []
+            if isinstance(record_languages, str):
+                record_languages = [record_languages]
+            if languages and not set(record_languages) & set(languages):
+                continue
+            records.append({'text': record['text'], 'languages': record_languages})
+    return records
@@ -0,0 +1,267 @@
+"""
+Open-loop HTTP load generator for /api/parse and /api/parse/batch.
+
+Requests are sent on a fixed schedule (constant or Poisson arrivals at --rate requests per
+second) whether or not earlier requests have completed, like independent clients. Latency is
+measured from the scheduled send time, so time spent waiting for a free connection counts and
+an overloaded server shows up as growing latency instead of a lower request rate. Service time
+is measured from the actual send.
+
+The requests are either synthetic (see corpus.py) or replayed from a capture, one JSON object
+per line: a request body such as {"text": ..., "languages": [...]} for /api/parse or
+{"texts": [...]} for /api/parse/batch, or {"endpoint": ..., "body": {...}, "offset": seconds}.
+A string body is sent as the text of /api/parse, so records such as {"request_id", "title", "body"} work too.
+With --replay-timing the offsets of the capture are replayed (scaled by --speed) instead of --rate.
+
+To benchmark the HTTP stack without models, serve the API on the stub geoparser:
+    gunicorn --config gunicorn.conf.py --pythonpath benchmarks --workers 4 stub_app:app
+
+Usage:
+    python benchmarks/http_load.py --rate 50 --duration 60
+    python benchmarks/http_load.py --endpoint batch --batch-size 16 --rate 5 --arrival poisson
+    python benchmarks/http_load.py --capture capture.jsonl --replay-timing --speed 2 --output load.json
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from corpus import synthetic_corpus
+from report import environment, percentiles
+
+ENDPOINTS = {'parse': '/api/parse', 'batch': '/api/parse/batch'}
+
+
+def load_capture(path: str) -> List[Dict]:
+    """
+    Load captured requests as {"endpoint", "body", "offset"} records.
+    """
+    requests = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = record.get('body', record)
+            if isinstance(body, str):
+                # Records like {"request_id", "title", "body"} with the text as body
+                body = {'text': body}
+            endpoint = record.get('endpoint') or (ENDPOINTS['batch'] if 'texts' in body else ENDPOINTS['parse'])
+            requests.append({'endpoint': endpoint, 'body': body, 'offset': record.get('offset')})
+    return requests
+
+
+def synthetic_requests(languages: List[str], count: int, endpoint: str, batch_size: int, seed: int) -> List[Dict]:
+    """
+    Build requests from the synthetic corpus.
+    """
+    records = synthetic_corpus(languages, count, seed=seed)
+    if endpoint == 'parse':
+        return [{'endpoint': ENDPOINTS['parse'], 'body': record, 'offset': None} for record in records]
+    return [
+        {'endpoint': ENDPOINTS['batch'], 'body': {'texts': records[offset:offset + batch_size]}, 'offset': None}
+        for offset in range(0, len(records), batch_size)
+    ]
+
+
+def schedule(requests: List[Dict], rate: float, duration: float, arrival: str, replay_timing: bool,
+             speed: float, seed: int) -> List[Tuple[float, Dict]]:
+    """
+    Send times, in seconds from the start, of the requests of the run.
+    Requests are cycled until the duration is reached, except when replaying a capture's timing.
+    """
+    if replay_timing:
+        offsets = [request['offset'] for request in requests]
+        if any(offset is None for offset in offsets):
+            raise ValueError("--replay-timing needs an 'offset' in every captured request")
+        first = min(offsets)
+        return sorted(((offset - first) / speed, request) for offset, request in zip(offsets, requests))
+
+    rng = random.Random(seed)
+    times = []
+    at = 0.0
+    index = 0
+    while at < duration:
+        times.append((at, requests[index % len(requests)]))
+        index += 1
+        at += rng.expovariate(rate) if arrival == 'poisson' else 1.0 / rate
+    return times
+
+
+class LoadGenerator:
+    """
+    Sends scheduled requests from a pool of threads with one keep-alive connection each.
+    """
+    def __init__(self, base_url: str, max_in_flight: int, timeout: float):
+        url = urlsplit(base_url)
+        self.host = url.hostname or 'localhost'
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.https = url.scheme == 'https'
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.results: List[Dict] = []
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = self._local.connection = cls(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        connection = self._connection()
+        try:
+            connection.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def _send(self, start: float, scheduled: float, request: Dict):
+        sent = time.perf_counter()
+        body = request['body']
+        try:
+            status, _ = self.request('POST', request['endpoint'], json.dumps(body, ensure_ascii=False).encode('utf-8'))
+            status = str(status)
+        except Exception as e:
+            status = type(e).__name__
+        done = time.perf_counter()
+        with self._lock:
+            self.results.append({
+                'endpoint': request['endpoint'],
+                'status': status,
+                'texts': len(body['texts']) if 'texts' in body else 1,
+                'latency': done - (start + scheduled),
+                'service_time': done - sent,
+                'done': done - start
+            })
+
+    def run(self, times: List[Tuple[float, Dict]]) -> float:
+        """
+        Send the requests at their scheduled times and wait for all of them.
+
+        Returns:
+        - The time until the last response, in seconds.
+        """
+        start = time.perf_counter()
+        for scheduled, request in times:
+            delay = start + scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.executor.submit(self._send, start, scheduled, request)
+        self.executor.shutdown(wait=True)
+        return time.perf_counter() - start
+
+
+def wait_ready(generator: LoadGenerator, seconds: float) -> bool:
+    """
+    Wait until /api/health/ready answers 200, or 404 for a server without the endpoint.
+    """
+    deadline = time.time() + seconds
+    while True:
+        try:
+            status, _ = generator.request('GET', '/api/health/ready')
+            if status in (200, 404):
+                return True
+        except Exception:
+            pass
+        if time.time() >= deadline:
+            return False
+        time.sleep(1)
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    ok = [result for result in results if result['status'] == '200']
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+    return {
+        'requests': len(results),
+        'succeeded': len(ok),
+        'statuses': statuses,
+        'seconds': round(elapsed, 3),
+        'achieved_rate': round(len(ok) / elapsed, 2) if elapsed else None,
+        'throughput_texts_per_s': round(sum(result['texts'] for result in ok) / elapsed, 2) if elapsed else None,
+        'latency_ms': percentiles([result['latency'] for result in ok]),
+        'service_time_ms': percentiles([result['service_time'] for result in ok])
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Open-loop HTTP load generator for the GeoParser API.')
+    parser.add_argument('--url', default='http://localhost:5000', help='Base URL of the API (default: http://localhost:5000)')
+    parser.add_argument('--capture', default=None, help='JSONL capture of requests to replay instead of synthetic requests')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='parse', help='Endpoint of synthetic requests (default: parse)')
+    parser.add_argument('--batch-size', type=int, default=16, help='Texts per synthetic batch request (default: 16)')
+    parser.add_argument('--languages', default='en,de,fr,zh,es', help='Languages of the synthetic texts (default: en,de,fr,zh,es)')
+    parser.add_argument('--texts', type=int, default=200, help='Synthetic texts per language (default: 200)')
+    parser.add_argument('--rate', type=float, default=10.0, help='Target requests per second (default: 10)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of load (default: 30)')
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='constant', help='Arrival process (default: constant)')
+    parser.add_argument('--replay-timing', action='store_true', help="Replay the capture's offsets instead of --rate")
+    parser.add_argument('--speed', type=float, default=1.0, help='Speed-up of a replayed capture (default: 1)')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='Concurrent connections (default: 64)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Request timeout in seconds (default: 60)')
+    parser.add_argument('--wait-ready', type=float, default=60.0, help='Seconds to wait for /api/health/ready (default: 60)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the corpus and the arrivals')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    if args.rate <= 0 or args.duration <= 0 or args.speed <= 0 or args.max_in_flight <= 0 or args.batch_size <= 0:
+        parser.error('--rate, --duration, --speed, --max-in-flight and --batch-size must be positive')
+
+    if args.capture:
+        requests = load_capture(args.capture)
+    else:
+        languages = [language.strip() for language in args.languages.split(',') if language.strip()]
+        requests = synthetic_requests(languages, args.texts, args.endpoint, args.batch_size, args.seed)
+    if not requests:
+        parser.error('no requests to send')
+    try:
+        times = schedule(requests, args.rate, args.duration, args.arrival, args.replay_timing, args.speed, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    generator = LoadGenerator(args.url, args.max_in_flight, args.timeout)
+    if args.wait_ready and not wait_ready(generator, args.wait_ready):
+        print(f"{args.url} did not become ready within {args.wait_ready:.0f}s", file=sys.stderr)
+        return 1
+
+    print(f"Sending {len(times)} requests to {args.url} over {times[-1][0]:.1f}s...", file=sys.stderr)
+    elapsed = generator.run(times)
+
+    report = {
+        'arguments': vars(args),
+        'environment': environment(),
+        'total': summarize(generator.results, elapsed),
+        'endpoints': {
+            endpoint: summarize([result for result in generator.results if result['endpoint'] == endpoint], elapsed)
+            for endpoint in sorted({result['endpoint'] for result in generator.results})
+        }
+    }
+    total = report['total']
+    print(f"{total['succeeded']}/{total['requests']} succeeded, {total['achieved_rate']} req/s, "
+          f"{total['throughput_texts_per_s']} texts/s, latency p50 {total['latency_ms']['p50']} ms "
+          f"p99 {total['latency_ms']['p99']} ms", file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
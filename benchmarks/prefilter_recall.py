@@ -0,0 +1,123 @@
+"""
+Recall impact of the toponym prefilter on a labeled sample.
+
+The sample is a JSONL file with one text per line:
+
+    {"text": "Flooding in Passau and Regensburg", "languages": ["de"], "toponyms": ["Passau", "Regensburg"]}
+
+"toponyms" lists the labeled place names of the text (an empty list for texts without any).
+With --parse, texts without a "toponyms" field are labeled with the locations found by the
+service with the prefilter off, which measures the recall relative to the current pipeline
+rather than to a gold standard.
+
+For each prefilter mode the report shows the share of texts that would be short-circuited,
+the labeled toponyms that would be lost with them, and the time the prefilter takes per text.
+
+Usage:
+    python benchmarks/prefilter_recall.py sample.jsonl
+    python benchmarks/prefilter_recall.py sample.jsonl --parse --modes conservative
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import dataclasses
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import load_config  # noqa: E402
+from app.prefilter import PREFILTER_MODES, ToponymPrefilter, prefilter_path  # noqa: E402
+from app.utils import map_to_spacy_model  # noqa: E402
+
+
+def load_sample(path: str, parse: bool) -> List[Dict]:
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+
+    unlabeled = [record for record in records if 'toponyms' not in record]
+    if unlabeled and not parse:
+        sys.exit(f"{len(unlabeled)} records have no 'toponyms' label; label them or use --parse")
+
+    if unlabeled:
+        from app.service import GeoParserService
+
+        print(f"Labeling {len(unlabeled)} records with the full pipeline...", file=sys.stderr)
+        service = GeoParserService(dataclasses.replace(load_config(), prefilter_mode='off', enable_cache=False))
+        for record in unlabeled:
+            result = service.parse_text(record['text'], record.get('languages'))
+            if not result['success']:
+                sys.exit(f"Failed to parse a sample text: {result['error']}")
+            record['toponyms'] = [location['name'] for location in result['locations']]
+    return records
+
+
+def evaluate(prefilter: ToponymPrefilter, records: List[Dict]) -> Dict:
+    skipped_texts = 0
+    skipped_with_toponyms = 0
+    lost_toponyms = 0
+    elapsed = 0.0
+
+    for record in records:
+        languages = record.get('languages')
+        lang_code, _ = map_to_spacy_model([languages] if isinstance(languages, str) else languages)
+
+        start = time.perf_counter()
+        keep = prefilter.has_candidates(record['text'], lang_code)
+        elapsed += time.perf_counter() - start
+
+        if not keep:
+            skipped_texts += 1
+            if record['toponyms']:
+                skipped_with_toponyms += 1
+                lost_toponyms += len(record['toponyms'])
+
+    total_toponyms = sum(len(record['toponyms']) for record in records)
+    return {
+        'texts': len(records),
+        'short_circuited': skipped_texts,
+        'short_circuited_with_toponyms': skipped_with_toponyms,
+        'toponyms': total_toponyms,
+        'lost_toponyms': lost_toponyms,
+        'recall': 1.0 - lost_toponyms / total_toponyms if total_toponyms else 1.0,
+        'mean_prefilter_us': 1e6 * elapsed / max(len(records), 1)
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Measure the recall impact of the toponym prefilter on a labeled sample.')
+    parser.add_argument('sample', help='Labeled JSONL sample')
+    parser.add_argument('--modes', nargs='+', default=[mode for mode in PREFILTER_MODES if mode != 'off'],
+                        help='Prefilter modes to evaluate (default: conservative aggressive)')
+    parser.add_argument('--parse', action='store_true', help='Label records without "toponyms" with the full pipeline')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    path = prefilter_path(load_config())
+    records = load_sample(args.sample, args.parse)
+
+    report = {}
+    for mode in args.modes:
+        report[mode] = evaluate(ToponymPrefilter(path, mode=mode), records)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{'mode':<14}{'texts':>8}{'skipped':>10}{'skipped w/ toponyms':>22}{'lost toponyms':>16}{'recall':>10}{'us/text':>10}")
+    for mode, stats in report.items():
+        print(f"{mode:<14}{stats['texts']:>8}"
+              f"{100 * stats['short_circuited'] / max(stats['texts'], 1):>9.1f}%"
+              f"{stats['short_circuited_with_toponyms']:>22}"
+              f"{stats['lost_toponyms']:>9}/{stats['toponyms']:<6}"
+              f"{100 * stats['recall']:>9.2f}%"
+              f"{stats['mean_prefilter_us']:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
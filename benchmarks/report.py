@@ -0,0 +1,53 @@
+"""
+Measurements and metadata shared by the benchmark reports.
+"""
+import os
+import sys
+import platform
+import resource
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Summary of durations in seconds, in milliseconds.
+    """
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'mean': None, 'max': None}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(1000 * ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+
+    return {
+        'p50': at(0.50),
+        'p95': at(0.95),
+        'p99': at(0.99),
+        'mean': round(1000 * statistics.fmean(ordered), 3),
+        'max': round(1000 * ordered[-1], 3)
+    }
+
+
+def peak_rss_mb() -> float:
+    """ Peak resident set size of this process; ru_maxrss is in KB on Linux and in bytes on macOS """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def environment() -> Dict:
+    """ Where the benchmark ran, so reports can be compared """
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
@@ -0,0 +1,178 @@
+"""
+In-process benchmark of GeoParserService.parse_text and parse_batch.
+
+Every scenario (language x model size x batch size x cache) parses the same corpus --passes
+times in one service. Batch size 1 calls parse_text per text, larger sizes call parse_batch
+with chunks of that many texts. The result cache is cleared at the start of each scenario, so
+with the cache on the first pass fills it and later passes measure hits.
+
+The report is JSON with, per scenario, the throughput in texts per second, the p50/p95/p99
+latency of the parse_text or parse_batch calls and the peak RSS of the process so far. The
+corpus is synthetic and seeded (see corpus.py) unless --corpus is given, and the report
+records the arguments, configuration and git revision, so runs can be repeated and compared.
+
+--stub replaces the geoparser with stub.py, which needs no models and spends a configurable
+CPU time per call; use it to compare service-level settings on any machine.
+
+Usage:
+    python benchmarks/service_bench.py --stub --languages en,de,zh --batch-sizes 1,8,32 --cache off,on
+    python benchmarks/service_bench.py --model-sizes sm,md --texts 100 --output results.json
+"""
+import sys
+import json
+import time
+import argparse
+import dataclasses
+from typing import Dict, List
+
+from corpus import load_jsonl, synthetic_corpus
+from report import ROOT_DIR, environment, peak_rss_mb, percentiles
+
+sys.path.insert(0, ROOT_DIR)
+
+
+def run_scenario(service, records: List[Dict], batch_size: int, passes: int, model_size: str) -> Dict:
+    """
+    Parse the records passes times and measure every call.
+    """
+    service.clear_cache(include_persistent=False)
+    latencies = []
+    errors = 0
+    cache_hits = 0
+    pass_seconds = []
+
+    for _ in range(passes):
+        pass_start = time.perf_counter()
+        if batch_size == 1:
+            for record in records:
+                start = time.perf_counter()
+                result = service.parse_text(record['text'], record['languages'], model_size=model_size)
+                latencies.append(time.perf_counter() - start)
+                errors += not result['success']
+                cache_hits += bool(result.get('from_cache'))
+        else:
+            for offset in range(0, len(records), batch_size):
+                items = [
+                    {'text': record['text'], 'languages': record['languages']}
+                    for record in records[offset:offset + batch_size]
+                ]
+                start = time.perf_counter()
+                results = service.parse_batch(items, model_size=model_size)
+                latencies.append(time.perf_counter() - start)
+                errors += sum(not result['success'] for result in results)
+                cache_hits += sum(bool(result.get('from_cache')) for result in results)
+        pass_seconds.append(time.perf_counter() - pass_start)
+
+    texts = len(records) * passes
+    seconds = sum(pass_seconds)
+    return {
+        'texts': texts,
+        'calls': len(latencies),
+        'errors': errors,
+        'cache_hits': cache_hits,
+        'seconds': round(seconds, 3),
+        'throughput_texts_per_s': round(texts / seconds, 2) if seconds else None,
+        'throughput_per_pass': [round(len(records) / value, 2) if value else None for value in pass_seconds],
+        'latency_ms': percentiles(latencies),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark GeoParserService in-process.')
+    parser.add_argument('--languages', type=csv, default=None, help='Comma-separated languages (default: SUPPORTED_LANGUAGES)')
+    parser.add_argument('--model-sizes', type=csv, default=None, help='Comma-separated model sizes (default: the default model size)')
+    parser.add_argument('--batch-sizes', type=csv, default=['1', '8', '32'], help='Comma-separated batch sizes, 1 uses parse_text (default: 1,8,32)')
+    parser.add_argument('--cache', type=csv, default=['off', 'on'], help='Result cache settings to run: off, on or both (default: off,on)')
+    parser.add_argument('--texts', type=int, default=200, help='Synthetic texts per language (default: 200)')
+    parser.add_argument('--passes', type=int, default=2, help='Times the corpus is parsed per scenario (default: 2)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic corpus')
+    parser.add_argument('--corpus', default=None, help='JSONL corpus of {"text", "languages"} records instead of the synthetic one')
+    parser.add_argument('--stub', action='store_true', help='Use the stub geoparser instead of the real models')
+    parser.add_argument('--no-warmup', action='store_true', help='Include first-call costs in the measurements')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    if args.stub:
+        import stub
+        stub.install()
+
+    from app.config import load_config
+    from app.service import GeoParserService
+
+    base_config = load_config()
+    languages = args.languages or base_config.supported_languages
+    model_sizes = args.model_sizes or [base_config.default_model_size]
+    try:
+        batch_sizes = [int(size) for size in args.batch_sizes]
+    except ValueError:
+        parser.error('--batch-sizes must be integers')
+    if any(size <= 0 for size in batch_sizes) or args.passes <= 0 or args.texts <= 0:
+        parser.error('--batch-sizes, --passes and --texts must be positive')
+    if set(args.cache) - {'off', 'on'}:
+        parser.error("--cache takes 'off', 'on' or 'off,on'")
+
+    report = {
+        'arguments': vars(args),
+        'environment': environment(),
+        'scenarios': []
+    }
+
+    for cache in args.cache:
+        # One service per cache setting, with every model of the sweep pinned
+        config = dataclasses.replace(
+            base_config,
+            supported_languages=languages,
+            available_model_sizes=list(dict.fromkeys(model_sizes + base_config.available_model_sizes)),
+            pinned_models=[f"{language}:{size}" for language in languages for size in model_sizes],
+            inference_backend='local',
+            enable_cache=cache == 'on',
+            enable_persistent_cache=False,
+            enable_micro_batching=False,
+            max_batch_size=max(batch_sizes + [base_config.max_batch_size]),
+            enable_warmup=not args.no_warmup
+        )
+        if args.stub:
+            config = dataclasses.replace(config, enable_resolution_cache=False, enable_embedding_index=False,
+                                         enable_gazetteer_store=False)
+        report['environment'].setdefault('config', {})[cache] = dataclasses.asdict(config)
+
+        print(f"Loading service with cache {cache}...", file=sys.stderr)
+        load_start = time.perf_counter()
+        service = GeoParserService(config)
+        print(f"Loaded in {time.perf_counter() - load_start:.1f}s", file=sys.stderr)
+
+        for language in languages:
+            if args.corpus:
+                records = load_jsonl(args.corpus, [language])
+            else:
+                records = synthetic_corpus([language], args.texts, seed=args.seed)
+            if not records:
+                print(f"No texts for language '{language}', skipping", file=sys.stderr)
+                continue
+
+            for model_size in model_sizes:
+                for batch_size in batch_sizes:
+                    stats = run_scenario(service, records, batch_size, args.passes, model_size)
+                    scenario = {'language': language, 'model_size': model_size, 'batch_size': batch_size, 'cache': cache}
+                    scenario.update(stats)
+                    report['scenarios'].append(scenario)
+                    print(f"{language:<4}{model_size:<5}batch {batch_size:<5}cache {cache:<4}"
+                          f"{stats['throughput_texts_per_s']:>10} texts/s  p50 {stats['latency_ms']['p50']} ms  "
+                          f"p99 {stats['latency_ms']['p99']} ms  errors {stats['errors']}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Stand-in for the geoparser package, so the benchmarks run without downloaded models.
+
+install() registers this module as 'geoparser' before the app is imported. The stub Geoparser
+finds the place names of the synthetic corpus (corpus.PLACES) and spends CPU time proportional
+to the batch: GEOPARSER_STUB_CALL_MS per parse call plus GEOPARSER_STUB_MS_PER_KCHAR per 1000
+characters, and GEOPARSER_STUB_LOAD_SECONDS per model load. With GEOPARSER_STUB_SLEEP=true the
+time is slept instead of spent busy-waiting, which releases the GIL like I/O would.
+
+The stub only covers what GeoParserService uses with the default resolution: the resolution
+cache, the embedding index and the gazetteer store need the real package.
+"""
+import os
+import re
+import sys
+import time
+import hashlib
+from typing import Dict, List
+
+from corpus import PLACES
+
+CALL_MS = float(os.getenv('GEOPARSER_STUB_CALL_MS', '2'))
+MS_PER_KCHAR = float(os.getenv('GEOPARSER_STUB_MS_PER_KCHAR', '5'))
+LOAD_SECONDS = float(os.getenv('GEOPARSER_STUB_LOAD_SECONDS', '0'))
+SLEEP = os.getenv('GEOPARSER_STUB_SLEEP', 'false').lower() in ('true', '1', 'yes', 'on')
+
+
+def _location(name: str, country: str) -> Dict:
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest()
+    return {
+        'name': name,
+        'geonameid': str(int.from_bytes(digest[:4], 'little')),
+        'feature_type': 'seat of a first-order administrative division',
+        'latitude': round(int.from_bytes(digest[4:6], 'little') / 65535 * 180 - 90, 5),
+        'longitude': round(int.from_bytes(digest[6:8], 'little') / 65535 * 360 - 180, 5),
+        'elevation': None,
+        'population': int.from_bytes(digest[:3], 'little'),
+        'admin2_name': None,
+        'admin1_name': None,
+        'country_name': country
+    }
+
+
+_COUNTRIES = {'en': 'United Kingdom', 'de': 'Germany', 'fr': 'France', 'es': 'Spain', 'zh': 'China'}
+GAZETTEER = {name: _location(name, _COUNTRIES[lang]) for lang, names in PLACES.items() for name in names}
+_NAMES = re.compile('|'.join(re.escape(name) for name in sorted(GAZETTEER, key=len, reverse=True)))
+
+
+def _spend(seconds: float):
+    if seconds <= 0:
+        return
+    if SLEEP:
+        time.sleep(seconds)
+        return
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class _Pipe:
+    def __init__(self, listening_components=()):
+        self.listening_components = list(listening_components)
+
+
+class _Pipeline:
+    """ The parts of a spaCy Language object used by app.pipeline """
+    def __init__(self, model_name: str):
+        lang, _, _, size = model_name.split('_')
+        self.meta = {'lang': lang, 'name': model_name.split('_', 1)[1]}
+        if size == 'trf':
+            self.component_names = ['transformer', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'ner']
+            self._pipes = {name: _Pipe() for name in self.component_names}
+            self._pipes['transformer'] = _Pipe(['tagger', 'parser', 'ner'])
+            self.disabled = []
+        else:
+            self.component_names = ['tok2vec', 'tagger', 'parser', 'senter', 'attribute_ruler', 'lemmatizer', 'ner']
+            self._pipes = {name: _Pipe() for name in self.component_names}
+            self._pipes['tok2vec'] = _Pipe(['tagger', 'parser'])
+            self.disabled = ['senter']
+
+    @property
+    def pipe_names(self) -> List[str]:
+        return [name for name in self.component_names if name not in self.disabled]
+
+    def get_pipe(self, name: str) -> _Pipe:
+        return self._pipes[name]
+
+    def disable_pipe(self, name: str):
+        self.disabled.append(name)
+
+    def enable_pipe(self, name: str):
+        self.disabled.remove(name)
+
+    def remove_pipe(self, name: str):
+        self.component_names = [component for component in self.component_names if component != name]
+        if name in self.disabled:
+            self.disabled.remove(name)
+
+
+class _Toponym:
+    def __init__(self, text: str, start_char: int, end_char: int):
+        self.text = text
+        self.start_char = start_char
+        self.end_char = end_char
+
+
+class _Doc:
+    def __init__(self, text: str):
+        self.text = text
+        self.toponyms = [_Toponym(match.group(), match.start(), match.end()) for match in _NAMES.finditer(text)]
+        self.locations = [dict(GAZETTEER[toponym.text]) for toponym in self.toponyms]
+
+
+class Geoparser:
+    def __init__(self, spacy_model: str = 'en_core_web_sm', transformer_model: str = None, gazetteer: str = 'geonames'):
+        _spend(LOAD_SECONDS)
+        self.spacy_model = spacy_model
+        self.nlp = _Pipeline(spacy_model)
+
+    def parse(self, texts: List[str], batch_size: int = 8, filter=None) -> List[_Doc]:
+        # Components that are turned off make the stub faster, like trimming a real pipeline
+        active = len(self.nlp.pipe_names) / max(len(self.nlp.component_names), 1)
+        _spend((CALL_MS + MS_PER_KCHAR * sum(len(text) for text in texts) / 1000 * active) / 1000)
+        return [_Doc(text) for text in texts]
+
+
+def install():
+    """
+    Register the stub as the geoparser package. Must be called before the app is imported.
+    """
+    sys.modules['geoparser'] = sys.modules[__name__]
@@ -0,0 +1,22 @@
+"""
+The API served on the stub geoparser, for HTTP benchmarks without models.
+
+    gunicorn --config gunicorn.conf.py --pythonpath benchmarks --workers 4 stub_app:app
+
+Only the local inference backend is supported: inference processes would import the real
+geoparser. Features that need the real package are turned off.
+"""
+import os
+import sys
+
+import stub
+from report import ROOT_DIR
+
+sys.path.insert(0, ROOT_DIR)
+stub.install()
+
+os.environ['INFERENCE_BACKEND'] = 'local'
+for name in ('ENABLE_RESOLUTION_CACHE', 'ENABLE_EMBEDDING_INDEX', 'ENABLE_GAZETTEER_STORE'):
+    os.environ[name] = 'false'
+
+from app.api import app  # noqa: E402,F401
@@ -167,7 +167,7 @@ cat << "EOF"
 │  🗄️  Data: Ready                                        
 │                                                         
 │  🔗 API Endpoints:                                     
-│  • Health: http://localhost:5000/api/health           
+│  • Ready: http://localhost:5000/api/health/ready      
 │  • Parse: http://localhost:5000/api/parse             
 │                                                         
 └──────────────────────────────────────────────────────────
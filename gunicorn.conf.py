@@ -0,0 +1,79 @@
+"""
+Gunicorn configuration for the GeoParser API.
+
+Command line flags (see docker-compose.yml) take precedence over the settings here.
+With PRELOAD_APP=true the models are loaded once in the master process and shared
+copy-on-write with the forked workers. With INFERENCE_BACKEND=process the master
+starts the pool of inference processes and the workers only handle HTTP.
+With ENABLE_METRICS every process writes its metrics to PROMETHEUS_MULTIPROC_DIR,
+which /metrics aggregates; the directory is emptied when the server starts.
+With ENABLE_JOBS the master also starts the job workers that parse /api/jobs submissions.
+"""
+import os
+import shutil
+
+preload_app = os.getenv("PRELOAD_APP", "false").lower() in ("true", "1", "yes", "on")
+inference_backend = os.getenv("INFERENCE_BACKEND", "local").lower()
+enable_jobs = os.getenv("ENABLE_JOBS", "false").lower() in ("true", "1", "yes", "on")
+
+_inference_pool = None
+_job_runner = None
+
+# prometheus_client reads the directory when it is imported, so it is set before the app is loaded
+if os.getenv("ENABLE_METRICS", "true").lower() in ("true", "1", "yes", "on"):
+    metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/geoparser-metrics")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+if preload_app:
+    from app.prefork import disable_gc
+    disable_gc()
+
+
+def on_starting(server):
+    global _inference_pool, _job_runner
+    from app.config import load_config
+    config = load_config()
+    if inference_backend == "process":
+        from app.inference import InferencePool
+        _inference_pool = InferencePool(config).start()
+    if enable_jobs and config.job_workers > 0:
+        from app.jobs import JobRunner
+        _job_runner = JobRunner(config).start()
+
+
+def on_exit(server):
+    if _job_runner is not None:
+        _job_runner.stop()
+    if _inference_pool is not None:
+        _inference_pool.stop()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from app.prefork import freeze_for_fork
+        freeze_for_fork()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.api import geo_service
+        from app.prefork import after_fork
+        after_fork(geo_service)
+
+
+def child_exit(server, worker):
+    # Live gauges (in-flight requests, loaded models) of exited workers no longer count
+    from app.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from app.prefork import memory_report
+    report = memory_report()
+    if report:
+        worker.log.info(
+            f"Worker {report['pid']} memory: rss {report['rss_mb']} MB, "
+            f"unique {report['unique_mb']} MB, shared {report['shared_mb']} MB"
+            + (f", pss {report['pss_mb']} MB" if 'pss_mb' in report else "")
+        )
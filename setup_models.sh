@@ -135,8 +135,42 @@ else
     SKIP_GEOPARSER=false
 fi
 
+# Check which precomputed gazetteer indexes are enabled and not built yet
+TRANSFORMER_MODEL=${TRANSFORMER_MODEL:-"dguzh/geo-all-MiniLM-L6-v2"}
+EMBEDDING_INDEX_NAME="${GAZETTEER:-geonames}-$(echo "$TRANSFORMER_MODEL" | sed 's/[^A-Za-z0-9._-]\+/_/g')"
+INDEX_TARGETS=""
+if [ "${ENABLE_EMBEDDING_INDEX:-false}" = true ]; then
+    if [ -f "$PROJECT_DIR/data/geonames/$EMBEDDING_INDEX_NAME.json" ]; then
+        echo "Embedding index already exists, skipping build..."
+    else
+        echo "Embedding index not found, will build it..."
+        INDEX_TARGETS="$INDEX_TARGETS embeddings"
+    fi
+fi
+if [ "${ENABLE_GAZETTEER_STORE:-false}" = true ]; then
+    if [ -f "$PROJECT_DIR/data/geonames/${GAZETTEER:-geonames}-records.json" ]; then
+        echo "Gazetteer store already exists, skipping build..."
+    else
+        echo "Gazetteer store not found, will build it..."
+        INDEX_TARGETS="$INDEX_TARGETS records"
+    fi
+fi
+if [ "${PREFILTER_MODE:-off}" != off ]; then
+    if [ -f "$PROJECT_DIR/data/geonames/${GAZETTEER:-geonames}-names.json" ]; then
+        echo "Prefilter name sets already exist, skipping build..."
+    else
+        echo "Prefilter name sets not found, will build them..."
+        INDEX_TARGETS="$INDEX_TARGETS names"
+    fi
+fi
+if [ -z "$INDEX_TARGETS" ]; then
+    SKIP_INDEX=true
+else
+    SKIP_INDEX=false
+fi
+
 # If everything exists, exit early
-if [ "$SKIP_SPACY" = true ] && [ "$SKIP_GEOPARSER" = true ]; then
+if [ "$SKIP_SPACY" = true ] && [ "$SKIP_GEOPARSER" = true ] && [ "$SKIP_INDEX" = true ]; then
     echo "All models and data already exist. Setup complete!"
     exit 0
 fi
@@ -225,6 +259,15 @@ docker run --rm -it \
             echo 'Skipping geoparser data download - already exists'
         fi
         
+        if [ '$SKIP_INDEX' = false ]; then
+            echo 'Building gazetteer indexes:$INDEX_TARGETS (embeddings can take a while for the full gazetteer)...'
+            mkdir -p ~/.local/share
+            ln -sfn /app/data/geoparser ~/.local/share/geoparser
+            GEONAMES_DATA_PATH=/app/data/geonames EMBEDDING_INDEX_PATH= GAZETTEER_STORE_PATH= PREFILTER_PATH= python -m app.build_index$INDEX_TARGETS
+            rm -f ~/.local/share/geoparser
+            echo 'Gazetteer indexes setup completed!'
+        fi
+        
         echo 'All setup operations completed successfully!'
     "
 
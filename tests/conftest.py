@@ -0,0 +1,58 @@
+"""
+Test setup: the app runs on the stub geoparser of the benchmarks (benchmarks/stub.py), so the
+tests need no downloaded models. Features that need the real geoparser package are turned off.
+"""
+import os
+import sys
+import dataclasses
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+sys.path.insert(0, ROOT_DIR)
+
+import stub  # noqa: E402
+
+stub.install()
+
+os.environ.update({
+    'INFERENCE_BACKEND': 'local',
+    'ENABLE_RESOLUTION_CACHE': 'false',
+    'ENABLE_EMBEDDING_INDEX': 'false',
+    'ENABLE_GAZETTEER_STORE': 'false',
+    'ENABLE_PERSISTENT_CACHE': 'false',
+    'ENABLE_METRICS': 'false',
+    'ENABLE_WARMUP': 'false',
+    'ENABLE_JOBS': 'false',
+    'GEOPARSER_STUB_CALL_MS': '0',
+    'GEOPARSER_STUB_MS_PER_KCHAR': '0',
+})
+
+from app.config import load_config  # noqa: E402
+
+
+@pytest.fixture
+def config():
+    return load_config()
+
+
+@pytest.fixture
+def make_service(config):
+    """ Build a GeoParserService with configuration overrides """
+    from app.service import GeoParserService
+
+    def make(**overrides):
+        return GeoParserService(dataclasses.replace(config, **overrides))
+    return make
+
+
+@pytest.fixture
+def service(make_service):
+    return make_service()
+
+
+@pytest.fixture
+def client():
+    from app.api import app
+    return app.test_client()
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from app.batching import MicroBatcher
+
+
+def submit_concurrently(batcher, texts):
+    """ Submit the texts from one thread each; returns the result or the exception of every text """
+    outcomes = [None] * len(texts)
+
+    def submit(index):
+        try:
+            outcomes[index] = batcher.submit('en', texts[index])[0]
+        except Exception as e:
+            outcomes[index] = e
+    threads = [threading.Thread(target=submit, args=(index,)) for index in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+def test_requests_are_run_as_one_batch():
+    calls = []
+
+    def runner(key, texts):
+        calls.append(list(texts))
+        return [text.upper() for text in texts]
+    batcher = MicroBatcher(runner, max_batch_size=3, max_wait_ms=5000)
+
+    assert submit_concurrently(batcher, ['a', 'b', 'a']) == ['A', 'B', 'A']
+    # Identical texts are parsed once
+    assert len(calls) == 1 and sorted(calls[0]) == ['a', 'b']
+    assert batcher.stats()['requests'] == 3
+
+
+def test_failing_text_does_not_fail_the_batch():
+    def runner(key, texts):
+        if 'bad text' in texts:
+            raise RuntimeError('boom')
+        return [text.upper() for text in texts]
+    batcher = MicroBatcher(runner, max_batch_size=2, max_wait_ms=5000)
+
+    good, bad = submit_concurrently(batcher, ['good text', 'bad text'])
+    assert good == 'GOOD TEXT'
+    assert isinstance(bad, RuntimeError) and str(bad) == 'boom'
+
+
+def test_single_text_error_is_raised():
+    def runner(key, texts):
+        raise ValueError('boom')
+    batcher = MicroBatcher(runner, max_batch_size=1)
+
+    with pytest.raises(ValueError):
+        batcher.submit('en', 'text')
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from app import bulk
+
+
+RECORDS = [
+    {'id': 'a', 'text': 'Heavy rain in London today.', 'languages': ['en']},
+    {'id': 'b', 'text': 123},
+    {'id': 'c', 'text': None},
+    {'id': 'd', 'text': 'Paris', 'languages': [None]},
+    'not an object',
+    {'id': 'e', 'text': 'Der Zug nach Berlin.', 'languages': 'de'},
+]
+
+
+def write_input(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records), encoding='utf-8')
+    return str(path)
+
+
+def read_output(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def worker(service, monkeypatch):
+    """ Run _parse_chunk in this process, as a bulk worker would """
+    monkeypatch.setattr(bulk, '_service', service)
+    monkeypatch.setattr(bulk, '_fields', {'id': 'id', 'text': 'text', 'languages': 'languages'})
+
+
+def test_parse_chunk_gives_malformed_records_their_own_error(worker):
+    count, data = bulk._parse_chunk(10, [json.dumps(record) for record in RECORDS], None)
+    results = [json.loads(line) for line in data.splitlines()]
+    assert count == len(RECORDS)
+    assert [result['record'] for result in results] == list(range(10, 16))
+    assert [result['success'] for result in results] == [True, False, False, False, False, True]
+    assert "must be a string" in results[1]['error']
+    assert "list of strings" in results[3]['error']
+
+
+def test_parse_chunk_falls_back_to_single_records(worker, service, monkeypatch):
+    parse_batch = service.parse_batch
+
+    def failing_parse_batch(items, **kwargs):
+        # A record that breaks the parser, whether alone or in a batch
+        if any('London' in item['text'] for item in items):
+            raise RuntimeError('parser crashed')
+        return parse_batch(items, **kwargs)
+
+    monkeypatch.setattr(service, 'parse_batch', failing_parse_batch)
+    _, data = bulk._parse_chunk(0, [json.dumps(RECORDS[0]), json.dumps(RECORDS[5])], None)
+    results = [json.loads(line) for line in data.splitlines()]
+    assert [result['success'] for result in results] == [False, True]
+    assert 'parser crashed' in results[0]['error']
+
+
+def test_bulk_run_writes_every_record(tmp_path):
+    source = write_input(tmp_path / 'input.jsonl', RECORDS)
+    output = str(tmp_path / 'output.jsonl')
+    assert bulk.main([source, '-o', output, '-w', '1', '-b', '2', '--no-count']) == 0
+    results = read_output(output)
+    assert [result['record'] for result in results] == list(range(len(RECORDS)))
+    assert sum(result['success'] for result in results) == 2
+
+
+def test_resume_refuses_missing_output(tmp_path):
+    source = write_input(tmp_path / 'input.jsonl', RECORDS)
+    output = tmp_path / 'output.jsonl'
+    checkpoint = bulk.Checkpoint(str(output) + '.checkpoint', [source], str(output))
+    checkpoint.records_done = 2
+    checkpoint.output_bytes = 500
+    checkpoint.save()
+
+    assert bulk.main([source, '-o', str(output), '-w', '1', '--no-count']) == 1
+    assert not output.exists()
+
+
+def test_resume_refuses_different_fields(tmp_path):
+    source = write_input(tmp_path / 'input.jsonl', RECORDS)
+    output = tmp_path / 'output.jsonl'
+    output.write_bytes(b'')
+    checkpoint = bulk.Checkpoint(str(output) + '.checkpoint', [source], str(output), fields=('name',))
+    checkpoint.save()
+
+    assert bulk.main([source, '-o', str(output), '-w', '1', '--no-count', '--fields', 'name,latitude']) == 1
+    assert output.read_bytes() == b''
@@ -0,0 +1,37 @@
+import sqlite3
+
+from app.cache import PersistentCache
+
+
+def test_persistent_cache_round_trip(tmp_path):
+    cache = PersistentCache(str(tmp_path / 'results.db'))
+    cache.put('key', {'success': True, 'locations': []})
+    assert cache.get('key') == {'success': True, 'locations': []}
+    assert cache.clear() == 1
+    assert cache.get('key') is None
+
+
+def test_persistent_cache_clear_survives_database_errors(tmp_path):
+    cache = PersistentCache(str(tmp_path / 'results.db'))
+    cache.put('key', {'success': True})
+
+    class BrokenConnection:
+        def execute(self, *args):
+            raise sqlite3.OperationalError('database is locked')
+
+    cache._connection = lambda: BrokenConnection()
+    assert cache.clear() == 0
+    assert cache.errors == 1
+
+
+def test_cached_results_are_not_shared_with_callers(make_service):
+    service = make_service(enable_cache=True)
+    first = service.parse_text('Heavy rain in London today.', ['en'])
+    first['locations'][0]['name'] = 'changed'
+    first['locations'].append({'name': 'added'})
+
+    second = service.parse_text('Heavy rain in London today.', ['en'])
+    assert second['from_cache']
+    assert [location['name'] for location in second['locations']] == ['London']
+    second['locations'][0]['name'] = 'changed'
+    assert service.parse_text('Heavy rain in London today.', ['en'])['locations'][0]['name'] == 'London'
@@ -0,0 +1,193 @@
+import pytest
+
+from app import jobs
+from app.jobs import JobQueue
+
+
+class Clock:
+    """ Stands in for time.time, so lease expiry needs no waiting """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(jobs.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / 'jobs.db'), chunk_size=2, lease_seconds=60, max_attempts=2)
+
+
+def items(count):
+    return [{'text': f'Rain in London, day {index}.', 'languages': ['en']} for index in range(count)]
+
+
+def ok(task):
+    return [{'success': True, 'locations': [], 'text': item['text']} for item in task['items']]
+
+
+def test_lease_and_complete(queue):
+    job = queue.submit(items(3))
+    assert job['status'] == 'queued' and job['total'] == 3
+
+    first = queue.lease('a')
+    second = queue.lease('b')
+    assert (first['chunk'], first['start'], len(first['items'])) == (0, 0, 2)
+    assert (second['chunk'], second['start'], len(second['items'])) == (1, 2, 1)
+    assert queue.lease('c') is None
+    assert queue.status(job['job_id'])['status'] == 'running'
+
+    assert queue.complete(second, ok(second))
+    status = queue.status(job['job_id'])
+    assert (status['status'], status['processed']) == ('running', 1)
+    # Results of texts that are not parsed yet are left out
+    assert [result['index'] for result in queue.results(job['job_id'])] == [2]
+
+    assert queue.complete(first, ok(first))
+    status = queue.status(job['job_id'])
+    assert (status['status'], status['processed'], status['failed'], status['progress']) == ('completed', 3, 0, 1.0)
+    assert [result['index'] for result in queue.results(job['job_id'], offset=1, limit=2)] == [1, 2]
+
+
+def test_expired_lease_is_leased_again(queue, clock):
+    job = queue.submit(items(1))
+    lost = queue.lease('a')
+    assert queue.lease('b') is None
+
+    clock.now += 61
+    task = queue.lease('b')
+    assert task['chunk'] == lost['chunk']
+
+    # The worker that lost the lease can not overwrite the results
+    assert not queue.complete(lost, [{'success': False, 'error': 'late', 'locations': []}])
+    assert queue.complete(task, ok(task))
+    assert queue.results(job['job_id'])[0]['success']
+    assert queue.status(job['job_id'])['processed'] == 1
+
+
+def test_released_chunk_is_leased_again(queue):
+    queue.submit(items(1))
+    task = queue.lease('a')
+    queue.release(task)
+    assert queue.lease('b')['chunk'] == task['chunk']
+
+
+def test_chunk_is_given_up_after_max_attempts(queue, clock):
+    job = queue.submit(items(3))
+    for _ in range(2):
+        # The worker crashes, so neither complete nor release is called
+        assert queue.lease('a')['chunk'] == 0
+        assert queue.lease('a')['chunk'] == 1
+        clock.now += 61
+
+    assert queue.lease('a') is None
+    status = queue.status(job['job_id'])
+    assert (status['status'], status['processed'], status['failed']) == ('completed', 3, 3)
+    results = queue.results(job['job_id'])
+    assert [result['error'] for result in results] == ['Parsing failed after 2 attempts'] * 3
+
+
+def test_cancel_drops_pending_chunks(queue):
+    job = queue.submit(items(4))
+    task = queue.lease('a')
+    status = queue.cancel(job['job_id'])
+    assert status['status'] == 'cancelled'
+    assert queue.lease('b') is None
+
+    # The chunk being parsed is still stored, the job stays cancelled
+    assert queue.complete(task, ok(task))
+    status = queue.status(job['job_id'])
+    assert (status['status'], status['processed']) == ('cancelled', 2)
+    assert queue.cancel('unknown') is None
+
+
+def test_purge_removes_expired_jobs(queue, clock):
+    finished = queue.submit(items(1))
+    task = queue.lease('a')
+    queue.complete(task, ok(task))
+    running = queue.submit(items(1))
+    queue.lease('a')
+
+    clock.now += 100
+    assert queue.purge(200) == 0
+    assert queue.purge(50) == 1
+    assert queue.status(finished['job_id']) is None
+    assert queue.results(finished['job_id']) == []
+    assert queue.status(running['job_id'])['status'] == 'running'
+    assert queue.stats()['jobs'] == {'queued': 0, 'running': 1, 'completed': 0, 'cancelled': 0}
+
+
+def test_text_that_breaks_the_parser_gets_its_own_error(queue, service, monkeypatch):
+    parse_batch = service.parse_batch
+
+    def failing_parse_batch(texts, **kwargs):
+        if any(item['text'] == 'boom' for item in texts):
+            raise RuntimeError('parser crashed')
+        return parse_batch(texts, **kwargs)
+    monkeypatch.setattr(service, 'parse_batch', failing_parse_batch)
+
+    job = queue.submit([{'text': 'Rain in London.'}, {'text': 'boom'}], fields=['name'])
+    task = queue.lease('a')
+    assert queue.complete(task, service.parse_batch_isolated(task['items'], model_size=task['model_size'], fields=task['fields']))
+
+    first, second = queue.results(job['job_id'])
+    assert first['success'] and first['locations'] == [{'name': 'London', 'start_char': 8, 'end_char': 14}]
+    assert second == {'success': False, 'error': 'Parsing failed: parser crashed', 'locations': [], 'index': 1}
+    assert queue.status(job['job_id'])['status'] == 'completed'
+
+
+@pytest.fixture
+def jobs_client(client, queue, monkeypatch):
+    monkeypatch.setattr('app.api.job_queue', queue)
+    return client
+
+
+@pytest.mark.parametrize('item, error', [
+    ('London', 'item must be an object'),
+    ({'text': 123}, 'text must be a string'),
+    ({'languages': ['en']}, 'text must be a string'),
+    ({'text': 'London', 'languages': [None]}, 'languages must be a string or a list of strings'),
+    ({'text': 'London', 'languages': {'en': 1}}, 'languages must be a string or a list of strings'),
+])
+def test_submit_rejects_malformed_items(jobs_client, queue, item, error):
+    response = jobs_client.post('/api/jobs', json={'texts': [{'text': 'London'}, item]})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'Invalid item texts[1]: {error}'
+    assert queue.stats()['jobs']['queued'] == 0
+
+
+def test_submit_rejects_malformed_model_size(jobs_client):
+    response = jobs_client.post('/api/jobs', json={'texts': [{'text': 'London'}], 'model_size': ['sm']})
+    assert response.status_code == 400
+
+
+def test_submit_and_read_results(jobs_client, queue, service):
+    response = jobs_client.post('/api/jobs', json={'texts': [{'text': 'Rain in London.'}, {'text': 'Sun in Paris.', 'languages': 'en'}, {'text': ' '}]})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    while (task := queue.lease('worker')) is not None:
+        queue.complete(task, service.parse_batch_isolated(task['items'], model_size=task['model_size'], fields=task['fields']))
+
+    data = jobs_client.get(f'/api/jobs/{job_id}').get_json()
+    assert (data['status'], data['processed'], data['failed']) == ('completed', 3, 1)
+
+    page = jobs_client.get(f'/api/jobs/{job_id}/results?offset=0&limit=2').get_json()
+    assert [result['locations'][0]['name'] for result in page['results']] == ['London', 'Paris']
+    assert (page['next_offset'], page['pending']) == (2, 0)
+    page = jobs_client.get(f'/api/jobs/{job_id}/results?offset=2&limit=2').get_json()
+    assert page['next_offset'] is None
+    assert page['results'][0]['error'] == 'Input text is empty or invalid.'
+
+    assert jobs_client.get('/api/jobs/unknown').status_code == 404
+
+
+def test_jobs_disabled(client):
+    assert client.post('/api/jobs', json={'texts': [{'text': 'London'}]}).status_code == 404
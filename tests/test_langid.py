@@ -0,0 +1,22 @@
+from app.config import load_config
+
+
+def test_detection_is_off_by_default(monkeypatch, service):
+    monkeypatch.delenv('ENABLE_LANGUAGE_DETECTION', raising=False)
+    assert not load_config().enable_language_detection
+
+    result = service.parse_text('Paris', None)
+    assert result['language_detected'] == 'en'
+    assert 'language_confidence' not in result
+
+
+def test_detection_when_enabled(make_service):
+    service = make_service(enable_language_detection=True)
+    result = service.parse_text('Der Zug fährt morgen früh von Berlin über Hamburg nach München.', None)
+    assert result['language_detected'] == 'de'
+    assert result['language_confidence'] > 0.4
+
+    # Texts sent with languages are never detected
+    result = service.parse_text('Paris', ['en'])
+    assert result['language_detected'] == 'en'
+    assert 'language_confidence' not in result
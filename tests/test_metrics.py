@@ -0,0 +1,50 @@
+import pytest
+
+from app import metrics
+
+prometheus_client = pytest.importorskip('prometheus_client')
+
+
+@pytest.fixture(scope='module')
+def collectors():
+    """ The metrics are created once, as they register with the default registry """
+    metrics.setup(True)
+    created = metrics._metrics
+    metrics._metrics = None
+    return created
+
+
+@pytest.fixture
+def recording(monkeypatch, collectors):
+    monkeypatch.setattr(metrics, '_metrics', collectors)
+    return collectors
+
+
+def in_flight(collectors):
+    return collectors['in_flight']._value.get()
+
+
+def requests(collectors, endpoint):
+    return prometheus_client.REGISTRY.get_sample_value('geoparser_requests_total', {'endpoint': endpoint, 'status': '200'}) or 0
+
+
+def test_request_is_in_flight_until_the_body_is_sent(recording, client):
+    before = in_flight(recording), requests(recording, '/api/parse/stream')
+    body = '{"text": "Rain in London.", "languages": ["en"]}\n{"text": "Sun in Paris.", "languages": ["en"]}\n'
+    response = client.post('/api/parse/stream', data=body, buffered=False)
+
+    assert response.status_code == 200
+    assert in_flight(recording) == before[0] + 1
+    assert b'London' in b''.join(response.response)
+    response.close()
+    assert in_flight(recording) == before[0]
+    assert requests(recording, '/api/parse/stream') == before[1] + 1
+
+
+def test_buffered_request_is_recorded(recording, client):
+    before = in_flight(recording), requests(recording, '/api/languages')
+    # WSGI servers close every response once it is sent, which the test client leaves to the caller
+    with client.get('/api/languages') as response:
+        assert response.status_code == 200
+    assert in_flight(recording) == before[0]
+    assert requests(recording, '/api/languages') == before[1] + 1
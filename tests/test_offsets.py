@@ -0,0 +1,25 @@
+import pytest
+
+TEXT = ("Heavy rain caused flooding between London and Manchester. The delegation travelled from Boston "
+        "to Chicago on Monday. A new office opened in Dublin this spring.")
+
+
+def mentions(result):
+    return [(location['name'], TEXT[location['start_char']:location['end_char']]) for location in result['locations']]
+
+
+@pytest.mark.parametrize('overrides', [
+    {},
+    {'enable_chunking': True, 'chunk_size': 60, 'chunk_overlap': 1},
+    {'enable_sentence_cache': True},
+], ids=['whole', 'chunked', 'incremental'])
+def test_every_path_returns_mention_offsets(make_service, overrides):
+    result = make_service(**overrides).parse_text(TEXT, ['en'])
+    assert result['success']
+    assert mentions(result) == [(name, name) for name in ('London', 'Manchester', 'Boston', 'Chicago', 'Dublin')]
+
+
+def test_batch_and_projection_keep_offsets(service):
+    result = service.parse_batch([{'text': TEXT, 'languages': ['en']}], fields='name')[0]
+    assert set(result['locations'][0]) == {'name', 'start_char', 'end_char'}
+    assert mentions(result)[0] == ('London', 'London')
@@ -0,0 +1,27 @@
+import json
+import dataclasses
+
+import numpy as np
+
+from app.prefilter import open_prefilter, _hashes
+
+
+def write_name_sets(path, gazetteer, names):
+    np.save(path + '.words.npy', np.unique(_hashes([word for name in names for word in name.split()])))
+    np.save(path + '.names.npy', np.unique(_hashes(names)))
+    with open(path + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'gazetteer': gazetteer}, f)
+
+
+def test_open_prefilter(tmp_path, config):
+    path = str(tmp_path / 'names')
+    write_name_sets(path, config.gazetteer, ['london', 'new york'])
+    prefilter = open_prefilter(dataclasses.replace(config, prefilter_mode='conservative', prefilter_path=path))
+    assert prefilter.has_candidates('Rain in London.', 'en')
+    assert not prefilter.has_candidates('Rain all day.', 'en')
+
+
+def test_prefilter_of_another_gazetteer_is_ignored(tmp_path, config):
+    path = str(tmp_path / 'names')
+    write_name_sets(path, 'other', ['london'])
+    assert open_prefilter(dataclasses.replace(config, prefilter_mode='conservative', prefilter_path=path)) is None
@@ -0,0 +1,42 @@
+import gc
+
+import pytest
+
+from app import prefork
+
+
+@pytest.fixture
+def preloading_master(monkeypatch):
+    """ Act as a Gunicorn master with PRELOAD_APP, restoring the garbage collector afterwards """
+    monkeypatch.setattr(prefork, '_preloading', False)
+    monkeypatch.setattr(prefork, '_forked', False)
+    prefork.disable_gc()
+    yield
+    gc.unfreeze()
+    gc.enable()
+
+
+def test_freeze_before_every_fork_and_enable_gc(preloading_master):
+    assert not gc.isenabled()
+    prefork.freeze_for_fork()
+    assert gc.isenabled()
+    first = gc.get_freeze_count()
+
+    # Objects created by the master after the first fork are frozen for the next worker
+    created = [[index] for index in range(1000)]
+    prefork.freeze_for_fork()
+    assert gc.get_freeze_count() >= first + len(created)
+
+
+def test_preloading_master_defers_warmup_to_workers(preloading_master, make_service):
+    service = make_service(enable_warmup=True, pinned_models=['en:sm'])
+    assert service._warmup is None
+
+    prefork.after_fork(service)
+    assert service._warmup is not None
+    assert service._warmup['status'] == 'ok'
+
+
+def test_warmup_runs_at_startup_without_preloading(make_service):
+    service = make_service(enable_warmup=True, pinned_models=['en:sm'])
+    assert service._warmup is not None
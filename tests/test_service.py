@@ -0,0 +1,41 @@
+import pytest
+
+
+def test_parse_text(service):
+    result = service.parse_text('Heavy rain in London today.', ['en'])
+    assert result['success']
+    assert [location['name'] for location in result['locations']] == ['London']
+
+
+@pytest.mark.parametrize('item, error', [
+    ({'text': 123}, 'Input text is empty or invalid.'),
+    ({'text': None}, 'Input text is empty or invalid.'),
+    ({'text': 'London', 'languages': [None]}, 'languages must be a string or a list of strings.'),
+    ({'text': 'London', 'languages': 7}, 'languages must be a string or a list of strings.'),
+    ('London', 'Invalid input format - missing text field'),
+])
+def test_parse_batch_rejects_malformed_items_individually(service, item, error):
+    results = service.parse_batch([{'text': 'A trip to Paris.', 'languages': ['fr']}, item, {'text': 'Berlin', 'languages': 'de'}])
+    assert len(results) == 3
+    assert results[0]['success'] and results[2]['success']
+    assert not results[1]['success']
+    assert results[1]['error'] == error
+
+
+def test_parse_text_rejects_malformed_languages(service):
+    result = service.parse_text('London', [None])
+    assert not result['success']
+
+
+def test_batch_endpoint_with_malformed_item(client):
+    response = client.post('/api/parse/batch', json={'texts': [{'text': 123}, {'text': 'London', 'languages': [None]}, {'text': 'London'}]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [result['success'] for result in data['results']] == [False, False, True]
+    assert data['failed_parses'] == 2
+
+
+def test_parse_endpoint_with_non_string_text(client):
+    response = client.post('/api/parse', json={'text': 123})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'text must be a string'
@@ -0,0 +1,12 @@
+from app.supervisor import restart_delay
+
+
+def test_restart_delay_backs_off_for_crashing_children():
+    delays = [0.0]
+    for _ in range(7):
+        delays.append(restart_delay(delays[-1], ran_for=2))
+    assert delays[1:] == [1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
+
+
+def test_stable_child_is_restarted_at_once():
+    assert restart_delay(30.0, ran_for=3600) == 0.0